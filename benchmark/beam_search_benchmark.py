@@ -0,0 +1,123 @@
+r"""
+Benchmark the batched :class:`~textbox.module.strategy.BeamSearch` against the per-example
+:class:`~textbox.module.strategy.Beam_Search_Hypothesis`.
+
+Both engines decode the same randomly initialized GRU decoder from random initial states. ``Beam_Search_Hypothesis``
+decodes one example at a time, and ``BeamSearch`` decodes the whole batch at once. The bias of eos controls how soon
+hypotheses are finished. It reports the time of decoding and the average length of generated sequences of both
+engines, for example::
+
+    python benchmark/beam_search_benchmark.py --batch_size=64 --beam_size=4 --vocab_size=10000
+"""
+
+import argparse
+import os
+import sys
+from time import time
+
+import torch
+import torch.nn as nn
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from textbox.utils import init_seed
+from textbox.module.strategy import Beam_Search_Hypothesis, BeamSearch, reorder_beam
+
+SOS_TOKEN_IDX = 1
+EOS_TOKEN_IDX = 2
+
+
+class Decoder(nn.Module):
+
+    def __init__(self, vocab_size, hidden_size, eos_bias):
+        super(Decoder, self).__init__()
+        self.embedder = nn.Embedding(vocab_size, hidden_size)
+        self.rnn = nn.GRU(hidden_size, hidden_size, batch_first=True)
+        self.vocab_linear = nn.Linear(hidden_size, vocab_size)
+        with torch.no_grad():
+            self.vocab_linear.bias[EOS_TOKEN_IDX] += eos_bias
+
+    def forward(self, input_seq, states):
+        outputs, states = self.rnn(self.embedder(input_seq), states)
+        return self.vocab_linear(outputs), states
+
+
+def hypothesis_search(decoder, states, args, device):
+    idx2token = list(range(args.vocab_size))
+    generate_corpus = []
+    for bid in range(states.size(1)):
+        decoder_states = states[:, bid:bid + 1, :]
+        input_seq = torch.LongTensor([[SOS_TOKEN_IDX]]).to(device)
+        hypothesis = Beam_Search_Hypothesis(args.beam_size, SOS_TOKEN_IDX, EOS_TOKEN_IDX, device, idx2token)
+        for gen_idx in range(args.max_length):
+            token_logits, decoder_states = decoder(input_seq, decoder_states)
+            input_seq, decoder_states = hypothesis.step(gen_idx, token_logits, decoder_states)
+            if hypothesis.stop():
+                break
+        generate_corpus.append(hypothesis.generate())
+    return generate_corpus
+
+
+def batch_search(decoder, states, args, device):
+    beam_search = BeamSearch(states.size(1), args.beam_size, args.max_length, SOS_TOKEN_IDX, EOS_TOKEN_IDX, device)
+    decoder_states = states.repeat_interleave(args.beam_size, dim=1)
+    for gen_idx in range(args.max_length):
+        token_logits, decoder_states = decoder(beam_search.input_seq, decoder_states)
+        beam_idx = beam_search.step(gen_idx, token_logits)
+        if beam_search.stop():
+            break
+        decoder_states = reorder_beam(decoder_states, beam_idx, dim=1)
+
+    generate_corpus = []
+    for sequence in beam_search.generate().tolist():
+        generate_corpus.append(sequence[:sequence.index(EOS_TOKEN_IDX)] if EOS_TOKEN_IDX in sequence else sequence)
+    return generate_corpus
+
+
+def benchmark(search, decoder, states, args, device):
+    elapsed_time = None
+    for _ in range(args.repeat):
+        start_time = time()
+        with torch.no_grad():
+            generate_corpus = search(decoder, states, args, device)
+        if device.type == 'cuda':
+            torch.cuda.synchronize(device)
+        run_time = time() - start_time
+        elapsed_time = run_time if elapsed_time is None else min(elapsed_time, run_time)
+    average_length = sum(len(tokens) for tokens in generate_corpus) / len(generate_corpus)
+    return elapsed_time, average_length
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--batch_size', type=int, default=64)
+    parser.add_argument('--beam_size', type=int, default=4)
+    parser.add_argument('--vocab_size', type=int, default=10000)
+    parser.add_argument('--hidden_size', type=int, default=256)
+    parser.add_argument('--max_length', type=int, default=50)
+    parser.add_argument('--eos_bias', type=float, default=4.0, help='added to the logit of eos')
+    parser.add_argument('--repeat', type=int, default=3, help='number of runs, the fastest one is reported')
+    parser.add_argument('--use_gpu', action='store_true')
+    parser.add_argument('--seed', type=int, default=2020)
+    args, _ = parser.parse_known_args()
+
+    device = torch.device('cuda' if args.use_gpu and torch.cuda.is_available() else 'cpu')
+    init_seed(args.seed, True)
+    decoder = Decoder(args.vocab_size, args.hidden_size, args.eos_bias).to(device).eval()
+    states = torch.randn(1, args.batch_size, args.hidden_size, device=device)
+
+    hypothesis_time, hypothesis_length = benchmark(hypothesis_search, decoder, states, args, device)
+    batch_time, batch_length = benchmark(batch_search, decoder, states, args, device)
+
+    print('{:<24}{:>12}{:>16}{:>12}'.format('engine', 'time (s)', 'ms/sentence', 'avg length'))
+    print('{:<24}{:>12.3f}{:>16.2f}{:>12.2f}'.format(
+        'Beam_Search_Hypothesis', hypothesis_time, hypothesis_time * 1000 / args.batch_size, hypothesis_length
+    ))
+    print('{:<24}{:>12.3f}{:>16.2f}{:>12.2f}'.format(
+        'BeamSearch', batch_time, batch_time * 1000 / args.batch_size, batch_length
+    ))
+    print('speedup: {:.2f}x'.format(hypothesis_time / batch_time))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+r"""
+Benchmark the memory-versus-time tradeoff of the ``activation_checkpointing`` option of Transformer stacks.
+
+A Transformer encoder-decoder is trained on random source and target sequences with every setting, where ``0`` turns
+checkpointing off, ``1`` checkpoints all layers and ``k`` checkpoints every ``k``-th layer. For every setting, it reports
+the time of a training step, the size of activations saved for backward (and the peak memory on GPU), and how many
+times larger the batch could be with the same activation memory as the setting without checkpointing, for example::
+
+    python benchmark/checkpoint_benchmark.py --settings=0,2,1 --source_length=400 --target_length=100
+"""
+
+import argparse
+import os
+import sys
+from time import time
+
+import torch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from textbox.module.Encoder.transformer_encoder import TransformerEncoder
+from textbox.module.Decoder.transformer_decoder import TransformerDecoder
+from textbox.module.Attention.attention_mechanism import SelfAttentionMask
+
+
+class SavedTensorsCounter(object):
+    r"""Count the bytes of distinct tensors (except parameters) which are saved by autograd for backward."""
+
+    def __init__(self, parameters):
+        self.parameter_ptrs = set(p.data_ptr() for p in parameters)
+        self.ptrs = set()
+        self.bytes = 0
+
+    def pack(self, tensor):
+        ptr = tensor.data_ptr()
+        if ptr not in self.parameter_ptrs and ptr not in self.ptrs:
+            self.ptrs.add(ptr)
+            self.bytes += tensor.numel() * tensor.element_size()
+        return tensor
+
+    def unpack(self, tensor):
+        return tensor
+
+
+def benchmark(setting, args, device):
+    torch.manual_seed(2020)
+    encoder = TransformerEncoder(
+        args.embedding_size, args.ffn_size, args.num_layers, args.num_heads, 0.1, 0.1, 0.1, checkpoint_layers=setting
+    ).to(device)
+    decoder = TransformerDecoder(
+        args.embedding_size, args.ffn_size, args.num_layers, args.num_heads, 0.1, 0.1, 0.1, checkpoint_layers=setting
+    ).to(device)
+    parameters = list(encoder.parameters()) + list(decoder.parameters())
+    optimizer = torch.optim.Adam(parameters)
+
+    source = torch.randn(args.batch_size, args.source_length, args.embedding_size, device=device)
+    target = torch.randn(args.batch_size, args.target_length, args.embedding_size, device=device)
+    self_attn_mask = SelfAttentionMask()(args.target_length).bool().to(device)
+
+    def step():
+        optimizer.zero_grad()
+        encoder_outputs = encoder(source)
+        decoder_outputs = decoder(target, self_attn_mask=self_attn_mask, external_states=encoder_outputs)
+        loss = decoder_outputs.pow(2).mean()
+        loss.backward()
+        optimizer.step()
+
+    for _ in range(args.warmup):
+        step()
+
+    counter = SavedTensorsCounter(parameters)
+    with torch.autograd.graph.saved_tensors_hooks(counter.pack, counter.unpack):
+        step()
+
+    if device.type == 'cuda':
+        torch.cuda.synchronize(device)
+        torch.cuda.reset_peak_memory_stats(device)
+    start_time = time()
+    for _ in range(args.steps):
+        step()
+    if device.type == 'cuda':
+        torch.cuda.synchronize(device)
+    step_time = (time() - start_time) / args.steps * 1000
+    peak_memory = torch.cuda.max_memory_allocated(device) / 1024 / 1024 if device.type == 'cuda' else None
+    return step_time, counter.bytes / 1024 / 1024, peak_memory
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--settings', type=str, default='0,2,1', help='comma separated values of checkpoint_layers')
+    parser.add_argument('--embedding_size', type=int, default=512)
+    parser.add_argument('--ffn_size', type=int, default=1024)
+    parser.add_argument('--num_layers', type=int, default=6)
+    parser.add_argument('--num_heads', type=int, default=8)
+    parser.add_argument('--batch_size', type=int, default=16)
+    parser.add_argument('--source_length', type=int, default=400)
+    parser.add_argument('--target_length', type=int, default=100)
+    parser.add_argument('--warmup', type=int, default=2)
+    parser.add_argument('--steps', type=int, default=5)
+    parser.add_argument('--use_gpu', action='store_true')
+    parser.add_argument('--threads', type=int, default=None)
+    args, _ = parser.parse_known_args()
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    device = torch.device('cuda' if args.use_gpu and torch.cuda.is_available() else 'cpu')
+
+    rows = []
+    baseline = None
+    for setting in args.settings.split(','):
+        step_time, activation_memory, peak_memory = benchmark(int(setting), args, device)
+        baseline = baseline or (step_time, activation_memory)
+        rows.append((
+            setting, step_time, step_time / baseline[0], activation_memory, baseline[1] / activation_memory,
+            '-' if peak_memory is None else '{:.1f}'.format(peak_memory)
+        ))
+
+    print('{:<12}{:>14}{:>10}{:>18}{:>12}{:>16}'.format(
+        'checkpoint', 'train ms/step', 'slowdown', 'activation MB', 'batch x', 'peak MB'
+    ))
+    for row in rows:
+        print('{:<12}{:>14.2f}{:>10.2f}{:>18.1f}{:>12.2f}{:>16}'.format(*row))
+
+
+if __name__ == '__main__':
+    main()
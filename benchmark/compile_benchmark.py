@@ -0,0 +1,102 @@
+r"""
+Benchmark the ``compile_model`` option on CPU.
+
+For every model, it measures the time of training steps (forward, backward and optimizer step)
+and of generation in each mode, where the speedup is relative to the first mode (eager by default), for example::
+
+    python benchmark/compile_benchmark.py --models=RNN,RNNVAE --dataset=COCO --task_type=unconditional
+    python benchmark/compile_benchmark.py --models=RNNEncDec,TransformerEncDec --dataset=IWSLT14 \
+        --task_type=translation
+"""
+
+import argparse
+import os
+import sys
+from time import time
+
+import torch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from textbox.config import Config
+from textbox.data import data_preparation
+from textbox.utils import get_model, init_seed, compile_model
+
+
+def benchmark(model_name, mode, args):
+    config_dict = {
+        'task_type': args.task_type,
+        'use_gpu': False,
+        'embedding_size': args.hidden_size,
+        'hidden_size': args.hidden_size,
+        'train_batch_size': args.batch_size,
+        'eval_batch_size': args.batch_size,
+        'eval_generate_num': args.generate_num,
+    }
+    config = Config(model=model_name, dataset=args.dataset, config_dict=config_dict)
+    init_seed(config['seed'], config['reproducibility'])
+    train_data, valid_data, test_data = data_preparation(config)
+    model = get_model(config['model'])(config, train_data).to(config['device'])
+    model = compile_model(model, None if mode == 'eager' else mode)
+    optimizer = torch.optim.Adam(model.parameters(), lr=config['learning_rate'])
+
+    model.train()
+    train_time = 0
+    step = 0
+    while step < args.warmup + args.steps:
+        for data in train_data:
+            start_time = time()
+            optimizer.zero_grad()
+            losses = model(data, epoch_idx=0)
+            loss = sum(losses) if isinstance(losses, tuple) else losses
+            loss.backward()
+            optimizer.step()
+            if step >= args.warmup:
+                train_time += time() - start_time
+            step += 1
+            if step == args.warmup + args.steps:
+                break
+
+    model.eval()
+    start_time = time()
+    with torch.no_grad():
+        model.generate(test_data)
+    generate_time = time() - start_time
+    return train_time / args.steps * 1000, generate_time
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--models', type=str, default='RNN,RNNVAE', help='comma separated model names')
+    parser.add_argument('--dataset', type=str, default='COCO', help='name of dataset')
+    parser.add_argument('--task_type', type=str, default='unconditional', help='name of task')
+    parser.add_argument('--modes', type=str, default='eager,compile,torchscript', help='comma separated modes')
+    parser.add_argument('--hidden_size', type=int, default=128)
+    parser.add_argument('--batch_size', type=int, default=32)
+    parser.add_argument('--generate_num', type=int, default=256)
+    parser.add_argument('--warmup', type=int, default=5)
+    parser.add_argument('--steps', type=int, default=20)
+    parser.add_argument('--threads', type=int, default=None)
+    args, _ = parser.parse_known_args()
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    rows = []
+    for model_name in args.models.split(','):
+        eager_result = None
+        for mode in args.modes.split(','):
+            step_ms, generate_s = benchmark(model_name, mode, args)
+            eager_result = eager_result or (step_ms, generate_s)
+            rows.append((
+                model_name, mode, step_ms, eager_result[0] / step_ms, generate_s, eager_result[1] / generate_s
+            ))
+
+    print('{:<20}{:<14}{:>14}{:>10}{:>16}{:>10}'.format(
+        'model', 'mode', 'train ms/step', 'speedup', 'generate s', 'speedup'
+    ))
+    for row in rows:
+        print('{:<20}{:<14}{:>14.2f}{:>10.2f}{:>16.2f}{:>10.2f}'.format(*row))
+
+
+if __name__ == '__main__':
+    main()
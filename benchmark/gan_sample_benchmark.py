@@ -0,0 +1,126 @@
+r"""
+Benchmark the fake data sampling of a discriminator epoch of GAN models.
+
+Every discriminator epoch samples ``d_sample_num`` sentences from the generator. A randomly initialized
+:class:`~textbox.module.Generator.SeqGANGenerator.SeqGANGenerator` samples them once with the former per-row loop, which
+draws every token of every sentence by its own ``torch.multinomial`` call and pads every sentence after its eos one by
+one, and once with the vectorized ``sample()``. It reports the time of both and the average length of sentences, and
+exits with code 1 if any token after the first eos of a sentence is not padding, for example::
+
+    python benchmark/gan_sample_benchmark.py --d_sample_num=10000 --batch_size=64 --vocab_size=5000
+"""
+
+import argparse
+import math
+import os
+import sys
+from time import time
+from types import SimpleNamespace
+
+import torch
+import torch.nn.functional as F
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from textbox.utils import init_seed
+from textbox.module.Generator.SeqGANGenerator import SeqGANGenerator
+from textbox.module.strategy import after_eos_mask
+
+PAD_TOKEN_IDX = 0
+SOS_TOKEN_IDX = 1
+EOS_TOKEN_IDX = 2
+
+
+def loop_sample_batch(generator):
+    r"""The former ``_sample_batch`` of :class:`SeqGANGenerator`, which samples every row separately."""
+    with torch.no_grad():
+        batch_size = generator.batch_size
+        h_prev = torch.zeros(1, batch_size, generator.hidden_size, device=generator.device)
+        o_prev = torch.zeros(1, batch_size, generator.hidden_size, device=generator.device)
+        prev_state = (h_prev, o_prev)
+        X = generator.word_embedding(
+            torch.tensor([SOS_TOKEN_IDX] * batch_size, dtype=torch.long, device=generator.device)
+        ).unsqueeze(0)
+        sentences = torch.zeros((generator.max_length, batch_size), dtype=torch.long, device=generator.device)
+        sentences[0] = SOS_TOKEN_IDX
+
+        for i in range(1, generator.max_length):
+            output, prev_state = generator.LSTM(X, prev_state)
+            P = F.softmax(generator.vocab_projection(output), dim=-1).squeeze(0)
+            for j in range(batch_size):
+                sentences[i][j] = torch.multinomial(P[j], 1)[0]
+            X = generator.word_embedding(sentences[i]).unsqueeze(0)
+
+        sentences = sentences.permute(1, 0)
+        for i in range(batch_size):
+            end_pos = (sentences[i] == EOS_TOKEN_IDX).nonzero(as_tuple=False)
+            if (end_pos.shape[0]):
+                sentences[i][end_pos[0][0] + 1:] = PAD_TOKEN_IDX
+    return sentences
+
+
+def loop_sample(generator, sample_num):
+    samples = [loop_sample_batch(generator) for _ in range(math.ceil(sample_num / generator.batch_size))]
+    return torch.cat(samples, dim=0)[:sample_num, :]
+
+
+def benchmark(sample, generator, args, device):
+    elapsed_time = None
+    for _ in range(args.repeat):
+        start_time = time()
+        samples = sample(generator, args.d_sample_num)
+        if device.type == 'cuda':
+            torch.cuda.synchronize(device)
+        run_time = time() - start_time
+        elapsed_time = run_time if elapsed_time is None else min(elapsed_time, run_time)
+    average_length = samples.ne(PAD_TOKEN_IDX).sum().item() / samples.size(0)
+    return elapsed_time, average_length, samples
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--d_sample_num', type=int, default=10000)
+    parser.add_argument('--batch_size', type=int, default=64)
+    parser.add_argument('--vocab_size', type=int, default=5000)
+    parser.add_argument('--embedding_size', type=int, default=32)
+    parser.add_argument('--hidden_size', type=int, default=32)
+    parser.add_argument('--max_seq_length', type=int, default=40)
+    parser.add_argument('--repeat', type=int, default=1, help='number of runs, the fastest one is reported')
+    parser.add_argument('--use_gpu', action='store_true')
+    parser.add_argument('--seed', type=int, default=2020)
+    args, _ = parser.parse_known_args()
+
+    device = torch.device('cuda' if args.use_gpu and torch.cuda.is_available() else 'cpu')
+    config = {
+        'train_batch_size': args.batch_size,
+        'device': device,
+        'hidden_size': args.hidden_size,
+        'generator_embedding_size': args.embedding_size,
+        'max_seq_length': args.max_seq_length,
+        'Monte_Carlo_num': 1,
+        'eval_generate_num': args.d_sample_num,
+    }
+    dataset = SimpleNamespace(
+        idx2token=list(range(args.vocab_size)),
+        vocab_size=args.vocab_size,
+        sos_token_idx=SOS_TOKEN_IDX,
+        eos_token_idx=EOS_TOKEN_IDX,
+        padding_token_idx=PAD_TOKEN_IDX
+    )
+    init_seed(args.seed, True)
+    generator = SeqGANGenerator(config, dataset).to(device)
+
+    loop_time, loop_length, _ = benchmark(loop_sample, generator, args, device)
+    batch_time, batch_length, samples = benchmark(SeqGANGenerator.sample, generator, args, device)
+    padded = samples[after_eos_mask(samples, EOS_TOKEN_IDX)].eq(PAD_TOKEN_IDX).all().item()
+
+    print('{:<16}{:>12}{:>12}'.format('sampling', 'time (s)', 'avg length'))
+    print('{:<16}{:>12.3f}{:>12.2f}'.format('per-row loop', loop_time, loop_length))
+    print('{:<16}{:>12.3f}{:>12.2f}'.format('vectorized', batch_time, batch_length))
+    print('speedup: {:.2f}x'.format(loop_time / batch_time))
+    print('padded after eos: {}'.format(padded))
+    sys.exit(0 if padded else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+r"""
+Benchmark the startup import time of ``run_textbox.py`` by ``python -X importtime``, and guard its budget.
+
+It imports the modules of ``run_textbox.py`` in a fresh interpreter several times, and reports the total import time
+(the best of runs), the slowest top-level imports, and the time spent in ``textbox`` itself. It exits with code 1 if
+the import time exceeds ``--budget_ms``, or if a heavy dependency which should be loaded on first use (``--lazy``)
+is imported at startup, so it can be used as a check in CI, for example::
+
+    python benchmark/import_benchmark.py --budget_ms=5000
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def measure(statement):
+    r"""Run ``statement`` with ``-X importtime`` in a fresh interpreter.
+
+    Returns:
+        list: (module, self time in us, cumulative time in us, depth) of every import
+    """
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', statement],
+                            cwd=ROOT,
+                            stdout=subprocess.PIPE,
+                            stderr=subprocess.PIPE,
+                            universal_newlines=True)
+    if result.returncode != 0:
+        raise RuntimeError('Failed to run {}:\n{}'.format(statement, result.stderr))
+
+    records = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_time, cumulative_time, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        records.append((name.strip(), int(self_time), int(cumulative_time), depth))
+    return records
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        '--statement', type=str, default='import run_textbox', help='the python statement to measure'
+    )
+    parser.add_argument('--repeat', type=int, default=3, help='number of runs, the fastest one is reported')
+    parser.add_argument('--top', type=int, default=15, help='number of slowest top-level imports to report')
+    parser.add_argument('--budget_ms', type=float, default=None, help='budget of the total import time in ms')
+    parser.add_argument(
+        '--lazy',
+        type=str,
+        default='matplotlib,fast_bleu,rouge,transformers,nltk',
+        help='comma separated modules which should not be imported at startup'
+    )
+    args, _ = parser.parse_known_args()
+
+    runs = [measure(args.statement) for _ in range(args.repeat)]
+    total_times = [sum(record[2] for record in records if record[3] == 0) for records in runs]
+    records = runs[total_times.index(min(total_times))]
+    total_time = min(total_times) / 1000
+    textbox_time = sum(record[1] for record in records if record[0].split('.')[0] == 'textbox') / 1000
+
+    print('import time of `{}`: {:.1f} ms (textbox itself: {:.1f} ms)'.format(args.statement, total_time, textbox_time))
+    print('{:<50}{:>16}'.format('top-level import', 'cumulative ms'))
+    top_level = sorted((record for record in records if record[3] == 0), key=lambda record: -record[2])
+    for name, _, cumulative_time, _ in top_level[:args.top]:
+        print('{:<50}{:>16.1f}'.format(name, cumulative_time / 1000))
+
+    failed = False
+    imported = set(record[0] for record in records)
+    lazy_modules = [module for module in args.lazy.split(',') if module]
+    eager_modules = [module for module in lazy_modules if module in imported]
+    if eager_modules:
+        failed = True
+        print('FAILED: {} should be imported on first use instead of at startup'.format(', '.join(eager_modules)))
+    if args.budget_ms is not None and total_time > args.budget_ms:
+        failed = True
+        print('FAILED: import time {:.1f} ms exceeds the budget {:.1f} ms'.format(total_time, args.budget_ms))
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+r"""
+Benchmark the incremental key/value cache of :class:`~textbox.module.Decoder.transformer_decoder.TransformerDecoder`.
+
+A randomly initialized decoder greedily decodes a batch of random encoder outputs for ``--length`` steps, once by
+re-running the whole prefix at every step and once by feeding only the newest token with the cache, where the keys and
+values of encoder outputs are projected once. Every encoder output is decoded by ``--group_size`` sequences, which
+share it in the cache as the hypotheses of beam search do, and are repeated for re-running. It reports the time of
+both, the max absolute difference of their logits and whether the decoded tokens are identical, and exits with code 1
+if the tokens differ, for example::
+
+    python benchmark/kv_cache_benchmark.py --batch_size=32 --length=100 --num_layers=6
+"""
+
+import argparse
+import os
+import sys
+from time import time
+
+import torch
+import torch.nn as nn
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from textbox.utils import init_seed
+from textbox.module.Decoder.transformer_decoder import TransformerDecoder
+from textbox.module.Embedder.position_embedder import SinusoidalPositionalEmbedding
+from textbox.module.Attention.attention_mechanism import SelfAttentionMask
+
+SOS_TOKEN_IDX = 1
+
+
+class Decoder(nn.Module):
+
+    def __init__(self, args):
+        super(Decoder, self).__init__()
+        self.token_embedder = nn.Embedding(args.vocab_size, args.embedding_size)
+        self.position_embedder = SinusoidalPositionalEmbedding(args.embedding_size)
+        self.self_attn_mask = SelfAttentionMask()
+        self.decoder = TransformerDecoder(
+            args.embedding_size, args.ffn_size, args.num_layers, args.num_heads, with_external=True
+        )
+        self.vocab_linear = nn.Linear(args.embedding_size, args.vocab_size)
+
+    def full_recompute(self, encoder_outputs, length, group_size):
+        encoder_outputs = encoder_outputs.repeat_interleave(group_size, dim=0)
+        input_seq = torch.full((encoder_outputs.size(0), 1), SOS_TOKEN_IDX, dtype=torch.long)
+        token_logits = []
+        for _ in range(length):
+            self_attn_mask = self.self_attn_mask(input_seq.size(-1)).bool()
+            decoder_input = self.token_embedder(input_seq) + self.position_embedder(input_seq)
+            decoder_outputs = self.decoder(
+                decoder_input, self_attn_mask=self_attn_mask, external_states=encoder_outputs
+            )
+            token_logits.append(self.vocab_linear(decoder_outputs[:, -1, :]))
+            input_seq = torch.cat([input_seq, token_logits[-1].argmax(dim=-1, keepdim=True)], dim=1)
+        return torch.stack(token_logits, dim=1), input_seq
+
+    def incremental(self, encoder_outputs, length, group_size):
+        batch_size = encoder_outputs.size(0) * group_size
+        input_seq = torch.full((batch_size, 1), SOS_TOKEN_IDX, dtype=torch.long)
+        cache = self.decoder.init_cache(batch_size, length, encoder_outputs)
+        generate_idx = [input_seq]
+        token_logits = []
+        for gen_idx in range(length):
+            decoder_input = self.token_embedder(input_seq) + self.position_embedder(input_seq, offset=gen_idx)
+            decoder_outputs = self.decoder(
+                decoder_input, external_states=encoder_outputs, cache=cache, position=gen_idx
+            )
+            token_logits.append(self.vocab_linear(decoder_outputs[:, -1, :]))
+            input_seq = token_logits[-1].argmax(dim=-1, keepdim=True)
+            generate_idx.append(input_seq)
+        return torch.stack(token_logits, dim=1), torch.cat(generate_idx, dim=1)
+
+
+def benchmark(decode, encoder_outputs, args):
+    elapsed_time = None
+    for _ in range(args.repeat):
+        start_time = time()
+        with torch.no_grad():
+            token_logits, generate_idx = decode(encoder_outputs, args.length, args.group_size)
+        run_time = time() - start_time
+        elapsed_time = run_time if elapsed_time is None else min(elapsed_time, run_time)
+    return elapsed_time, token_logits, generate_idx
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--batch_size', type=int, default=32)
+    parser.add_argument('--source_length', type=int, default=50)
+    parser.add_argument('--length', type=int, default=100, help='number of decoding steps')
+    parser.add_argument('--group_size', type=int, default=1, help='number of sequences sharing every encoder output')
+    parser.add_argument('--vocab_size', type=int, default=10000)
+    parser.add_argument('--embedding_size', type=int, default=512)
+    parser.add_argument('--ffn_size', type=int, default=2048)
+    parser.add_argument('--num_layers', type=int, default=6)
+    parser.add_argument('--num_heads', type=int, default=8)
+    parser.add_argument('--repeat', type=int, default=3, help='number of runs, the fastest one is reported')
+    parser.add_argument('--threads', type=int, default=None)
+    parser.add_argument('--seed', type=int, default=2020)
+    args, _ = parser.parse_known_args()
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    init_seed(args.seed, True)
+    decoder = Decoder(args).eval()
+    encoder_outputs = torch.randn(args.batch_size, args.source_length, args.embedding_size)
+
+    full_time, full_logits, full_idx = benchmark(decoder.full_recompute, encoder_outputs, args)
+    cache_time, cache_logits, cache_idx = benchmark(decoder.incremental, encoder_outputs, args)
+    identical = torch.equal(full_idx, cache_idx)
+
+    print('{:<16}{:>12}{:>12}'.format('decoding', 'time (s)', 'speedup'))
+    print('{:<16}{:>12.3f}{:>12.2f}'.format('full recompute', full_time, 1.0))
+    print('{:<16}{:>12.3f}{:>12.2f}'.format('kv cache', cache_time, full_time / cache_time))
+    print('max abs logit difference: {:.3e}'.format((full_logits - cache_logits).abs().max().item()))
+    print('identical tokens: {}'.format(identical))
+    sys.exit(0 if identical else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,156 @@
+r"""
+Check and benchmark the discriminator features of :class:`~textbox.module.Generator.LeakGANGenerator.LeakGANGenerator`.
+
+The manager of LeakGAN reads the feature of the partial sentence at every step, which was extracted by calling the
+CNN discriminator once per step, and is now extracted for the partial sentences of all steps by one call. A randomly
+initialized generator and discriminator run a pretraining step (``leakgan_forward``, the pretraining losses and their
+backward) on the same random sentences with both. It reports the time of both and the max absolute difference of the
+worker outputs, features and goals, and exits with code 1 if any difference exceeds ``--tolerance``, for example::
+
+    python benchmark/leakgan_feature_benchmark.py --batch_size=64 --max_seq_length=40 --vocab_size=5000
+"""
+
+import argparse
+import os
+import sys
+from time import time
+from types import SimpleNamespace
+
+import torch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from textbox.utils import init_seed
+from textbox.module.Generator.LeakGANGenerator import LeakGANGenerator
+from textbox.module.Discriminator.LeakGANDiscriminator import LeakGANDiscriminator
+
+PAD_TOKEN_IDX = 0
+SOS_TOKEN_IDX = 1
+EOS_TOKEN_IDX = 2
+
+
+def loop_leakgan_forward(generator, targets, dis, train=False, pretrain=False):
+    r"""The former ``leakgan_forward``, which calls the discriminator on the partial sentence of every step."""
+    batch_size, seq_len = targets.size()
+    device = generator.device
+
+    feature_array = torch.zeros((batch_size, generator.max_length + 1, generator.goal_out_size), device=device)
+    goal_array = torch.zeros((batch_size, generator.max_length + 1, generator.goal_out_size), device=device)
+    leak_out_array = torch.zeros((batch_size, generator.max_length + 1, generator.vocab_size), device=device)
+
+    work_hidden = generator.init_hidden(batch_size)
+    mana_hidden = generator.init_hidden(batch_size)
+    leak_inp_t = torch.full((batch_size, ), SOS_TOKEN_IDX, dtype=torch.long, device=device)
+    cur_dis_inp = torch.full((batch_size, seq_len), PAD_TOKEN_IDX, dtype=torch.long, device=device)
+
+    real_goal = generator.goal_init[:batch_size, :]
+    goal_array[:, 0, :] = real_goal
+    feature = dis.get_feature(cur_dis_inp).unsqueeze(0)
+    feature_array[:, 0, :] = feature.squeeze(0)
+    _, mana_hidden = generator.manager(feature, mana_hidden)
+
+    for i in range(1, generator.max_length + 1):
+        cur_dis_inp = torch.cat([targets[:, :i], cur_dis_inp], dim=1)[:, :seq_len]
+        feature = dis.get_feature(cur_dis_inp).unsqueeze(0)
+        feature_array[:, i, :] = feature.squeeze(0)
+        out, cur_goal, work_hidden, mana_hidden = generator.forward(
+            i, leak_inp_t, work_hidden, mana_hidden, feature, real_goal, train=train, pretrain=pretrain
+        )
+        leak_out_array[:, i - 1, :] = out
+        goal_array[:, i, :] = cur_goal
+        if i % generator.step_size == 0:
+            real_goal = torch.sum(goal_array[:, i - 3:i + 1, :], dim=1)
+        leak_inp_t = targets[:, i - 1]
+
+    return leak_out_array[:, :seq_len, :], feature_array, goal_array
+
+
+def pretrain_step(forward, generator, targets, dis):
+    r"""Run ``forward`` and the backward of the pretraining losses of :meth:`LeakGANGenerator.pretrain_loss`."""
+    generator.zero_grad()
+    leak_out_array, feature_array, goal_array = forward(generator, targets, dis, train=False, pretrain=True)
+    outputs = [leak_out_array.detach(), feature_array.detach(), goal_array.detach()]
+    mana_cos_loss = generator.manager_cos_loss(targets.size(0), feature_array, goal_array)
+    manager_loss = -torch.sum(mana_cos_loss) / (generator.batch_size * generator.max_length / generator.step_size)
+    work_cn_loss = generator.worker_cross_entropy_loss(targets, leak_out_array)
+    (manager_loss + work_cn_loss).backward()
+    return outputs
+
+
+def benchmark(forward, generator, targets, dis, args, device):
+    elapsed_time = None
+    for _ in range(args.repeat):
+        start_time = time()
+        outputs = pretrain_step(forward, generator, targets, dis)
+        if device.type == 'cuda':
+            torch.cuda.synchronize(device)
+        run_time = time() - start_time
+        elapsed_time = run_time if elapsed_time is None else min(elapsed_time, run_time)
+    return elapsed_time, outputs
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--batch_size', type=int, default=64)
+    parser.add_argument('--vocab_size', type=int, default=5000)
+    parser.add_argument('--max_seq_length', type=int, default=40)
+    parser.add_argument('--tolerance', type=float, default=1e-4)
+    parser.add_argument('--repeat', type=int, default=3, help='number of runs, the fastest one is reported')
+    parser.add_argument('--use_gpu', action='store_true')
+    parser.add_argument('--seed', type=int, default=2020)
+    args, _ = parser.parse_known_args()
+
+    device = torch.device('cuda' if args.use_gpu and torch.cuda.is_available() else 'cpu')
+    config = {
+        'train_batch_size': args.batch_size,
+        'device': device,
+        'hidden_size': 32,
+        'generator_embedding_size': 32,
+        'discriminator_embedding_size': 64,
+        'max_seq_length': args.max_seq_length,
+        'Monte_Carlo_num': 4,
+        'filter_sizes': [2, 3],
+        'filter_nums': [100, 200],
+        'goal_size': 16,
+        'step_size': 4,
+        'temperature': 1.5,
+        'dropout_rate': 0.25,
+        'l2_reg_lambda': 0.2,
+        'd_sample_num': args.batch_size,
+        'eval_generate_num': args.batch_size,
+    }
+    dataset = SimpleNamespace(
+        idx2token=list(range(args.vocab_size)),
+        vocab_size=args.vocab_size,
+        batch_size=args.batch_size,
+        sos_token_idx=SOS_TOKEN_IDX,
+        eos_token_idx=EOS_TOKEN_IDX,
+        padding_token_idx=PAD_TOKEN_IDX
+    )
+    init_seed(args.seed, True)
+    generator = LeakGANGenerator(config, dataset).to(device)
+    dis = LeakGANDiscriminator(config, dataset).to(device).eval()  # as in LeakGAN.calculate_g_train_loss
+    targets = torch.randint(
+        EOS_TOKEN_IDX + 1, args.vocab_size, (args.batch_size, args.max_seq_length + 1), device=device
+    )  # corpus without sos
+
+    loop_time, loop_outputs = benchmark(loop_leakgan_forward, generator, targets, dis, args, device)
+    batch_time, batch_outputs = benchmark(LeakGANGenerator.leakgan_forward, generator, targets, dis, args, device)
+
+    print('{:<16}{:>12}'.format('features', 'time (ms)'))
+    print('{:<16}{:>12.3f}'.format('per step', loop_time * 1000))
+    print('{:<16}{:>12.3f}'.format('batched', batch_time * 1000))
+    print('speedup: {:.2f}x'.format(loop_time / batch_time))
+
+    failed = False
+    for name, loop_value, batch_value in zip(['worker outputs', 'features', 'goals'], loop_outputs, batch_outputs):
+        difference = (loop_value - batch_value).abs().max().item()
+        print('max abs difference of {}: {:.3e}'.format(name, difference))
+        failed = failed or difference > args.tolerance
+    if failed:
+        print('FAILED: difference exceeds {}'.format(args.tolerance))
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+r"""
+Validate the dynamic int8 quantization (the ``quantize`` option) of a trained model on its test set.
+
+The model is rebuilt from the config and parameters of a checkpoint saved by the trainer, and ``generate()`` is run on
+the test data in fp32 and after dynamic int8 quantization on CPU. It reports the metrics of the task (BLEU for
+translation, ROUGE for summarization, etc.) of both models with their drift, the time of ``generate()`` with the
+speedup, and the size of checkpoints. It exits with code 1 if the absolute drift of any metric exceeds ``--max_drift``,
+for example::
+
+    python benchmark/quantize_benchmark.py --model_file=saved/RNNEncDec-IWSLT14-xxx.pth --max_drift=0.01
+"""
+
+import argparse
+import io
+import os
+import sys
+from time import time
+
+import torch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from textbox.utils import get_model, get_trainer, init_seed, quantize_model
+from textbox.data import data_preparation
+
+
+def checkpoint_size(model):
+    buffer = io.BytesIO()
+    torch.save(model.state_dict(), buffer)
+    return buffer.tell() / 1024 / 1024
+
+
+def benchmark(model, trainer, test_data, config, repeat):
+    r"""Generate the test data ``repeat`` times with the same seed.
+
+    Returns:
+        tuple: the eval result and the fastest time of ``generate()`` in seconds
+    """
+    elapsed_time = None
+    for _ in range(repeat):
+        init_seed(config['seed'], config['reproducibility'])
+        start_time = time()
+        with torch.no_grad():
+            generate_corpus = model.generate(test_data)
+        run_time = time() - start_time
+        elapsed_time = run_time if elapsed_time is None else min(elapsed_time, run_time)
+    result = trainer.evaluator.evaluate(generate_corpus, test_data.get_reference())
+    return result, elapsed_time
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--model_file', type=str, required=True, help='the checkpoint saved by the trainer')
+    parser.add_argument('--repeat', type=int, default=1, help='number of runs, the fastest one is reported')
+    parser.add_argument('--max_drift', type=float, default=None, help='max absolute drift of every metric')
+    parser.add_argument('--threads', type=int, default=None)
+    args, _ = parser.parse_known_args()
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    checkpoint = torch.load(args.model_file, map_location='cpu')
+    if checkpoint.get('quantized', False):
+        raise ValueError('{} is already quantized, please use the float checkpoint.'.format(args.model_file))
+    config = checkpoint['config']
+    config['device'] = torch.device('cpu')
+    init_seed(config['seed'], config['reproducibility'])
+    train_data, valid_data, test_data = data_preparation(config)
+
+    model = get_model(config['model'])(config, train_data)
+    model.load_state_dict(checkpoint['state_dict'])
+    model.eval()
+    trainer = get_trainer(config['MODEL_TYPE'], config['model'])(config, model)
+
+    fp32_size = checkpoint_size(model)
+    fp32_result, fp32_time = benchmark(model, trainer, test_data, config, args.repeat)
+    quantize_model(model)
+    int8_size = checkpoint_size(model)
+    int8_result, int8_time = benchmark(model, trainer, test_data, config, args.repeat)
+
+    print('{:<16}{:>12}{:>12}{:>12}'.format('metric', 'fp32', 'int8', 'drift'))
+    failed = False
+    for key, value in fp32_result.items():
+        drift = int8_result[key] - value
+        print('{:<16}{:>12.4f}{:>12.4f}{:>+12.4f}'.format(key, value, int8_result[key], drift))
+        if args.max_drift is not None and abs(drift) > args.max_drift:
+            failed = True
+    print('{:<16}{:>12.2f}{:>12.2f}{:>11.2f}x'.format('generate (s)', fp32_time, int8_time, fp32_time / int8_time))
+    print('{:<16}{:>12.1f}{:>12.1f}{:>11.2f}x'.format('checkpoint (MB)', fp32_size, int8_size, fp32_size / int8_size))
+
+    if failed:
+        print('FAILED: metric drift exceeds {}'.format(args.max_drift))
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,144 @@
+r"""
+Check and benchmark the REINFORCE objective of :class:`~textbox.module.Generator.MaskGANGenerator.MaskGANGenerator`.
+
+The cumulative discounted returns and advantages of the objective were computed by nested loops over timesteps, and
+are now computed by one product with the discount matrix. Both are run on the same random log probabilities,
+discriminator predictions, masks and estimated values. It reports the time of both and the max absolute difference of
+the returns, the generator objective and the critic loss, and exits with code 1 if any difference exceeds
+``--tolerance``, for example::
+
+    python benchmark/reinforce_objective_benchmark.py --batch_size=64 --seq_len=40 --gamma=0.9
+"""
+
+import argparse
+import os
+import sys
+from time import time
+from types import SimpleNamespace
+
+import numpy as np
+import torch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from textbox.utils import init_seed
+from textbox.module.Generator.MaskGANGenerator import MaskGANGenerator
+
+
+def loop_reinforce_objective(generator, log_probs, dis_predictions, mask_present, estimated_values):
+    r"""The former ``calculate_reinforce_objective`` with nested loops over timesteps.
+
+    Returns:
+        tuple: the generator objective, the critic loss and the cumulative discounted returns
+    """
+    eps = torch.tensor(1e-7)
+    dis_predictions = torch.sigmoid(dis_predictions)
+    rewards = torch.log(dis_predictions + eps)
+    device = dis_predictions.device
+
+    zeros = torch.zeros_like(mask_present, dtype=torch.float32)
+    log_probs = torch.where(mask_present, zeros, log_probs)
+    rewards = torch.where(mask_present, zeros, rewards)
+    rewards = rewards.detach()
+    missing = 1. - mask_present.float()
+
+    cumulative_rewards = []
+    batch_size, seq_len = dis_predictions.size()
+    for t in range(seq_len):
+        cum_value = torch.zeros((batch_size, 1), device=device)
+        for s in range(t, seq_len):
+            cum_value_tmp = missing[:, s] * np.power(generator.gamma, (s - t)) * rewards[:, s]
+            cum_value += cum_value_tmp.unsqueeze(dim=1)
+        cumulative_rewards.append(cum_value)
+    cumulative_rewards = torch.stack(cumulative_rewards, dim=1).squeeze()
+
+    cumulative_rewards = cumulative_rewards.detach()
+    critic_loss = generator.create_critic_loss(cumulative_rewards, estimated_values, mask_present)
+    baselines = estimated_values.detach()
+
+    final_gen_objective = torch.zeros([batch_size, 1], device=device)
+    for t in range(seq_len):
+        log_probability = log_probs[:, t].unsqueeze(dim=1)
+        cum_advantage = torch.zeros((batch_size, 1), device=device)
+        for s in range(t, seq_len):
+            cum_advantage_tmp = missing[:, s] * np.power(generator.gamma, (s - t)) * rewards[:, s]
+            cum_advantage = cum_advantage + cum_advantage_tmp.unsqueeze(dim=1)
+        cum_advantage = cum_advantage - baselines[:, t].unsqueeze(dim=1)
+        cum_advantage = torch.clamp(cum_advantage, -generator.advantage_clipping, generator.advantage_clipping)
+        final_gen_objective = final_gen_objective + torch.mul(
+            log_probability, missing[:, t].unsqueeze(dim=1) * cum_advantage.detach()
+        )
+    final_gen_objective = -torch.sum(final_gen_objective) / (torch.sum(missing))
+
+    return final_gen_objective, critic_loss, cumulative_rewards
+
+
+def vectorized_reinforce_objective(generator, log_probs, dis_predictions, mask_present, estimated_values):
+    final_gen_objective, critic_loss = MaskGANGenerator.calculate_reinforce_objective(
+        generator, log_probs, dis_predictions, mask_present, estimated_values
+    )
+    rewards = torch.log(torch.sigmoid(dis_predictions) + 1e-7).masked_fill(mask_present, 0)
+    cumulative_rewards = generator.discounted_returns(rewards, generator.gamma)
+    return final_gen_objective, critic_loss, cumulative_rewards
+
+
+def benchmark(objective, generator, inputs, args, device):
+    elapsed_time = None
+    for _ in range(args.repeat):
+        start_time = time()
+        outputs = objective(generator, *inputs)
+        if device.type == 'cuda':
+            torch.cuda.synchronize(device)
+        run_time = time() - start_time
+        elapsed_time = run_time if elapsed_time is None else min(elapsed_time, run_time)
+    return elapsed_time, outputs
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--batch_size', type=int, default=64)
+    parser.add_argument('--seq_len', type=int, default=40)
+    parser.add_argument('--gamma', type=float, default=0.9, help='the discount rate (rl_discount_rate)')
+    parser.add_argument('--advantage_clipping', type=float, default=5.0)
+    parser.add_argument('--present_rate', type=float, default=0.5)
+    parser.add_argument('--tolerance', type=float, default=1e-4)
+    parser.add_argument('--repeat', type=int, default=3, help='number of runs, the fastest one is reported')
+    parser.add_argument('--use_gpu', action='store_true')
+    parser.add_argument('--seed', type=int, default=2020)
+    args, _ = parser.parse_known_args()
+
+    device = torch.device('cuda' if args.use_gpu and torch.cuda.is_available() else 'cpu')
+    init_seed(args.seed, True)
+    generator = SimpleNamespace(gamma=args.gamma, advantage_clipping=args.advantage_clipping)
+    generator.create_critic_loss = lambda *inputs: MaskGANGenerator.create_critic_loss(generator, *inputs)
+    generator.discounted_returns = MaskGANGenerator.discounted_returns
+
+    shape = (args.batch_size, args.seq_len)
+    inputs = (
+        -torch.rand(shape, device=device) * 10,  # log probabilities
+        torch.randn(shape, device=device) * 3,  # discriminator predictions
+        torch.rand(shape, device=device) < args.present_rate,  # mask of present tokens
+        torch.randn(shape, device=device),  # estimated values
+    )
+
+    loop_time, loop_outputs = benchmark(loop_reinforce_objective, generator, inputs, args, device)
+    vectorized_time, vectorized_outputs = benchmark(vectorized_reinforce_objective, generator, inputs, args, device)
+
+    print('{:<16}{:>12}'.format('objective', 'time (ms)'))
+    print('{:<16}{:>12.3f}'.format('loop', loop_time * 1000))
+    print('{:<16}{:>12.3f}'.format('vectorized', vectorized_time * 1000))
+    print('speedup: {:.2f}x'.format(loop_time / vectorized_time))
+
+    failed = False
+    for name, loop_value, vectorized_value in zip(['generator objective', 'critic loss', 'returns'], loop_outputs,
+                                                  vectorized_outputs):
+        difference = (loop_value - vectorized_value).abs().max().item()
+        print('max abs difference of {}: {:.3e}'.format(name, difference))
+        failed = failed or difference > args.tolerance
+    if failed:
+        print('FAILED: difference exceeds {}'.format(args.tolerance))
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+r"""
+Benchmark the fake sample replay buffer of the discriminator epochs of :class:`~textbox.trainer.trainer.GANTrainer`.
+
+Every discriminator epoch trains on ``d_sample_num`` fake samples of the generator. A randomly initialized
+:class:`~textbox.module.Generator.SeqGANGenerator.SeqGANGenerator` fills the buffer of ``--d_epochs`` discriminator
+epochs once with all samples renewed every epoch (``d_replay_refresh_ratio=1.0``, the former behaviour) and once with
+``--refresh_ratio`` and ``--max_age``. It reports the time of both and the number of new and the max age of samples
+per epoch, and exits with code 1 if the buffer does not keep ``d_sample_num`` samples or keeps a sample longer than
+``--max_age`` epochs, for example::
+
+    python benchmark/replay_buffer_benchmark.py --d_sample_num=10000 --d_epochs=15 --refresh_ratio=0.25 --max_age=3
+"""
+
+import argparse
+import os
+import sys
+from time import time
+from types import SimpleNamespace
+
+import torch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from textbox.utils import init_seed
+from textbox.module.Generator.SeqGANGenerator import SeqGANGenerator
+from textbox.trainer.replay_buffer import ReplayBuffer
+
+PAD_TOKEN_IDX = 0
+SOS_TOKEN_IDX = 1
+EOS_TOKEN_IDX = 2
+
+
+def benchmark(generator, args, refresh_ratio, max_age, device):
+    r"""Run the sampling of ``--d_epochs`` discriminator epochs through a replay buffer.
+
+    Returns:
+        tuple: the elapsed time, the total number of new samples and whether the buffer kept its invariants
+    """
+    buffer = ReplayBuffer(args.d_sample_num, refresh_ratio, max_age)
+    sample_num = []
+
+    def sample_func(num):
+        sample_num.append(num)
+        return generator.sample(num)
+
+    valid = True
+    start_time = time()
+    for _ in range(args.d_epochs):
+        samples = buffer.update(sample_func)
+        valid = valid and samples.size(0) == args.d_sample_num and len(buffer) == args.d_sample_num
+        valid = valid and (not max_age or buffer.ages.max().item() < max_age)
+    if device.type == 'cuda':
+        torch.cuda.synchronize(device)
+    return time() - start_time, sum(sample_num), valid
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--d_sample_num', type=int, default=10000)
+    parser.add_argument('--d_epochs', type=int, default=15, help='number of discriminator epochs')
+    parser.add_argument('--refresh_ratio', type=float, default=0.25, help='d_replay_refresh_ratio')
+    parser.add_argument('--max_age', type=int, default=3, help='d_replay_max_age')
+    parser.add_argument('--batch_size', type=int, default=64)
+    parser.add_argument('--vocab_size', type=int, default=5000)
+    parser.add_argument('--embedding_size', type=int, default=32)
+    parser.add_argument('--hidden_size', type=int, default=32)
+    parser.add_argument('--max_seq_length', type=int, default=40)
+    parser.add_argument('--use_gpu', action='store_true')
+    parser.add_argument('--seed', type=int, default=2020)
+    args, _ = parser.parse_known_args()
+
+    device = torch.device('cuda' if args.use_gpu and torch.cuda.is_available() else 'cpu')
+    config = {
+        'train_batch_size': args.batch_size,
+        'device': device,
+        'hidden_size': args.hidden_size,
+        'generator_embedding_size': args.embedding_size,
+        'max_seq_length': args.max_seq_length,
+        'Monte_Carlo_num': 1,
+        'eval_generate_num': args.d_sample_num,
+    }
+    dataset = SimpleNamespace(
+        idx2token=list(range(args.vocab_size)),
+        vocab_size=args.vocab_size,
+        sos_token_idx=SOS_TOKEN_IDX,
+        eos_token_idx=EOS_TOKEN_IDX,
+        padding_token_idx=PAD_TOKEN_IDX
+    )
+    init_seed(args.seed, True)
+    generator = SeqGANGenerator(config, dataset).to(device)
+
+    full_time, full_num, full_valid = benchmark(generator, args, 1.0, None, device)
+    replay_time, replay_num, replay_valid = benchmark(generator, args, args.refresh_ratio, args.max_age, device)
+
+    print('{:<16}{:>12}{:>16}'.format('fake samples', 'time (s)', 'new per epoch'))
+    print('{:<16}{:>12.3f}{:>16.1f}'.format('renewed', full_time, full_num / args.d_epochs))
+    print('{:<16}{:>12.3f}{:>16.1f}'.format('replay buffer', replay_time, replay_num / args.d_epochs))
+    print('speedup: {:.2f}x'.format(full_time / replay_time))
+    valid = full_valid and replay_valid
+    print('buffer kept {} samples and max age {}: {}'.format(args.d_sample_num, args.max_age, valid))
+    sys.exit(0 if valid else 1)
+
+
+if __name__ == '__main__':
+    main()
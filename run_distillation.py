@@ -0,0 +1,22 @@
+import argparse
+
+from textbox.quick_start import run_distillation
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--model', '-m', type=str, default='TransformerEncDec', help='name of the student model')
+    parser.add_argument('--dataset', '-d', type=str, default='IWSLT14', help='name of datasets')
+    parser.add_argument('--task_type', '-t', type=str, default='translation', help='name of tasks')
+    parser.add_argument('--config_files', type=str, default=None, help='config files of the student')
+    parser.add_argument('--teacher_file', type=str, required=True, help='the checkpoint file of the teacher')
+
+    args, _ = parser.parse_known_args()
+
+    config_file_list = args.config_files.strip().split(' ') if args.config_files else None
+    run_distillation(
+        model=args.model,
+        dataset=args.dataset,
+        config_file_list=config_file_list,
+        config_dict={'task_type': args.task_type.strip()},
+        teacher_file=args.teacher_file
+    )
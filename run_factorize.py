@@ -0,0 +1,22 @@
+import argparse
+
+from textbox.quick_start import factorize_vocab_layer
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--model_file', type=str, required=True, help='the checkpoint saved by the trainer')
+    parser.add_argument('--rank', '-r', type=int, default=128, help='the rank of the factorized vocab_linear')
+    parser.add_argument('--finetune_epochs', type=int, default=0, help='number of fine-tuning epochs')
+    parser.add_argument('--learning_rate', type=float, default=None, help='learning rate of fine-tuning')
+    parser.add_argument('--output_file', '-o', type=str, default=None, help='the converted checkpoint')
+
+    args, _ = parser.parse_known_args()
+
+    config_dict = {'learning_rate': args.learning_rate} if args.learning_rate is not None else None
+    factorize_vocab_layer(
+        model_file=args.model_file,
+        rank=args.rank,
+        finetune_epochs=args.finetune_epochs,
+        output_file=args.output_file,
+        config_dict=config_dict
+    )
@@ -0,0 +1,33 @@
+import argparse
+import yaml
+
+from textbox.quick_start import run_sweep
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--model', '-m', type=str, default='RNN', help='name of models')
+    parser.add_argument('--dataset', '-d', type=str, default='COCO', help='name of datasets')
+    parser.add_argument('--task_type', '-t', type=str, default='unconditional', help='name of tasks')
+    parser.add_argument('--config_files', type=str, default=None, help='config files')
+    parser.add_argument('--search_space', '-s', type=str, required=True, help='the YAML file of the search space')
+    parser.add_argument('--search', type=str, default='grid', help='grid or random')
+    parser.add_argument('--num_trials', type=int, default=10, help='number of trials of random search')
+    parser.add_argument('--num_workers', type=int, default=1, help='number of trials run in parallel')
+    parser.add_argument('--output_file', '-o', type=str, default=None, help='the CSV file to write results')
+
+    args, _ = parser.parse_known_args()
+
+    with open(args.search_space, 'r', encoding='utf-8') as f:
+        search_space = yaml.safe_load(f)
+    config_file_list = args.config_files.strip().split(' ') if args.config_files else None
+    run_sweep(
+        model=args.model,
+        dataset=args.dataset,
+        config_file_list=config_file_list,
+        config_dict={'task_type': args.task_type.strip()},
+        search_space=search_space,
+        search=args.search,
+        num_trials=args.num_trials,
+        num_workers=args.num_workers,
+        output_file=args.output_file
+    )
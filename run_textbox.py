@@ -4,7 +4,7 @@
 
 import argparse
 
-from textbox.quick_start import run_textbox
+from textbox.quick_start import run_textbox, run_textbox_distributed
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser()
@@ -12,13 +12,25 @@ if __name__ == '__main__':
     parser.add_argument('--dataset', '-d', type=str, default='COCO', help='name of datasets')
     parser.add_argument('--task_type', '-t', type=str, default='unconditional', help='name of tasks')
     parser.add_argument('--config_files', type=str, default=None, help='config files')
+    parser.add_argument(
+        '--nproc', type=int, default=1, help='number of local processes for distributed training (without torchrun)'
+    )
 
     args, _ = parser.parse_known_args()
 
     config_file_list = args.config_files.strip().split(' ') if args.config_files else None
-    run_textbox(
-        model=args.model,
-        dataset=args.dataset,
-        config_file_list=config_file_list,
-        config_dict={'task_type': args.task_type.strip()}
-    )
+    if args.nproc > 1:
+        run_textbox_distributed(
+            args.nproc,
+            model=args.model,
+            dataset=args.dataset,
+            config_file_list=config_file_list,
+            config_dict={'task_type': args.task_type.strip()}
+        )
+    else:
+        run_textbox(
+            model=args.model,
+            dataset=args.dataset,
+            config_file_list=config_file_list,
+            config_dict={'task_type': args.task_type.strip()}
+        )
@@ -0,0 +1,30 @@
+import argparse
+
+from textbox.quick_start import tune_batch_size
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--model', '-m', type=str, default='RNN', help='name of models')
+    parser.add_argument('--dataset', '-d', type=str, default='COCO', help='name of datasets')
+    parser.add_argument('--task_type', '-t', type=str, default='unconditional', help='name of tasks')
+    parser.add_argument('--config_files', type=str, default=None, help='config files')
+    parser.add_argument('--output_file', '-o', type=str, default=None, help='the YAML file to write batch sizes')
+    parser.add_argument('--min_batch_size', type=int, default=8, help='the first batch size to probe')
+    parser.add_argument('--max_batch_size', type=int, default=4096, help='the largest batch size to probe')
+    parser.add_argument('--probe_steps', type=int, default=3, help='number of measured batches of each probe')
+    parser.add_argument('--memory_limit', type=float, default=None, help='memory limit (MB) of GPU memory or RSS')
+
+    args, _ = parser.parse_known_args()
+
+    config_file_list = args.config_files.strip().split(' ') if args.config_files else None
+    tune_batch_size(
+        model=args.model,
+        dataset=args.dataset,
+        config_file_list=config_file_list,
+        config_dict={'task_type': args.task_type.strip()},
+        output_file=args.output_file,
+        min_batch_size=args.min_batch_size,
+        max_batch_size=args.max_batch_size,
+        steps=args.probe_steps,
+        memory_limit=args.memory_limit
+    )
@@ -1,3 +1,12 @@
 from textbox.data.utils import *
 
 __all__ = ['create_dataset', 'data_preparation']
+
+
+def __getattr__(name):
+    # dataloaders are imported on first use, e.g., ``from textbox.data import PairedSentenceDataLoader``
+    import textbox.data.dataloader as dataloader
+    try:
+        return getattr(dataloader, name)
+    except AttributeError:
+        raise AttributeError("module 'textbox.data' has no attribute '{}'".format(name))
@@ -13,10 +13,12 @@ textbox.data.dataloader.abstract_dataloader
 """
 
 import math
+import random
 import torch
 from logging import getLogger
 
 from textbox.utils.enum_type import SpecialTokens
+from textbox.data.shared import SharedSequence
 
 
 class AbstractDataLoader(object):
@@ -45,6 +47,8 @@ class AbstractDataLoader(object):
         self.step = batch_size
         self.shuffle = shuffle
         self.pr = 0
+        self.sample_order = None
+        self.resumed = False
 
         self.padding_token = SpecialTokens.PAD
         self.unknown_token = SpecialTokens.UNK
@@ -95,8 +99,10 @@ class AbstractDataLoader(object):
         return math.ceil(self.pr_end / self.step)
 
     def __iter__(self):
-        if self.shuffle:
+        # the order of an epoch resumed by :meth:`load_state_dict` has been shuffled before it was interrupted
+        if self.shuffle and not self.resumed:
             self._shuffle()
+        self.resumed = False
         return self
 
     def __next__(self):
@@ -158,7 +164,79 @@ class AbstractDataLoader(object):
     def _shuffle(self):
         r"""Shuffle the order of data, and it will be called by :meth:`__iter__()` if self.shuffle is True.
         """
-        raise NotImplementedError('Method [shuffle] should be implemented.')
+        indices = list(range(self.pr_end))
+        random.shuffle(indices)
+        self._reorder(indices, self.shuffle_data_keys)
+        order = self.sample_order if self.sample_order is not None else range(self.pr_end)
+        self.sample_order = [order[i] for i in indices]
+
+    def _reorder(self, indices, keys=None):
+        r"""Reorder (or select) the samples by ``indices`` in all the attributes of ``keys``.
+
+        Args:
+            indices (list of int): the indices of samples to keep, in the new order.
+            keys (list of str, optional): the attributes to reorder, default: :attr:`sample_data_keys`.
+        """
+        for key in self.sample_data_keys if keys is None else keys:
+            data = getattr(self, key)
+            if isinstance(data, SharedSequence):
+                setattr(self, key, data.select(indices))
+            else:
+                setattr(self, key, [data[i] for i in indices])
+
+    @property
+    def sample_data_keys(self):
+        r"""The names of attributes which store one element per sample, e.g. text data, index data and length data.
+        """
+        raise NotImplementedError('Method [sample_data_keys] should be implemented.')
+
+    @property
+    def shuffle_data_keys(self):
+        r"""The names of attributes which are reordered by :meth:`_shuffle()`, default: :attr:`sample_data_keys`.
+        """
+        return self.sample_data_keys
+
+    def state_dict(self):
+        r"""The position of the dataloader in the current epoch, i.e., the order of samples and :attr:`pr`, so that
+        an interrupted epoch can be continued by :meth:`load_state_dict()`.
+
+        Returns:
+            dict: the state of the dataloader
+        """
+        order = self.sample_order if self.sample_order is not None else list(range(self.pr_end))
+        return {'order': list(order), 'pr': self.pr}
+
+    def load_state_dict(self, state_dict):
+        r"""Restore the order of samples and :attr:`pr` saved by :meth:`state_dict()`. If the saved epoch has
+        started, the next iteration continues it without shuffling.
+
+        Args:
+            state_dict (dict): the state of the dataloader
+        """
+        order = self.sample_order if self.sample_order is not None else range(self.pr_end)
+        position = {idx: i for i, idx in enumerate(order)}
+        self._reorder([position[idx] for idx in state_dict['order']], self.shuffle_data_keys)
+        self.sample_order = list(state_dict['order'])
+        self.pr = state_dict['pr']
+        self.resumed = self.pr > 0
+
+    def shard(self, rank, world_size):
+        r"""Only keep the samples belonging to the given rank for distributed training. Samples are assigned to ranks
+        in an interleaved way, and the first samples are repeated to make every rank hold the same number of samples,
+        so that all the ranks run the same number of batches.
+
+        Args:
+            rank (int): the rank of current process.
+            world_size (int): the number of processes.
+        """
+        num_samples = self.pr_end
+        total_size = math.ceil(num_samples / world_size) * world_size
+        indices = list(range(num_samples))
+        indices += indices[:total_size - num_samples]
+        indices = indices[rank:total_size:world_size]
+        self._reorder(indices)
+        self.pr = 0
+        self.sample_order = None
 
     def _next_batch_data(self):
         r"""Assemble next batch of data in form of Interaction, and return these data.
@@ -8,7 +8,6 @@ textbox.data.dataloader.attr_sent_dataloader
 """
 
 import numpy as np
-import random
 import math
 import torch
 
@@ -57,18 +56,9 @@ class AttributedSentenceDataLoader(AbstractDataLoader):
     def __len__(self):
         return math.ceil(len(self.text_idx_data) / self.batch_size)
 
-    def _shuffle(self):
-        temp = list(
-            zip(self.text_data, self.text_idx_data, self.idx_length_data, self.attribute_data, self.attribute_idx_data)
-        )
-        random.shuffle(temp)
-        self.text_data[:
-                       ], self.text_idx_data[:
-                                             ], self.idx_length_data[:
-                                                                     ], self.attribute_data[:
-                                                                                            ], self.attribute_idx_data[:] = zip(
-                                                                                                *temp
-                                                                                            )
+    @property
+    def sample_data_keys(self):
+        return ['text_data', 'text_idx_data', 'idx_length_data', 'attribute_data', 'attribute_idx_data']
 
     def _next_batch_data(self):
         tp_text_data = self.text_data[self.pr:self.pr + self.step]
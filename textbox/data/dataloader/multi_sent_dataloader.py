@@ -7,7 +7,6 @@ textbox.data.dataloader.multi_sent_dataloader
 ################################################
 """
 
-import random
 import math
 import torch
 
@@ -88,15 +87,16 @@ class MultipleSentenceDataLoader(AbstractDataLoader):
     def __len__(self):
         return math.ceil(len(self.target_text_idx_data) / self.batch_size)
 
-    def _shuffle(self):
-        data_list = []
-        for key in self.group_data_key:
-            data_list.append(getattr(self, key))
-        temp = list(zip(*data_list))
-        random.shuffle(temp)
-        temp = list(zip(*temp))
-        for i, key in enumerate(self.group_data_key):
-            setattr(self, key, list(temp[i]))
+    @property
+    def sample_data_keys(self):
+        text_data_key = [
+            group + '_text_data' for group in ['knowledge', 'source', 'target'] if hasattr(self, group + '_text_data')
+        ]
+        return text_data_key + self.group_data_key
+
+    @property
+    def shuffle_data_keys(self):
+        return self.group_data_key
 
     def _pad_batch_multi_sequence(self, text_idx_data, idx_length_data, idx_num_data):
         max_num = max(idx_num_data)
@@ -13,7 +13,6 @@ textbox.data.dataloader.paired_sent_dataloader
 """
 
 import numpy as np
-import random
 import math
 import torch
 
@@ -49,6 +48,25 @@ class PairedSentenceDataLoader(AbstractDataLoader):
             self.target_text_data, self.target_token2idx
         )
 
+    def replace_target_text(self, target_text_data):
+        r"""Replace the target text of samples, e.g., by the text generated by a teacher model for distillation,
+        and rebuild the target index data. The samples should be in their original order.
+
+        Args:
+            target_text_data (list -> list -> str): the new target text of every sample.
+        """
+        if len(target_text_data) != len(self.source_text_data):
+            raise ValueError(
+                'The number of target text {} is different from the number of samples {}.'.format(
+                    len(target_text_data), len(self.source_text_data)
+                )
+            )
+        self.target_text_data = target_text_data
+        self.target_text_idx_data, self.target_idx_length_data = self._build_data(
+            self.target_text_data, self.target_token2idx
+        )
+        self.pr = 0
+
     def get_reference(self):
         return self.target_text_data
 
@@ -75,16 +93,12 @@ class PairedSentenceDataLoader(AbstractDataLoader):
     def __len__(self):
         return math.ceil(len(self.target_text_idx_data) / self.batch_size)
 
-    def _shuffle(self):
-        temp = list(
-            zip(
-                self.source_text_data, self.source_text_idx_data, self.source_idx_length_data, self.target_text_data,
-                self.target_text_idx_data, self.target_idx_length_data
-            )
-        )
-        random.shuffle(temp)
-        self.source_text_data[:], self.source_text_idx_data[:], self.source_idx_length_data[:], \
-        self.target_text_data[:], self.target_text_idx_data[:], self.target_idx_length_data[:] = zip(*temp)
+    @property
+    def sample_data_keys(self):
+        return [
+            'source_text_data', 'source_text_idx_data', 'source_idx_length_data', 'target_text_data',
+            'target_text_idx_data', 'target_idx_length_data'
+        ]
 
     def _next_batch_data(self):
         source_text = self.source_text_data[self.pr:self.pr + self.step]
@@ -0,0 +1,145 @@
+"""
+textbox.data.shared
+########################
+"""
+
+import os
+import pickle
+import numpy as np
+from logging import getLogger
+
+
+class SharedSequence(object):
+    r"""A read-only sequence of samples backed by numpy arrays, which are usually memory-mapped files, so that
+    several processes can share the index data of a dataloader without copying it.
+
+    It stores either one integer per sample (e.g., the sequence lengths), or one list of integers per sample
+    (e.g., the token indices) as a flat array of ``values`` and the sample boundaries ``offsets``. Items are
+    returned as python ``int`` or ``list``, the same as the lists built by dataloaders. Reordering by
+    :meth:`select` only permutes an index array and never touches the values.
+
+    Args:
+        values (numpy.ndarray): the integers of all samples, concatenated.
+        offsets (numpy.ndarray, optional): the start of every sample in ``values`` and the end of the last sample,
+            default: None (one integer per sample).
+        order (numpy.ndarray, optional): the indices of samples in the current order, default: None (original order).
+    """
+
+    def __init__(self, values, offsets=None, order=None):
+        self.values = values
+        self.offsets = offsets
+        num_samples = len(values) if offsets is None else len(offsets) - 1
+        self.order = np.arange(num_samples) if order is None else order
+
+    def _item(self, idx):
+        if self.offsets is None:
+            return int(self.values[idx])
+        return self.values[self.offsets[idx]:self.offsets[idx + 1]].tolist()
+
+    def __len__(self):
+        return len(self.order)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            order = self.order[index]
+            if self.offsets is None:
+                return self.values[order].tolist()
+            return [self._item(idx) for idx in order]
+        return self._item(self.order[index])
+
+    def __iter__(self):
+        for idx in self.order:
+            yield self._item(idx)
+
+    def select(self, indices):
+        r"""Select samples by ``indices`` of the current order.
+
+        Returns:
+            SharedSequence: a new sequence sharing the values.
+        """
+        return SharedSequence(self.values, self.offsets, self.order[np.asarray(indices, dtype=np.int64)])
+
+
+def _pack(data):
+    r"""Convert a list of integers or a list of lists of integers into numpy arrays.
+
+    Returns:
+        tuple or None: ``(values, offsets)``, where ``offsets`` is None for a list of integers, or None if ``data``
+        is not integer data.
+    """
+    if not isinstance(data, (list, tuple)) or len(data) == 0:
+        return None
+    if all(isinstance(x, int) for x in data):
+        return np.asarray(data, dtype=np.int64), None
+    if all(isinstance(row, list) and all(isinstance(x, int) for x in row) for row in data):
+        offsets = np.zeros(len(data) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(row) for row in data])
+        values = np.fromiter((x for row in data for x in row), dtype=np.int64, count=int(offsets[-1]))
+        return values, offsets
+    return None
+
+
+def dump_dataloader(dataloader, path):
+    r"""Dump a dataloader into the directory ``path`` for :func:`load_dataloader`. The integer sample data, i.e.,
+    token indices and lengths, are saved into ``.npy`` files, which can be memory-mapped by many processes, and
+    other attributes (text, vocabulary, etc.) are pickled.
+
+    Args:
+        dataloader (AbstractDataLoader): the dataloader to dump.
+        path (str): the directory to save files.
+    """
+    os.makedirs(path, exist_ok=True)
+    arrays = dict()
+    for key in dataloader.sample_data_keys:
+        packed = _pack(getattr(dataloader, key))
+        if packed is None:
+            continue
+        values, offsets = packed
+        files = [key + '.values.npy', None if offsets is None else key + '.offsets.npy']
+        np.save(os.path.join(path, files[0]), values)
+        if offsets is not None:
+            np.save(os.path.join(path, files[1]), offsets)
+        arrays[key] = files
+
+    # the config, device and logger belong to the process which loads the dataloader
+    state = {
+        key: value
+        for key, value in dataloader.__dict__.items()
+        if key not in arrays and key not in ['config', 'device', 'logger']
+    }
+    with open(os.path.join(path, 'dataloader.pkl'), 'wb') as f:
+        pickle.dump((dataloader.__class__, state, arrays), f)
+
+
+def load_dataloader(path, config, batch_size=None, shuffle=None):
+    r"""Load a dataloader dumped by :func:`dump_dataloader`, whose integer sample data are memory-mapped as
+    :class:`SharedSequence`.
+
+    Args:
+        path (str): the directory of dumped files.
+        config (Config): the config of current process.
+        batch_size (int, optional): the batch size, default: None (the batch size when dumped).
+        shuffle (bool, optional): whether to shuffle before every epoch, default: None (the same as when dumped).
+
+    Returns:
+        AbstractDataLoader: the loaded dataloader.
+    """
+    with open(os.path.join(path, 'dataloader.pkl'), 'rb') as f:
+        dataloader_class, state, arrays = pickle.load(f)
+
+    dataloader = dataloader_class.__new__(dataloader_class)
+    dataloader.__dict__.update(state)
+    dataloader.config = config
+    dataloader.device = config['device']
+    dataloader.logger = getLogger()
+    for key, (values_file, offsets_file) in arrays.items():
+        values = np.load(os.path.join(path, values_file), mmap_mode='r')
+        offsets = None if offsets_file is None else np.load(os.path.join(path, offsets_file), mmap_mode='r')
+        setattr(dataloader, key, SharedSequence(values, offsets))
+
+    if batch_size is not None:
+        dataloader.batch_size = dataloader.step = batch_size
+    if shuffle is not None:
+        dataloader.shuffle = shuffle
+    dataloader.pr = 0
+    return dataloader
@@ -13,11 +13,12 @@ textbox.data.utils
 """
 
 import os
-import nltk
 import collections
 import pickle
+import numpy as np
+from logging import getLogger
 
-from textbox.data.dataloader import *
+from textbox.utils.distributed import barrier, get_rank, get_world_size, is_main_process
 
 
 def create_dataset(config):
@@ -61,7 +62,13 @@ def data_preparation(config, save=False):
             - valid_data (AbstractDataLoader): The dataloader for validation.
             - test_data (AbstractDataLoader): The dataloader for testing.
     """
+    # in distributed training, only rank 0 processes and dumps a fresh dataset,
+    # and the other ranks wait for it and load the restored files
+    if not is_main_process():
+        barrier()
     dataset = create_dataset(config)
+    if is_main_process():
+        barrier()
 
     builded_datasets = dataset.build()
     train_dataset, valid_dataset, test_dataset = builded_datasets
@@ -75,6 +82,13 @@ def data_preparation(config, save=False):
         name='evaluation', config=config, dataset=[valid_dataset, test_dataset], batch_size=config['eval_batch_size']
     )
 
+    # in distributed training, every rank trains and validates on its own shard,
+    # while the test data is kept complete for the generation of rank 0
+    world_size = get_world_size()
+    if world_size > 1:
+        train_data.shard(get_rank(), world_size)
+        valid_data.shard(get_rank(), world_size)
+
     return train_data, valid_data, test_data
 
 
@@ -123,12 +137,16 @@ def get_data_loader(config):
     """
     task_type = config['task_type'].lower()
     if task_type == "unconditional":
+        from .dataloader.single_sent_dataloader import SingleSentenceDataLoader
         return SingleSentenceDataLoader
     elif task_type == "attribute":
+        from .dataloader.attr_sent_dataloader import AttributedSentenceDataLoader
         return AttributedSentenceDataLoader
     elif task_type in ["translation", "summarization"]:
+        from .dataloader.paired_sent_dataloader import PairedSentenceDataLoader
         return PairedSentenceDataLoader
     elif task_type in ["multi_dialog", "poem"]:
+        from .dataloader.multi_sent_dataloader import MultipleSentenceDataLoader
         return MultipleSentenceDataLoader
     else:
         raise NotImplementedError("No such data loader for TASK_TYPE: {}".format(task_type))
@@ -148,6 +166,7 @@ def tokenize(data, tokenize_strategy, language):
     if tokenize_strategy == 'by_space':
         words = data.split()
     else:
+        import nltk
         words = nltk.word_tokenize(data, language=language)
     return words
 
@@ -346,3 +365,43 @@ def load_restored(dataset_path, suffix="", ignore_file=""):
         return_list.extend([idx2token, token2idx])
 
     return return_list
+
+
+def dump_distilled_data(dataset_path, text_data, teacher, signature=None):
+    """Dump the train target text generated by a teacher model into a binary file, so that sequence-level
+    distillation generates it only once.
+
+    Args:
+        dataset_path (str): path of dataset dir.
+        text_data (List[List[str]]): the generated target text of train data.
+        teacher (str): the name of the teacher, e.g., the name of its checkpoint file.
+        signature (dict, optional): what the text is generated from, e.g., the teacher checkpoint, its decoding
+            config and the train data, which is checked by :func:`load_distilled_data`, default: None.
+    """
+    distilled_file = os.path.join(dataset_path, 'train.distilled.{}.bin'.format(teacher))
+    with open(distilled_file, "wb") as f_text:
+        pickle.dump({'signature': signature, 'text_data': text_data}, f_text)
+
+
+def load_distilled_data(dataset_path, teacher, signature=None):
+    """Load the train target text generated by a teacher model, which is dumped by :func:`dump_distilled_data`.
+
+    Args:
+        dataset_path (str): path of dataset dir.
+        teacher (str): the name of the teacher, e.g., the name of its checkpoint file.
+        signature (dict, optional): what the text should be generated from, default: None.
+
+    Returns:
+        List[List[str]] or None: the generated target text, or None if it has not been dumped or it was generated
+        with a different signature.
+    """
+    distilled_file = os.path.join(dataset_path, 'train.distilled.{}.bin'.format(teacher))
+    if not os.path.isfile(distilled_file):
+        return None
+    with open(distilled_file, "rb") as f_text:
+        distilled_data = pickle.load(f_text)
+    if not isinstance(distilled_data, dict) or distilled_data['signature'] != signature:
+        logger = getLogger()
+        logger.warning('The distilled data in {} was generated differently and is ignored.'.format(distilled_file))
+        return None
+    return distilled_data['text_data']
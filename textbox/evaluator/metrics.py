@@ -14,7 +14,6 @@ textbox.evaluator.metrics
 """
 
 import numpy as np
-from fast_bleu import BLEU, SelfBLEU
 
 
 def bleu_(generate_corpus, reference_corpus, n_grams, get_avg=False):
@@ -39,6 +38,7 @@ def bleu_(generate_corpus, reference_corpus, n_grams, get_avg=False):
     if get_avg:
         weights['avg-bleu'] = tuple([0.25] * 4)
 
+    from fast_bleu import BLEU
     bleu = BLEU(reference_corpus, weights)
     scores = bleu.get_score(generate_corpus)
 
@@ -70,6 +70,7 @@ def self_bleu_(generate_corpus, n_grams, reference_corpus=None):
         weights[n_gram] = tuple(weight)
         weight[n_gram - 1] = 0.0
 
+    from fast_bleu import SelfBLEU
     bleu = SelfBLEU(generate_corpus, weights)
     scores = bleu.get_score()
 
@@ -16,7 +16,6 @@ import numpy as np
 import torch
 from textbox.evaluator.abstract_evaluator import AbstractEvaluator
 from textbox.evaluator.metrics import metrics_dict
-import rouge
 
 summarization_metrics = ['rouge-1', 'rouge-2', 'rouge-l', 'rouge-w']
 
@@ -30,6 +29,7 @@ class SummarizationEvaluator(AbstractEvaluator):
         super().__init__(config)
 
         self.n_grams = config['n_grams']
+        import rouge
         self.evaluator = rouge.Rouge(
             metrics=['rouge-n', 'rouge-l', 'rouge-w'],
             max_n=2,
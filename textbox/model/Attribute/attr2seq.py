@@ -15,7 +15,9 @@ import torch.nn as nn
 from textbox.model.abstract_generator import AttributeGenerator
 from textbox.module.Decoder.rnn_decoder import AttentionalRNNDecoder
 from textbox.model.init import xavier_normal_initialization
-from textbox.module.strategy import topk_sampling, greedy_search, Beam_Search_Hypothesis
+from textbox.module.strategy import topk_sampling, greedy_search, batch_idx2token, decode_until_eos, \
+    BeamSearch, expand_beam, reorder_beam
+from textbox.module.loss import vocab_nll_loss
 
 
 class Attr2Seq(AttributeGenerator):
@@ -61,6 +63,7 @@ class Attr2Seq(AttributeGenerator):
         self.loss = nn.CrossEntropyLoss(ignore_index=self.padding_token_idx, reduction='none')
 
         self.max_target_length = config['max_seq_length']
+        self.loss_chunk_size = config['loss_chunk_size']
 
         self.H = nn.Linear(self.attribute_num * self.embedding_size, self.num_dec_layers * self.hidden_size)
 
@@ -103,48 +106,66 @@ class Attr2Seq(AttributeGenerator):
 
             encoder_outputs, encoder_states = self.encoder(source_idx)
 
-            for bid in range(self.batch_size):
-                c = torch.zeros(self.num_dec_layers, 1, self.hidden_size).to(self.device)
-                decoder_states = (encoder_states[:, bid, :].unsqueeze(1), c)
-                encoder_output = encoder_outputs[bid, :, :].unsqueeze(0)
-                generate_tokens = []
-                input_seq = torch.LongTensor([[self.sos_token_idx]]).to(self.device)
-
-                if (self.strategy == 'beam_search'):
-                    hypothesis = Beam_Search_Hypothesis(
-                        self.beam_size, self.sos_token_idx, self.eos_token_idx, self.device, idx2token
-                    )
-
-                for gen_idx in range(self.max_target_length):
-                    decoder_input = self.target_token_embedder(input_seq)
-                    decoder_outputs, decoder_states, _ = self.decoder(decoder_input, decoder_states, encoder_output)
-
-                    token_logits = self.vocab_linear(decoder_outputs)
-                    if (self.strategy == 'topk_sampling'):
-                        token_idx = topk_sampling(token_logits).item()
-                    elif (self.strategy == 'greedy_search'):
-                        token_idx = greedy_search(token_logits).item()
-                    elif (self.strategy == 'beam_search'):
-                        input_seq, decoder_states, encoder_output = \
-                            hypothesis.step(gen_idx, token_logits, decoder_states, encoder_output)
-
-                    if (self.strategy in ['topk_sampling', 'greedy_search']):
-                        if token_idx == self.eos_token_idx:
-                            break
-                        else:
-                            generate_tokens.append(idx2token[token_idx])
-                            input_seq = torch.LongTensor([[token_idx]]).to(self.device)
-                    elif (self.strategy == 'beam_search'):
-                        if (hypothesis.stop()):
-                            break
-
-                if (self.strategy == 'beam_search'):
-                    generate_tokens = hypothesis.generate()
-
-                generate_corpus.append(generate_tokens)
+            if (self.strategy == 'beam_search'):
+                generate_idx = self._beam_search(encoder_outputs, encoder_states)
+            else:
+                generate_idx = self._batch_decode(encoder_outputs, encoder_states)
+            generate_corpus += batch_idx2token(generate_idx, self.eos_token_idx, idx2token)
 
         return generate_corpus
 
+    def _batch_decode(self, encoder_outputs, encoder_states):
+        r"""Greedy search or top-k sampling for the whole batch, which advances one step at a time until every
+        sequence has generated the eos.
+
+        Returns:
+            torch.LongTensor: the generated token indexes, shape: [batch_size, length].
+        """
+        c = torch.zeros(self.num_dec_layers, self.batch_size, self.hidden_size).to(self.device)
+        decoder_states = (encoder_states.contiguous(), c)
+
+        def decode_step(input_seq, gen_idx, decoder_states):
+            decoder_input = self.target_token_embedder(input_seq)
+            decoder_outputs, decoder_states, _ = self.decoder(decoder_input, decoder_states, encoder_outputs)
+
+            token_logits = self.vocab_linear(decoder_outputs)
+            if (self.strategy == 'topk_sampling'):
+                token_idx = topk_sampling(token_logits).view(-1)
+            else:
+                token_idx = greedy_search(token_logits)
+            return token_idx, decoder_states
+
+        return decode_until_eos(
+            decode_step, self.batch_size, self.max_target_length, self.sos_token_idx, self.eos_token_idx, self.device,
+            decoder_states
+        )
+
+    def _beam_search(self, encoder_outputs, encoder_states):
+        r"""Beam search for the whole batch, whose hypotheses are decoded together.
+
+        Returns:
+            torch.LongTensor: the generated token indexes, shape: [batch_size, length].
+        """
+        beam_search = BeamSearch(
+            self.batch_size, self.beam_size, self.max_target_length, self.sos_token_idx, self.eos_token_idx,
+            self.device
+        )
+        c = torch.zeros(self.num_dec_layers, self.batch_size, self.hidden_size).to(self.device)
+        decoder_states = expand_beam((encoder_states.contiguous(), c), self.beam_size, dim=1)
+        encoder_outputs = expand_beam(encoder_outputs, self.beam_size)
+
+        for gen_idx in range(self.max_target_length):
+            decoder_input = self.target_token_embedder(beam_search.input_seq)
+            decoder_outputs, decoder_states, _ = self.decoder(decoder_input, decoder_states, encoder_outputs)
+
+            token_logits = self.vocab_linear(decoder_outputs)
+            beam_idx = beam_search.step(gen_idx, token_logits)
+            if beam_search.stop():
+                break
+            decoder_states = reorder_beam(decoder_states, beam_idx, dim=1)
+
+        return beam_search.generate()
+
     def calculate_loss(self, corpus, epoch_idx=0):
         # target_length (Torch.Tensor): shape: [batch_size]
         target_length = corpus['target_length']
@@ -164,13 +185,10 @@ class Attr2Seq(AttributeGenerator):
         decoder_outputs, decoder_states, _ = \
             self.decoder(input_embeddings, (encoder_states.contiguous(), c), encoder_outputs)
 
-        # token_logits (Torch.Tensor): shape: [batch_size, target_length, vocabulary_size].
-        token_logits = self.vocab_linear(decoder_outputs)
-
-        # token_logits.view(-1, token_logits.size(-1)) (Torch.Tensor): shape: [batch_size * target_length, vocabulary_size].
-        # target_text.reshape(-1) (Torch.Tensor): shape: [batch_size * target_length].
-        loss = self.loss(token_logits.view(-1, token_logits.size(-1)), target_text.reshape(-1))
-        loss = loss.reshape_as(target_text)
+        # loss (Torch.Tensor): shape: [batch_size, target_length].
+        loss = vocab_nll_loss(
+            decoder_outputs, self.vocab_linear, target_text, self.padding_token_idx, self.loss_chunk_size
+        )
 
         loss = loss.sum(dim=1) / (target_length - 1).float()
         loss = loss.mean()
@@ -44,8 +44,8 @@ class MaskGAN(GenerativeAdversarialNet):
         lengths = torch.tensor([seq_len] * bs)
         target_present = self.generate_mask(bs, seq_len, "continuous")
         device = target_inputs.device
-        lengths = lengths.cuda(device)
-        target_present = target_present.cuda(device)
+        lengths = lengths.to(device)
+        target_present = target_present.to(device)
         return self.generator.calculate_train_loss(
             real_inputs, lengths, target_inputs, target_present, validate=validate
         )
@@ -60,8 +60,8 @@ class MaskGAN(GenerativeAdversarialNet):
         lengths = torch.tensor([seq_len] * batch_size)
         targets_present = self.generate_mask(batch_size, seq_len, "continuous")
         device = inputs.device
-        targets_present = targets_present.cuda(device)
-        lengths = lengths.cuda(device)
+        targets_present = targets_present.to(device)
+        lengths = lengths.to(device)
 
         fake_sequence, _, _ = self.generator.forward(inputs, lengths, targets, targets_present)
         self.generator.train()
@@ -100,8 +100,8 @@ class MaskGAN(GenerativeAdversarialNet):
         lengths = torch.tensor([seq_len] * batch_size)
         targets_present = self.generate_mask(batch_size, seq_len, "continuous")
         device = real_inputs.device
-        targets_present = targets_present.cuda(device)
-        lengths = lengths.cuda(device)
+        targets_present = targets_present.to(device)
+        lengths = lengths.to(device)
 
         loss = self.generator.adversarial_loss(real_inputs, lengths, target_inputs, targets_present, self.discriminator)
         return loss
@@ -115,7 +115,7 @@ class MaskGAN(GenerativeAdversarialNet):
         lengths = torch.tensor([seq_len] * batch_size)
         targets_present = torch.zeros_like(target_inputs).byte()
         device = real_inputs.device
-        lengths = lengths.cuda(device)
+        lengths = lengths.to(device)
         outputs, log_probs, logits = self.generator.forward(real_inputs, lengths, target_inputs, targets_present)
         return self.generator.calculate_loss(logits, target_inputs)
 
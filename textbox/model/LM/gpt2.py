@@ -14,7 +14,6 @@ import torch.nn as nn
 import torch.nn.functional as F
 
 from textbox.model.abstract_generator import UnconditionalGenerator
-from transformers import GPT2LMHeadModel, GPT2Tokenizer, GPT2Config
 from math import ceil
 
 
@@ -25,6 +24,7 @@ class GPT2(UnconditionalGenerator):
 
     def __init__(self, config, dataset):
         super(GPT2, self).__init__(config, dataset)
+        from transformers import GPT2LMHeadModel, GPT2Tokenizer, GPT2Config
 
         self.eval_generate_num = config['eval_generate_num']
 
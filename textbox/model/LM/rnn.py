@@ -19,6 +19,9 @@ import torch.nn.functional as F
 from textbox.model.abstract_generator import UnconditionalGenerator
 from textbox.module.Decoder.rnn_decoder import BasicRNNDecoder
 from textbox.model.init import xavier_normal_initialization
+from textbox.module.layers import build_vocab_layer
+from textbox.module.strategy import vocab_logits, batch_idx2token, decode_until_eos
+from textbox.module.loss import vocab_nll_loss
 
 
 class RNN(UnconditionalGenerator):
@@ -35,7 +38,10 @@ class RNN(UnconditionalGenerator):
         self.rnn_type = config['rnn_type']
         self.dropout_ratio = config['dropout_ratio']
         self.eval_generate_num = config['eval_generate_num']
+        self.eval_batch_size = config['eval_batch_size']
         self.max_length = config['max_seq_length']
+        self.loss_chunk_size = config['loss_chunk_size']
+        self.sampled_softmax_num = config['sampled_softmax_num']
 
         self.padding_token_idx = dataset.padding_token_idx
         self.sos_token_idx = dataset.sos_token_idx
@@ -49,7 +55,7 @@ class RNN(UnconditionalGenerator):
         )
 
         self.dropout = nn.Dropout(self.dropout_ratio)
-        self.vocab_linear = nn.Linear(self.hidden_size, self.vocab_size)
+        self.vocab_linear = build_vocab_layer(config, self.hidden_size, self.vocab_size)
 
         self.loss = nn.CrossEntropyLoss(ignore_index=self.padding_token_idx, reduction='none')
 
@@ -59,25 +65,28 @@ class RNN(UnconditionalGenerator):
     def generate(self, eval_data):
         generate_corpus = []
         idx2token = eval_data.idx2token
-        for _ in range(self.eval_generate_num):
-            hidden_states = torch.zeros(self.num_dec_layers, 1, self.hidden_size).to(self.device)
-            generate_tokens = []
-            input_seq = torch.LongTensor([[self.sos_token_idx]]).to(self.device)
-            for gen_idx in range(self.max_length):
-                decoder_input = self.token_embedder(input_seq)
-                outputs, hidden_states = self.decoder(decoder_input, hidden_states)
-                token_logits = self.vocab_linear(outputs)
-                token_probs = F.softmax(token_logits, dim=-1).squeeze()
-                token_idx = torch.multinomial(token_probs, 1)[0].item()
-
-                if token_idx == self.eos_token_idx:
-                    break
-                else:
-                    generate_tokens.append(idx2token[token_idx])
-                    input_seq = torch.LongTensor([[token_idx]]).to(self.device)
-            generate_corpus.append(generate_tokens)
+
+        with torch.no_grad():
+            for start in range(0, self.eval_generate_num, self.eval_batch_size):
+                generate_idx = self._sample_batch(min(self.eval_batch_size, self.eval_generate_num - start))
+                generate_corpus += batch_idx2token(generate_idx, self.eos_token_idx, idx2token)
         return generate_corpus
 
+    def _sample_batch(self, batch_size):
+        r"""Sample ``batch_size`` sentences at once from the zero initial hidden states."""
+        hidden_states = torch.zeros(self.num_dec_layers, batch_size, self.hidden_size).to(self.device)
+        return decode_until_eos(
+            self._sample_step, batch_size, self.max_length, self.sos_token_idx, self.eos_token_idx, self.device,
+            hidden_states
+        )
+
+    def _sample_step(self, input_seq, gen_idx, hidden_states):
+        decoder_input = self.token_embedder(input_seq)
+        outputs, hidden_states = self.decoder(decoder_input, hidden_states)
+        token_logits = vocab_logits(outputs, self.vocab_linear)
+        token_probs = F.softmax(token_logits, dim=-1).squeeze(1)
+        return torch.multinomial(token_probs, 1).view(-1), hidden_states
+
     def calculate_loss(self, corpus, epoch_idx=-1, nll_test=False):
         input_text = corpus['target_idx'][:, :-1]
         target_text = corpus['target_idx'][:, 1:]
@@ -85,10 +94,10 @@ class RNN(UnconditionalGenerator):
         input_embeddings = self.dropout(self.token_embedder(input_text))
         outputs, hidden_states = self.decoder(input_embeddings)
 
-        token_logits = self.vocab_linear(outputs)
-        token_logits = token_logits.view(-1, token_logits.size(-1))
-
-        loss = self.loss(token_logits, target_text.contiguous().view(-1)).reshape_as(target_text)
+        loss = vocab_nll_loss(
+            outputs, self.vocab_linear, target_text, self.padding_token_idx, self.loss_chunk_size,
+            self.sampled_softmax_num
+        )
         if (nll_test):
             loss = loss.sum(dim=1)
         else:
@@ -13,7 +13,6 @@ import torch
 import torch.nn as nn
 
 from textbox.model.abstract_generator import UnconditionalGenerator
-from transformers import XLNetLMHeadModel, XLNetTokenizer, XLNetConfig
 from math import ceil
 
 
@@ -25,6 +24,7 @@ class XLNet(UnconditionalGenerator):
 
     def __init__(self, config, dataset):
         super(XLNet, self).__init__(config, dataset)
+        from transformers import XLNetLMHeadModel, XLNetTokenizer, XLNetConfig
 
         self.eval_generate_num = config['eval_generate_num']
 
@@ -15,7 +15,6 @@ import torch.nn as nn
 import torch.nn.functional as F
 
 from textbox.model.abstract_generator import Seq2SeqGenerator
-from transformers import BartTokenizer, BartConfig, BartForConditionalGeneration
 
 
 class BART(Seq2SeqGenerator):
@@ -24,6 +23,7 @@ class BART(Seq2SeqGenerator):
 
     def __init__(self, config, dataset):
         super(BART, self).__init__(config, dataset)
+        from transformers import BartTokenizer, BartConfig, BartForConditionalGeneration
 
         self.max_source_length = config['source_max_seq_length']
         self.max_target_length = config['target_max_seq_length']
@@ -12,8 +12,6 @@ Reference:
 import torch
 import torch.nn as nn
 from textbox.model.abstract_generator import Seq2SeqGenerator
-from transformers import BertTokenizer, EncoderDecoderConfig, BertConfig, BertGenerationEncoder, BertGenerationDecoder, \
-    EncoderDecoderModel
 
 
 class BERT2BERT(Seq2SeqGenerator):
@@ -22,6 +20,8 @@ class BERT2BERT(Seq2SeqGenerator):
 
     def __init__(self, config, dataset):
         super(BERT2BERT, self).__init__(config, dataset)
+        from transformers import BertTokenizer, EncoderDecoderConfig, BertConfig, BertGenerationEncoder, \
+            BertGenerationDecoder, EncoderDecoderModel
 
         self.sos_token_idx = 101
         self.eos_token_idx = 102
@@ -22,7 +22,10 @@ from textbox.model.abstract_generator import Seq2SeqGenerator
 from textbox.module.Encoder.rnn_encoder import BasicRNNEncoder
 from textbox.module.Decoder.rnn_decoder import BasicRNNDecoder, AttentionalRNNDecoder
 from textbox.model.init import xavier_normal_initialization
-from textbox.module.strategy import topk_sampling, greedy_search, Beam_Search_Hypothesis
+from textbox.module.strategy import topk_sampling, vocab_logits, vocab_topk, batch_idx2token, decode_until_eos, \
+    BeamSearch, expand_beam, reorder_beam
+from textbox.module.layers import build_vocab_layer
+from textbox.module.loss import vocab_nll_loss
 
 
 class RNNEncDec(Seq2SeqGenerator):
@@ -82,10 +85,12 @@ class RNNEncDec(Seq2SeqGenerator):
             )
 
         self.dropout = nn.Dropout(self.dropout_ratio)
-        self.vocab_linear = nn.Linear(self.hidden_size, self.target_vocab_size)
+        self.vocab_linear = build_vocab_layer(config, self.hidden_size, self.target_vocab_size)
         self.loss = nn.CrossEntropyLoss(ignore_index=self.padding_token_idx, reduction='none')
 
         self.max_target_length = config['target_max_seq_length']
+        self.loss_chunk_size = config['loss_chunk_size']
+        self.sampled_softmax_num = config['sampled_softmax_num']
 
         # parameters initialization
         self.apply(xavier_normal_initialization)
@@ -108,62 +113,83 @@ class RNNEncDec(Seq2SeqGenerator):
                     encoder_states = encoder_states[::2]
 
             encoder_masks = torch.ne(source_text, self.padding_token_idx)
-            for bid in range(source_text.size(0)):
-                decoder_states = encoder_states[:, bid, :].unsqueeze(1)
-                encoder_output = encoder_outputs[bid, :, :].unsqueeze(0)
-                encoder_mask = encoder_masks[bid, :].unsqueeze(0)
-                generate_tokens = []
-                input_seq = torch.LongTensor([[self.sos_token_idx]]).to(self.device)
-
-                if (self.strategy == 'beam_search'):
-                    hypothesis = Beam_Search_Hypothesis(
-                        self.beam_size, self.sos_token_idx, self.eos_token_idx, self.device, idx2token
-                    )
-
-                for gen_idx in range(self.max_target_length):
-                    decoder_input = self.target_token_embedder(input_seq)
-                    if self.attention_type is not None:
-                        decoder_outputs, decoder_states, _ = self.decoder(
-                            decoder_input, decoder_states, encoder_output, encoder_mask
-                        )
-                    else:
-                        decoder_outputs, decoder_states = self.decoder(decoder_input, decoder_states)
-
-                    token_logits = self.vocab_linear(decoder_outputs)
-                    if (self.strategy == 'topk_sampling'):
-                        token_idx = topk_sampling(token_logits).item()
-                    elif (self.strategy == 'greedy_search'):
-                        token_idx = greedy_search(token_logits).item()
-                    elif (self.strategy == 'beam_search'):
-                        if self.attention_type is not None:
-                            input_seq, decoder_states, encoder_output, encoder_mask = \
-                                hypothesis.step(gen_idx, token_logits, decoder_states, encoder_output, encoder_mask)
-                        else:
-                            input_seq, decoder_states = hypothesis.step(gen_idx, token_logits, decoder_states)
-
-                    if (self.strategy in ['topk_sampling', 'greedy_search']):
-                        if token_idx == self.eos_token_idx:
-                            break
-                        else:
-                            generate_tokens.append(idx2token[token_idx])
-                            input_seq = torch.LongTensor([[token_idx]]).to(self.device)
-                    elif (self.strategy == 'beam_search'):
-                        if (hypothesis.stop()):
-                            break
-
-                if (self.strategy == 'beam_search'):
-                    generate_tokens = hypothesis.generate()
-
-                generate_corpus.append(generate_tokens)
+            if (self.strategy == 'beam_search'):
+                generate_idx = self._beam_search(encoder_outputs, encoder_states, encoder_masks)
+            else:
+                generate_idx = self._batch_decode(encoder_outputs, encoder_states, encoder_masks)
+            generate_corpus += batch_idx2token(generate_idx, self.eos_token_idx, idx2token)
 
         return generate_corpus
 
-    def calculate_loss(self, corpus, epoch_idx=0):
+    def _batch_decode(self, encoder_outputs, decoder_states, encoder_masks):
+        r"""Greedy search or top-k sampling for the whole batch, which advances one step at a time until every
+        sequence has generated the eos.
+
+        Returns:
+            torch.LongTensor: the generated token indexes, shape: [batch_size, length].
+        """
+        batch_size = encoder_outputs.size(0)
+
+        def decode_step(input_seq, gen_idx, decoder_states):
+            decoder_input = self.target_token_embedder(input_seq)
+            if self.attention_type is not None:
+                decoder_outputs, decoder_states, _ = self.decoder(
+                    decoder_input, decoder_states, encoder_outputs, encoder_masks
+                )
+            else:
+                decoder_outputs, decoder_states = self.decoder(decoder_input, decoder_states)
+
+            if (self.strategy == 'greedy_search'):
+                token_idx = vocab_topk(decoder_outputs, self.vocab_linear, 1)[1].view(-1)
+            else:
+                token_idx = topk_sampling(vocab_logits(decoder_outputs, self.vocab_linear)).view(-1)
+            return token_idx, decoder_states
+
+        return decode_until_eos(
+            decode_step, batch_size, self.max_target_length, self.sos_token_idx, self.eos_token_idx, self.device,
+            decoder_states
+        )
+
+    def _beam_search(self, encoder_outputs, encoder_states, encoder_masks):
+        r"""Beam search for the whole batch, whose hypotheses are decoded together.
+
+        Returns:
+            torch.LongTensor: the generated token indexes, shape: [batch_size, length].
+        """
+        beam_search = BeamSearch(
+            encoder_outputs.size(0), self.beam_size, self.max_target_length, self.sos_token_idx, self.eos_token_idx,
+            self.device
+        )
+        decoder_states = expand_beam(encoder_states, self.beam_size, dim=1)
+        encoder_outputs = expand_beam(encoder_outputs, self.beam_size)
+        encoder_masks = expand_beam(encoder_masks, self.beam_size)
+
+        for gen_idx in range(self.max_target_length):
+            decoder_input = self.target_token_embedder(beam_search.input_seq)
+            if self.attention_type is not None:
+                decoder_outputs, decoder_states, _ = self.decoder(
+                    decoder_input, decoder_states, encoder_outputs, encoder_masks
+                )
+            else:
+                decoder_outputs, decoder_states = self.decoder(decoder_input, decoder_states)
+
+            token_logits = vocab_logits(decoder_outputs, self.vocab_linear)
+            beam_idx = beam_search.step(gen_idx, token_logits)
+            if beam_search.stop():
+                break
+            decoder_states = reorder_beam(decoder_states, beam_idx, dim=1)
+
+        return beam_search.generate()
+
+    def forward_decoder(self, corpus):
+        r"""Encode the source text and decode the target text with teacher forcing.
+
+        Returns:
+            torch.Tensor: the output of decoder, shape: [batch_size, target_length - 1, hidden_size].
+        """
         source_text = corpus['source_idx']
         source_length = corpus['source_length']
-
         input_text = corpus['target_idx'][:, :-1]
-        target_text = corpus['target_idx'][:, 1:]
 
         source_embeddings = self.dropout(self.source_token_embedder(source_text))
         input_embeddings = self.dropout(self.target_token_embedder(input_text))
@@ -184,11 +210,19 @@ class RNNEncDec(Seq2SeqGenerator):
             )
         else:
             decoder_outputs, decoder_states = self.decoder(input_embeddings, encoder_states)
+        return decoder_outputs
 
-        token_logits = self.vocab_linear(decoder_outputs)
+    def calculate_token_logits(self, corpus):
+        return vocab_logits(self.forward_decoder(corpus), self.vocab_linear)
 
-        loss = self.loss(token_logits.view(-1, token_logits.size(-1)), target_text.contiguous().view(-1))
-        loss = loss.reshape_as(target_text)
+    def calculate_loss(self, corpus, epoch_idx=0):
+        target_text = corpus['target_idx'][:, 1:]
+        decoder_outputs = self.forward_decoder(corpus)
+
+        loss = vocab_nll_loss(
+            decoder_outputs, self.vocab_linear, target_text, self.padding_token_idx, self.loss_chunk_size,
+            self.sampled_softmax_num
+        )
 
         length = corpus['target_length'] - 1
         loss = loss.sum(dim=1) / length.float()
@@ -24,7 +24,10 @@ from textbox.module.Decoder.transformer_decoder import TransformerDecoder
 from textbox.module.Embedder.position_embedder import LearnedPositionalEmbedding, SinusoidalPositionalEmbedding
 from textbox.module.Attention.attention_mechanism import SelfAttentionMask
 from textbox.model.init import xavier_normal_initialization
-from textbox.module.strategy import topk_sampling, greedy_search, Beam_Search_Hypothesis
+from textbox.module.strategy import topk_sampling, vocab_logits, vocab_topk, batch_idx2token, \
+    decode_until_eos, BeamSearch
+from textbox.module.layers import build_vocab_layer
+from textbox.module.loss import vocab_nll_loss
 
 
 class TransformerEncDec(Seq2SeqGenerator):
@@ -43,6 +46,7 @@ class TransformerEncDec(Seq2SeqGenerator):
         self.attn_dropout_ratio = config['attn_dropout_ratio']
         self.attn_weight_dropout_ratio = config['attn_weight_dropout_ratio']
         self.ffn_dropout_ratio = config['ffn_dropout_ratio']
+        self.activation_checkpointing = int(config['activation_checkpointing'] or 0)
 
         self.decoding_strategy = config['decoding_strategy']
 
@@ -76,7 +80,7 @@ class TransformerEncDec(Seq2SeqGenerator):
 
         self.encoder = TransformerEncoder(
             self.embedding_size, self.ffn_size, self.num_enc_layers, self.num_heads, self.attn_dropout_ratio,
-            self.attn_weight_dropout_ratio, self.ffn_dropout_ratio
+            self.attn_weight_dropout_ratio, self.ffn_dropout_ratio, self.activation_checkpointing
         )
 
         self.decoder = TransformerDecoder(
@@ -87,20 +91,24 @@ class TransformerEncDec(Seq2SeqGenerator):
             self.attn_dropout_ratio,
             self.attn_weight_dropout_ratio,
             self.ffn_dropout_ratio,
-            with_external=True
+            with_external=True,
+            checkpoint_layers=self.activation_checkpointing
         )
 
-        self.vocab_linear = nn.Linear(self.embedding_size, self.target_vocab_size)
+        self.vocab_linear = build_vocab_layer(config, self.embedding_size, self.target_vocab_size)
 
         self.loss = nn.CrossEntropyLoss(ignore_index=self.padding_token_idx, reduction='none')
         self.max_target_length = config['target_max_seq_length']
+        self.loss_chunk_size = config['loss_chunk_size']
+        self.sampled_softmax_num = config['sampled_softmax_num']
 
         # parameters initialization
         self.reset_parameters()
 
     def reset_parameters(self):
-        nn.init.normal_(self.vocab_linear.weight, std=0.02)
-        nn.init.constant_(self.vocab_linear.bias, 0.)
+        if isinstance(self.vocab_linear, nn.Linear):
+            nn.init.normal_(self.vocab_linear.weight, std=0.02)
+            nn.init.constant_(self.vocab_linear.bias, 0.)
 
     def generate(self, eval_dataloader):
         generate_corpus = []
@@ -115,62 +123,88 @@ class TransformerEncDec(Seq2SeqGenerator):
                 source_embeddings, self_padding_mask=source_padding_mask, output_all_encoded_layers=False
             )
 
-            for bid in range(source_text.size(0)):
-                encoder_output = encoder_outputs[bid, :, :].unsqueeze(0)
-                encoder_mask = source_padding_mask[bid, :].unsqueeze(0)
-                generate_tokens = []
-                prev_token_ids = [self.sos_token_idx]
-                input_seq = torch.LongTensor([prev_token_ids]).to(self.device)
-
-                if (self.decoding_strategy == 'beam_search'):
-                    hypothesis = Beam_Search_Hypothesis(
-                        self.beam_size, self.sos_token_idx, self.eos_token_idx, self.device, idx2token
-                    )
-
-                for gen_idx in range(self.max_target_length):
-                    self_attn_mask = self.self_attn_mask(input_seq.size(-1)).bool().to(self.device)
-                    decoder_input = self.target_token_embedder(input_seq) + \
-                                    self.position_embedder(input_seq).to(self.device)
-                    decoder_outputs = self.decoder(
-                        decoder_input,
-                        self_attn_mask=self_attn_mask,
-                        external_states=encoder_output,
-                        external_padding_mask=encoder_mask
-                    )
-
-                    token_logits = self.vocab_linear(decoder_outputs[:, -1, :].unsqueeze(1))
-
-                    if (self.decoding_strategy == 'topk_sampling'):
-                        token_idx = topk_sampling(token_logits).item()
-                    elif (self.decoding_strategy == 'greedy_search'):
-                        token_idx = greedy_search(token_logits).item()
-                    elif (self.decoding_strategy == 'beam_search'):
-                        input_seq, encoder_output, encoder_mask = \
-                            hypothesis.step(gen_idx, token_logits, encoder_output=encoder_output, encoder_mask=encoder_mask, input_type='whole')
-
-                    if (self.decoding_strategy in ['topk_sampling', 'greedy_search']):
-                        if token_idx == self.eos_token_idx:
-                            break
-                        else:
-                            generate_tokens.append(idx2token[token_idx])
-                            prev_token_ids.append(token_idx)
-                            input_seq = torch.LongTensor([prev_token_ids]).to(self.device)
-                    elif (self.decoding_strategy == 'beam_search'):
-                        if (hypothesis.stop()):
-                            break
-
-                if (self.decoding_strategy == 'beam_search'):
-                    generate_tokens = hypothesis.generate()
-
-                generate_corpus.append(generate_tokens)
+            if (self.decoding_strategy == 'beam_search'):
+                generate_idx = self._beam_search(encoder_outputs, source_padding_mask)
+            else:
+                generate_idx = self._batch_decode(encoder_outputs, source_padding_mask)
+            generate_corpus += batch_idx2token(generate_idx, self.eos_token_idx, idx2token)
 
         return generate_corpus
 
-    def calculate_loss(self, corpus, epoch_idx=0):
-        source_text = corpus['source_idx']
+    def _decode_step(self, input_seq, gen_idx, encoder_outputs, source_padding_mask, cache):
+        r"""Decode the newest tokens at position ``gen_idx``, where the previous positions are kept in ``cache``.
+
+        Returns:
+            torch.Tensor: the output of decoder, shape: [batch_size, 1, embedding_size].
+        """
+        decoder_input = self.target_token_embedder(input_seq) + \
+                        self.position_embedder(input_seq, offset=gen_idx).to(self.device)
+        return self.decoder(
+            decoder_input,
+            external_states=encoder_outputs,
+            external_padding_mask=source_padding_mask,
+            cache=cache,
+            position=gen_idx
+        )
+
+    def _batch_decode(self, encoder_outputs, source_padding_mask):
+        r"""Greedy search or top-k sampling for the whole batch, which advances one step at a time until every
+        sequence has generated the eos.
+
+        Returns:
+            torch.LongTensor: the generated token indexes, shape: [batch_size, length].
+        """
+        batch_size = encoder_outputs.size(0)
+        cache = self.decoder.init_cache(batch_size, self.max_target_length, encoder_outputs)
 
+        def decode_step(input_seq, gen_idx, cache):
+            decoder_outputs = self._decode_step(input_seq, gen_idx, encoder_outputs, source_padding_mask, cache)
+
+            if (self.decoding_strategy == 'greedy_search'):
+                token_idx = vocab_topk(decoder_outputs, self.vocab_linear, 1)[1].view(-1)
+            else:
+                token_idx = topk_sampling(vocab_logits(decoder_outputs, self.vocab_linear)).view(-1)
+            return token_idx, cache
+
+        return decode_until_eos(
+            decode_step, batch_size, self.max_target_length, self.sos_token_idx, self.eos_token_idx, self.device, cache
+        )
+
+    def _beam_search(self, encoder_outputs, source_padding_mask):
+        r"""Beam search for the whole batch, whose hypotheses are decoded together. The encoder outputs of every
+        example are projected once and shared by its hypotheses rather than expanded to the beam.
+
+        Returns:
+            torch.LongTensor: the generated token indexes, shape: [batch_size, length].
+        """
+        beam_search = BeamSearch(
+            encoder_outputs.size(0), self.beam_size, self.max_target_length, self.sos_token_idx, self.eos_token_idx,
+            self.device
+        )
+        cache = self.decoder.init_cache(
+            encoder_outputs.size(0) * self.beam_size, self.max_target_length, encoder_outputs
+        )
+
+        for gen_idx in range(self.max_target_length):
+            decoder_outputs = self._decode_step(
+                beam_search.input_seq, gen_idx, encoder_outputs, source_padding_mask, cache
+            )
+            token_logits = vocab_logits(decoder_outputs, self.vocab_linear)
+            beam_idx = beam_search.step(gen_idx, token_logits)
+            if beam_search.stop():
+                break
+            self.decoder.reorder_cache(cache, beam_idx, gen_idx + 1)
+
+        return beam_search.generate()
+
+    def forward_decoder(self, corpus):
+        r"""Encode the source text and decode the target text with teacher forcing.
+
+        Returns:
+            torch.Tensor: the output of decoder, shape: [batch_size, target_length - 1, embedding_size].
+        """
+        source_text = corpus['source_idx']
         input_text = corpus['target_idx'][:, :-1]
-        target_text = corpus['target_idx'][:, 1:]
 
         source_embeddings = self.source_token_embedder(source_text) + self.position_embedder(source_text).to(
             self.device
@@ -188,10 +222,19 @@ class TransformerEncDec(Seq2SeqGenerator):
             external_states=encoder_outputs,
             external_padding_mask=source_padding_mask
         )
+        return decoder_outputs
+
+    def calculate_token_logits(self, corpus):
+        return vocab_logits(self.forward_decoder(corpus), self.vocab_linear)
+
+    def calculate_loss(self, corpus, epoch_idx=0):
+        target_text = corpus['target_idx'][:, 1:]
+        decoder_outputs = self.forward_decoder(corpus)
 
-        token_logits = self.vocab_linear(decoder_outputs)
-        loss = self.loss(token_logits.view(-1, token_logits.size(-1)), target_text.contiguous().view(-1))
-        loss = loss.reshape_as(target_text)
+        loss = vocab_nll_loss(
+            decoder_outputs, self.vocab_linear, target_text, self.padding_token_idx, self.loss_chunk_size,
+            self.sampled_softmax_num
+        )
 
         length = corpus['target_length'] - 1
         loss = loss.sum(dim=1) / length.float()
@@ -19,7 +19,7 @@ from textbox.module.Encoder.rnn_encoder import BasicRNNEncoder
 from textbox.module.Decoder.cnn_decoder import BasicCNNDecoder
 from textbox.module.layers import Highway
 from textbox.model.init import xavier_normal_initialization
-from textbox.module.strategy import topk_sampling
+from textbox.module.strategy import topk_sampling, batch_idx2token, decode_until_eos
 
 
 class CNNVAE(UnconditionalGenerator):
@@ -43,6 +43,7 @@ class CNNVAE(UnconditionalGenerator):
         self.bidirectional = config['bidirectional']
         self.dropout_ratio = config['dropout_ratio']
         self.eval_generate_num = config['eval_generate_num']
+        self.eval_batch_size = config['eval_batch_size']
         self.max_length = config['max_seq_length']
 
         self.num_directions = 2 if self.bidirectional else 1
@@ -78,24 +79,24 @@ class CNNVAE(UnconditionalGenerator):
         idx2token = eval_data.idx2token
 
         with torch.no_grad():
-            for _ in range(self.eval_generate_num):
-                z = torch.randn(size=(1, self.latent_size), device=self.device)
-                generate_tokens = []
-                input_seq = torch.LongTensor([[self.sos_token_idx]]).to(self.device)
-                for _ in range(self.max_length):
-                    decoder_input = self.token_embedder(input_seq)
-                    outputs = self.decoder(decoder_input=decoder_input, noise=z)
-                    token_logits = self.vocab_linear(outputs)
-                    token_idx = topk_sampling(token_logits)
-                    token_idx = token_idx.item()
-                    if token_idx == self.eos_token_idx:
-                        break
-                    else:
-                        generate_tokens.append(idx2token[token_idx])
-                        input_seq = torch.LongTensor([[token_idx]]).to(self.device)
-                generate_corpus.append(generate_tokens)
+            for start in range(0, self.eval_generate_num, self.eval_batch_size):
+                generate_idx = self._sample_batch(min(self.eval_batch_size, self.eval_generate_num - start))
+                generate_corpus += batch_idx2token(generate_idx, self.eos_token_idx, idx2token)
         return generate_corpus
 
+    def _sample_batch(self, batch_size):
+        r"""Sample ``batch_size`` sentences at once from random latent variables."""
+        z = torch.randn(size=(batch_size, self.latent_size), device=self.device)
+        return decode_until_eos(
+            self._sample_step, batch_size, self.max_length, self.sos_token_idx, self.eos_token_idx, self.device, z
+        )
+
+    def _sample_step(self, input_seq, gen_idx, z):
+        decoder_input = self.token_embedder(input_seq)
+        outputs = self.decoder(decoder_input=decoder_input, noise=z)
+        token_logits = self.vocab_linear(outputs)
+        return topk_sampling(token_logits).view(-1), z
+
     def calculate_loss(self, corpus, epoch_idx=0):
         input_text = corpus['target_idx'][:, :-1]
         target_text = corpus['target_idx'][:, 1:]
@@ -18,7 +18,7 @@ from textbox.model.abstract_generator import UnconditionalGenerator
 from textbox.module.Encoder.cnn_encoder import BasicCNNEncoder
 from textbox.module.Decoder.cnn_decoder import HybridDecoder
 from textbox.model.init import xavier_normal_initialization
-from textbox.module.strategy import topk_sampling
+from textbox.module.strategy import topk_sampling, batch_idx2token, decode_until_eos
 
 
 class HybridVAE(UnconditionalGenerator):
@@ -39,6 +39,7 @@ class HybridVAE(UnconditionalGenerator):
         self.rnn_type = config['rnn_type']
         self.dropout_ratio = config['dropout_ratio']
         self.eval_generate_num = config['eval_generate_num']
+        self.eval_batch_size = config['eval_batch_size']
         self.max_length = config['max_seq_length']
 
         self.padding_token_idx = dataset.padding_token_idx
@@ -65,35 +66,37 @@ class HybridVAE(UnconditionalGenerator):
         idx2token = eval_data.idx2token
 
         with torch.no_grad():
-            for _ in range(self.eval_generate_num):
-                z = torch.randn(size=(1, self.latent_size), device=self.device)
-                cnn_out = self.decoder.conv_decoder(z)
-                if self.rnn_type == "lstm":
-                    hidden_states = torch.randn(size=(1, 2 * self.hidden_size), device=self.device)
-                    hidden_states = torch.chunk(hidden_states, 2, dim=-1)
-                    h_0 = hidden_states[0].unsqueeze(0).expand(self.num_dec_layers, -1, -1).contiguous()
-                    c_0 = hidden_states[1].unsqueeze(0).expand(self.num_dec_layers, -1, -1).contiguous()
-                    hidden_states = (h_0, c_0)
-                else:
-                    hidden_states = torch.randn(size=(self.num_dec_layers, 1, self.hidden_size), device=self.device)
-                generate_tokens = []
-                input_seq = torch.LongTensor([[self.sos_token_idx]]).to(self.device)
-                for gen_idx in range(self.max_length):
-                    decoder_input = self.token_embedder(input_seq)
-
-                    token_logits, hidden_states = self.decoder.rnn_decoder(
-                        cnn_out[:, gen_idx, :].unsqueeze(1), decoder_input=decoder_input, initial_state=hidden_states
-                    )
-                    token_idx = topk_sampling(token_logits)
-                    token_idx = token_idx.item()
-                    if token_idx == self.eos_token_idx:
-                        break
-                    else:
-                        generate_tokens.append(idx2token[token_idx])
-                        input_seq = torch.LongTensor([[token_idx]]).to(self.device)
-                generate_corpus.append(generate_tokens)
+            for start in range(0, self.eval_generate_num, self.eval_batch_size):
+                generate_idx = self._sample_batch(min(self.eval_batch_size, self.eval_generate_num - start))
+                generate_corpus += batch_idx2token(generate_idx, self.eos_token_idx, idx2token)
         return generate_corpus
 
+    def _sample_batch(self, batch_size):
+        r"""Sample ``batch_size`` sentences at once from random latent variables and initial hidden states."""
+        z = torch.randn(size=(batch_size, self.latent_size), device=self.device)
+        cnn_out = self.decoder.conv_decoder(z)
+        if self.rnn_type == "lstm":
+            hidden_states = torch.randn(size=(batch_size, 2 * self.hidden_size), device=self.device)
+            hidden_states = torch.chunk(hidden_states, 2, dim=-1)
+            h_0 = hidden_states[0].unsqueeze(0).expand(self.num_dec_layers, -1, -1).contiguous()
+            c_0 = hidden_states[1].unsqueeze(0).expand(self.num_dec_layers, -1, -1).contiguous()
+            hidden_states = (h_0, c_0)
+        else:
+            hidden_states = torch.randn(size=(self.num_dec_layers, batch_size, self.hidden_size), device=self.device)
+        return decode_until_eos(
+            self._sample_step, batch_size, self.max_length, self.sos_token_idx, self.eos_token_idx, self.device,
+            (cnn_out, hidden_states)
+        )
+
+    def _sample_step(self, input_seq, gen_idx, states):
+        cnn_out, hidden_states = states
+        decoder_input = self.token_embedder(input_seq)
+
+        token_logits, hidden_states = self.decoder.rnn_decoder(
+            cnn_out[:, gen_idx, :].unsqueeze(1), decoder_input=decoder_input, initial_state=hidden_states
+        )
+        return topk_sampling(token_logits).view(-1), (cnn_out, hidden_states)
+
     def calculate_loss(self, corpus, epoch_idx=0):
         input_text = corpus['target_idx'][:, :-1]
         target_text = corpus['target_idx'][:, 1:]
@@ -18,7 +18,8 @@ from textbox.model.abstract_generator import UnconditionalGenerator
 from textbox.module.Encoder.rnn_encoder import BasicRNNEncoder
 from textbox.module.Decoder.rnn_decoder import BasicRNNDecoder
 from textbox.model.init import xavier_normal_initialization
-from textbox.module.strategy import topk_sampling
+from textbox.module.strategy import topk_sampling, batch_idx2token, decode_until_eos
+from textbox.module.loss import vocab_nll_loss
 
 
 class RNNVAE(UnconditionalGenerator):
@@ -41,7 +42,9 @@ class RNNVAE(UnconditionalGenerator):
         self.bidirectional = config['bidirectional']
         self.dropout_ratio = config['dropout_ratio']
         self.eval_generate_num = config['eval_generate_num']
+        self.eval_batch_size = config['eval_batch_size']
         self.max_length = config['max_seq_length']
+        self.loss_chunk_size = config['loss_chunk_size']
 
         self.num_directions = 2 if self.bidirectional else 1
         self.padding_token_idx = dataset.padding_token_idx
@@ -82,32 +85,33 @@ class RNNVAE(UnconditionalGenerator):
         idx2token = eval_data.idx2token
 
         with torch.no_grad():
-            for _ in range(self.eval_generate_num):
-                if self.rnn_type == "lstm":
-                    hidden_states = torch.randn(size=(1, 2 * self.hidden_size), device=self.device)
-                    hidden_states = torch.chunk(hidden_states, 2, dim=-1)
-                    h_0 = hidden_states[0].unsqueeze(0).expand(self.num_dec_layers, -1, -1).contiguous()
-                    c_0 = hidden_states[1].unsqueeze(0).expand(self.num_dec_layers, -1, -1).contiguous()
-                    hidden_states = (h_0, c_0)
-                else:
-                    hidden_states = torch.randn(size=(self.num_dec_layers, 1, self.hidden_size), device=self.device)
-                # draw noise from standard gussian distribution
-                generate_tokens = []
-                input_seq = torch.LongTensor([[self.sos_token_idx]]).to(self.device)
-                for _ in range(self.max_length):
-                    decoder_input = self.token_embedder(input_seq)
-                    outputs, hidden_states = self.decoder(input_embeddings=decoder_input, hidden_states=hidden_states)
-                    token_logits = self.vocab_linear(outputs)
-                    token_idx = topk_sampling(token_logits)
-                    token_idx = token_idx.item()
-                    if token_idx == self.eos_token_idx:
-                        break
-                    else:
-                        generate_tokens.append(idx2token[token_idx])
-                        input_seq = torch.LongTensor([[token_idx]]).to(self.device)
-                generate_corpus.append(generate_tokens)
+            for start in range(0, self.eval_generate_num, self.eval_batch_size):
+                generate_idx = self._sample_batch(min(self.eval_batch_size, self.eval_generate_num - start))
+                generate_corpus += batch_idx2token(generate_idx, self.eos_token_idx, idx2token)
         return generate_corpus
 
+    def _sample_batch(self, batch_size):
+        r"""Sample ``batch_size`` sentences at once from random initial hidden states."""
+        # draw noise from standard gussian distribution
+        if self.rnn_type == "lstm":
+            hidden_states = torch.randn(size=(batch_size, 2 * self.hidden_size), device=self.device)
+            hidden_states = torch.chunk(hidden_states, 2, dim=-1)
+            h_0 = hidden_states[0].unsqueeze(0).expand(self.num_dec_layers, -1, -1).contiguous()
+            c_0 = hidden_states[1].unsqueeze(0).expand(self.num_dec_layers, -1, -1).contiguous()
+            hidden_states = (h_0, c_0)
+        else:
+            hidden_states = torch.randn(size=(self.num_dec_layers, batch_size, self.hidden_size), device=self.device)
+        return decode_until_eos(
+            self._sample_step, batch_size, self.max_length, self.sos_token_idx, self.eos_token_idx, self.device,
+            hidden_states
+        )
+
+    def _sample_step(self, input_seq, gen_idx, hidden_states):
+        decoder_input = self.token_embedder(input_seq)
+        outputs, hidden_states = self.decoder(input_embeddings=decoder_input, hidden_states=hidden_states)
+        token_logits = self.vocab_linear(outputs)
+        return topk_sampling(token_logits).view(-1), hidden_states
+
     def calculate_loss(self, corpus, epoch_idx=0):
         input_text = corpus['target_idx'][:, :-1]
         target_text = corpus['target_idx'][:, 1:]
@@ -149,10 +153,7 @@ class RNNVAE(UnconditionalGenerator):
 
         input_emb = self.dropout(input_emb)
         outputs, hidden_states = self.decoder(input_embeddings=input_emb, hidden_states=decoder_hidden)
-        token_logits = self.vocab_linear(outputs)
-
-        loss = self.loss(token_logits.view(-1, token_logits.size(-1)), target_text.contiguous().view(-1))
-        loss = loss.reshape_as(target_text)
+        loss = vocab_nll_loss(outputs, self.vocab_linear, target_text, self.padding_token_idx, self.loss_chunk_size)
 
         length = corpus['target_length'] - 1
         loss = loss.sum(dim=1) / length.float()
@@ -204,10 +205,7 @@ class RNNVAE(UnconditionalGenerator):
             decoder_hidden = hidden.unsqueeze(0).expand(self.num_dec_layers, -1, -1).contiguous()
 
         outputs, hidden_states = self.decoder(input_embeddings=input_emb, hidden_states=decoder_hidden)
-        token_logits = self.vocab_linear(outputs)
-
-        loss = self.loss(token_logits.view(-1, token_logits.size(-1)), target_text.contiguous().view(-1))
-        loss = loss.reshape_as(target_text)
+        loss = vocab_nll_loss(outputs, self.vocab_linear, target_text, self.padding_token_idx, self.loss_chunk_size)
 
         loss = loss.sum(dim=1)
         return loss.mean()
@@ -34,6 +34,18 @@ class AbstractModel(nn.Module):
         """
         raise NotImplementedError
 
+    def forward(self, corpus, **kwargs):
+        r"""Calculate the training loss for a batch data by :meth:`calculate_loss`, so that the model can be wrapped
+        by :class:`~torch.nn.parallel.DistributedDataParallel`.
+
+        Args:
+            corpus (Corpus): Corpus class of the batch.
+
+        Returns:
+            torch.Tensor: Training loss, shape: []
+        """
+        return self.calculate_loss(corpus, **kwargs)
+
     def generate(self, corpus):
         r"""Predict the texts conditioned on a noise or sequence.
 
@@ -93,6 +105,7 @@ class Seq2SeqGenerator(AbstractModel):
         if hasattr(dataset, "source_idx2token"):
             self.source_vocab_size = len(dataset.source_idx2token)
             self.target_vocab_size = len(dataset.target_idx2token)
+            self.target_idx2token = dataset.target_idx2token
         else:
             self.vocab_size = len(dataset.idx2token)
 
@@ -100,6 +113,19 @@ class Seq2SeqGenerator(AbstractModel):
         self.batch_size = config['train_batch_size']
         self.device = config['device']
 
+    def calculate_token_logits(self, corpus):
+        r"""Calculate the logits of target tokens with teacher forcing, which are used as soft targets or
+        distilled by :class:`~textbox.trainer.trainer.DistillationTrainer`.
+
+        Args:
+            corpus (Corpus): Corpus class of the batch.
+
+        Returns:
+            torch.Tensor: logits (or log-probabilities) over the target vocabulary, shape: [batch_size,
+            target_length - 1, target_vocab_size]
+        """
+        raise NotImplementedError
+
 
 class GenerativeAdversarialNet(UnconditionalGenerator):
     """This is a abstract general generative adversarial network. All the GAN model should implement this class.
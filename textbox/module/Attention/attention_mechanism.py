@@ -17,6 +17,7 @@ from torch import nn
 from torch.nn import Parameter
 import torch.nn.functional as F
 import math
+from typing import Dict, Optional
 
 
 class LuongAttention(torch.nn.Module):
@@ -310,15 +311,33 @@ class MultiHeadAttention(torch.nn.Module):
         nn.init.constant_(self.value_proj.bias, 0.)
         nn.init.constant_(self.out_proj.bias, 0.)
 
-    def forward(self, query, key, value, key_padding_mask=None, attn_mask=None):
+    def forward(
+        self,
+        query,
+        key,
+        value,
+        key_padding_mask=None,
+        attn_mask=None,
+        layer_cache: Optional[Dict[str, torch.Tensor]] = None,
+        position: int = 0
+    ):
         r"""
         Multi-head attention
 
+        For incremental decoding, ``layer_cache`` is either the buffers ``'key'`` and ``'value'`` allocated for the
+        whole decoding, into which the keys and values of the new positions starting from ``position`` are written in
+        place, or the ``'static_key'`` and ``'static_value'`` projected once by :meth:`project_kv`, which replace those
+        of ``key`` and ``value``. If the cached keys and values have fewer examples than ``query``, e.g., the encoder
+        outputs shared by the hypotheses of beam search, every ``batch_size / kv_batch_size`` consecutive queries
+        attend to the same example.
+
         Args:
             query: shape: [batch_size, tgt_len, embedding_size]
             key and value: shape: [batch_size, src_len, embedding_size]
-            key_padding_mask: shape: [batch_size, src_len]
+            key_padding_mask: shape: [kv_batch_size, src_len]
             attn_mask: shape: [batch_size, tgt_len, src_len]
+            layer_cache (dict, optional): the cached keys and values for incremental decoding, default: None.
+            position (int, optional): the position of the first query in the cache, default: 0.
 
         Return:
             tuple:
@@ -326,19 +345,33 @@ class MultiHeadAttention(torch.nn.Module):
                 - attn_weights: shape: [batch_size, tgt_len, src_len]
         """
         batch_size, tgt_len, embedding_size = query.size()
-        src_len = key.size(1)
-        assert key.size() == value.size()
 
         q = self.query_proj(query) * self.scaling
-        k = self.key_proj(key)
-        v = self.value_proj(value)
-
         q = q.view(batch_size, tgt_len, self.num_heads, self.head_size).permute(0, 2, 1, 3)
-        k = k.view(batch_size, src_len, self.num_heads, self.head_size).permute(0, 2, 3, 1)
-        v = v.view(batch_size, src_len, self.num_heads, self.head_size).permute(0, 2, 1, 3)
 
-        attn_weights = torch.matmul(q, k)
-        assert list(attn_weights.size()) == [batch_size, self.num_heads, tgt_len, src_len]
+        if layer_cache is not None and 'static_key' in layer_cache:
+            k = layer_cache['static_key']
+            v = layer_cache['static_value']
+        else:
+            k, v = self.project_kv(key, value)
+            if layer_cache is not None:
+                end = position + k.size(2)
+                layer_cache['key'][:, :, position:end] = k
+                layer_cache['value'][:, :, position:end] = v
+                k = layer_cache['key'][:, :, :end]
+                v = layer_cache['value'][:, :, :end]
+        kv_batch_size, _, src_len, _ = k.size()
+
+        # fold the queries sharing the same keys and values into one example instead of copying them
+        group_size = batch_size // kv_batch_size
+        if group_size > 1:
+            q = q.view(kv_batch_size, group_size, self.num_heads, tgt_len, self.head_size).transpose(1, 2)
+            q = q.reshape(kv_batch_size, self.num_heads, group_size * tgt_len, self.head_size)
+            if attn_mask is not None:
+                attn_mask = attn_mask.repeat(group_size, 1)
+
+        attn_weights = torch.matmul(q, k.transpose(2, 3))
+        assert list(attn_weights.size()) == [kv_batch_size, self.num_heads, group_size * tgt_len, src_len]
 
         if attn_mask is not None:
             attn_weights.masked_fill_(attn_mask.unsqueeze(0).unsqueeze(1), float('-inf'))
@@ -349,6 +382,12 @@ class MultiHeadAttention(torch.nn.Module):
         attn_weights = self.weight_dropout(F.softmax(attn_weights, dim=-1))
         attn_repre = torch.matmul(attn_weights, v)
 
+        if group_size > 1:
+            attn_repre = attn_repre.view(kv_batch_size, self.num_heads, group_size, tgt_len, self.head_size)
+            attn_repre = attn_repre.transpose(1, 2).reshape(batch_size, self.num_heads, tgt_len, self.head_size)
+            attn_weights = attn_weights.view(kv_batch_size, self.num_heads, group_size, tgt_len, src_len)
+            attn_weights = attn_weights.transpose(1, 2).reshape(batch_size, self.num_heads, tgt_len, src_len)
+
         assert list(attn_repre.size()) == [batch_size, self.num_heads, tgt_len, self.head_size]
 
         attn_repre = attn_repre.transpose(1, 2).contiguous().view(batch_size, tgt_len, embedding_size)
@@ -359,6 +398,25 @@ class MultiHeadAttention(torch.nn.Module):
 
         return attn_repre, attn_weights
 
+    @torch.jit.export
+    def project_kv(self, key, value):
+        r"""Project key and value into the heads of attention, which can be cached for incremental decoding.
+
+        Args:
+            key and value: shape: [batch_size, src_len, embedding_size]
+
+        Return:
+            tuple:
+                - k: shape: [batch_size, num_heads, src_len, head_size]
+                - v: shape: [batch_size, num_heads, src_len, head_size]
+        """
+        batch_size, src_len, _ = key.size()
+        assert key.size() == value.size()
+
+        k = self.key_proj(key).view(batch_size, src_len, self.num_heads, self.head_size).transpose(1, 2)
+        v = self.value_proj(value).view(batch_size, src_len, self.num_heads, self.head_size).transpose(1, 2)
+        return k, v
+
 
 class SelfAttentionMask(torch.nn.Module):
 
@@ -10,13 +10,20 @@ Transformer Decoder
 import torch
 from torch import nn
 from torch.nn import Parameter
-from textbox.module.layers import TransformerLayer
+from textbox.module.layers import TransformerLayer, checkpoint_layer
 import torch.nn.functional as F
 
 
 class TransformerDecoder(torch.nn.Module):
     r"""
     The stacked Transformer decoder layers.
+
+    If ``checkpoint_layers`` is ``k`` (``k > 0``), the activations of every ``k``-th layer (all layers when ``k`` is 1)
+    are recomputed during backward instead of being kept in memory while training.
+
+    For incremental decoding, a cache built by :meth:`init_cache` keeps the self-attention keys and values of the
+    decoded positions in every layer, so that only the newest token is fed at each step, and the keys and values of
+    the external states, which are projected only once for the whole decoding.
     """
 
     def __init__(
@@ -28,10 +35,13 @@ class TransformerDecoder(torch.nn.Module):
         attn_dropout_ratio=0.0,
         attn_weight_dropout_ratio=0.0,
         ffn_dropout_ratio=0.0,
-        with_external=True
+        with_external=True,
+        checkpoint_layers=0
     ):
         super(TransformerDecoder, self).__init__()
 
+        self.checkpoint_layers = int(checkpoint_layers or 0)
+
         self.transformer_layers = nn.ModuleList()
         for _ in range(num_dec_layers):
             self.transformer_layers.append(
@@ -48,7 +58,9 @@ class TransformerDecoder(torch.nn.Module):
         self_padding_mask=None,
         self_attn_mask=None,
         external_states=None,
-        external_padding_mask=None
+        external_padding_mask=None,
+        cache=None,
+        position=0
     ):
         r""" Implement the decoding process step by step.
 
@@ -59,10 +71,68 @@ class TransformerDecoder(torch.nn.Module):
             self_attn_mask (Torch.Tensor): diagonal attention mask matrix of target sequence, shape: [batch_size, sequence_length, sequence_length], default: None.
             external_states (Torch.Tensor): output features of encoder, shape: [batch_size, sequence_length, feature_size], default: None.
             external_padding_mask (Torch.Tensor): padding mask of source sequence, shape: [batch_size, sequence_length], default: None.
+            cache (list of dict): the cache built by :meth:`init_cache`, which is updated in place, default: None.
+            position (int): the position of the first token of x in the cache, default: 0.
 
         Returns:
             Torch.Tensor: output features, shape: [batch_size, sequence_length, ffn_size].
         """
         for idx, layer in enumerate(self.transformer_layers):
-            x, _, _ = layer(x, kv, self_padding_mask, self_attn_mask, external_states, external_padding_mask)
+            if self._is_checkpointed(idx):
+                x, _, _ = checkpoint_layer(
+                    layer, x, kv, self_padding_mask, self_attn_mask, external_states, external_padding_mask
+                )
+            else:
+                x, _, _ = layer(
+                    x, kv, self_padding_mask, self_attn_mask, external_states, external_padding_mask,
+                    None if cache is None else cache[idx], position
+                )
         return x
+
+    def init_cache(self, batch_size, max_length, external_states=None):
+        r"""Build the cache for incremental decoding, whose self-attention buffers are allocated once for the whole
+        decoding and filled in place step by step.
+
+        The keys and values of ``external_states`` are projected here once. Its batch size can be a divisor of
+        ``batch_size``, e.g., the encoder outputs of every example are shared by the consecutive ``batch_size /
+        external_batch_size`` hypotheses of beam search without being copied.
+
+        Args:
+            batch_size (int): the number of decoded sequences.
+            max_length (int): the max number of decoded positions.
+            external_states (Torch.Tensor): output features of encoder, shape: [external_batch_size, sequence_length,
+                feature_size], default: None.
+
+        Returns:
+            list of dict: the cache of every layer.
+        """
+        cache = []
+        for layer in self.transformer_layers:
+            attention = layer.multi_head_attention
+            weight = layer.attn_layer_norm.weight
+            shape = (batch_size, attention.num_heads, max_length, attention.head_size)
+            self_cache = {'key': weight.new_zeros(shape), 'value': weight.new_zeros(shape)}
+            external_cache = dict()
+            if layer.with_external and external_states is not None:
+                key, value = layer.external_multi_head_attention.project_kv(external_states, external_states)
+                external_cache = {'static_key': key, 'static_value': value}
+            cache.append({'self': self_cache, 'external': external_cache})
+        return cache
+
+    @staticmethod
+    def reorder_cache(cache, beam_idx, length):
+        r"""Reorder the cache in place for the hypotheses kept by beam search. The external keys and values are
+        shared by the hypotheses of an example, so only the self-attention buffers are reordered.
+
+        Args:
+            cache (list of dict): the cache of every layer.
+            beam_idx (torch.LongTensor): the hypothesis which every new hypothesis extends.
+            length (int): the number of decoded positions.
+        """
+        for layer_cache in cache:
+            for buffer in layer_cache['self'].values():
+                buffer[:, :, :length] = buffer[:, :, :length].index_select(0, beam_idx)
+
+    def _is_checkpointed(self, idx):
+        return self.checkpoint_layers > 0 and self.training and torch.is_grad_enabled() and \
+               idx % self.checkpoint_layers == 0
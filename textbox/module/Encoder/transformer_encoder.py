@@ -10,13 +10,16 @@ Transformer Encoder
 import torch
 from torch import nn
 from torch.nn import Parameter
-from textbox.module.layers import TransformerLayer
+from textbox.module.layers import TransformerLayer, checkpoint_layer
 import torch.nn.functional as F
 
 
 class TransformerEncoder(torch.nn.Module):
     r"""
     The stacked Transformer encoder layers.
+
+    If ``checkpoint_layers`` is ``k`` (``k > 0``), the activations of every ``k``-th layer (all layers when ``k`` is 1)
+    are recomputed during backward instead of being kept in memory while training.
     """
 
     def __init__(
@@ -27,10 +30,13 @@ class TransformerEncoder(torch.nn.Module):
         num_heads,
         attn_dropout_ratio=0.0,
         attn_weight_dropout_ratio=0.0,
-        ffn_dropout_ratio=0.0
+        ffn_dropout_ratio=0.0,
+        checkpoint_layers=0
     ):
         super(TransformerEncoder, self).__init__()
 
+        self.checkpoint_layers = int(checkpoint_layers or 0)
+
         self.transformer_layers = nn.ModuleList()
         for _ in range(num_enc_layers):
             self.transformer_layers.append(
@@ -54,8 +60,15 @@ class TransformerEncoder(torch.nn.Module):
         """
         all_encoded_layers = []
         for idx, layer in enumerate(self.transformer_layers):
-            x, _, _ = layer(x, kv, self_padding_mask)
+            if self._is_checkpointed(idx):
+                x, _, _ = checkpoint_layer(layer, x, kv, self_padding_mask)
+            else:
+                x, _, _ = layer(x, kv, self_padding_mask)
             all_encoded_layers.append(x)
         if output_all_encoded_layers:
             return all_encoded_layers
         return all_encoded_layers[-1]
+
+    def _is_checkpointed(self, idx):
+        return self.checkpoint_layers > 0 and self.training and torch.is_grad_enabled() and \
+               idx % self.checkpoint_layers == 0
@@ -12,6 +12,7 @@ import torch.nn as nn
 import torch.nn.functional as F
 import math
 from textbox.model.abstract_generator import UnconditionalGenerator
+from textbox.module.strategy import after_eos_mask
 from torch.distributions import Categorical
 
 
@@ -37,8 +38,6 @@ class LeakGANGenerator(UnconditionalGenerator):
         self.pad_idx = dataset.padding_token_idx
         self.vocab_size = dataset.vocab_size
         self.batch_size = dataset.batch_size
-        self.use_gpu = config['use_gpu']
-        self.gpu_id = config['gpu_id']
         self.eval_generate_num = config['eval_generate_num']
 
         self.word_embedding = nn.Embedding(self.vocab_size, self.embedding_size)
@@ -167,40 +166,24 @@ class LeakGANGenerator(UnconditionalGenerator):
         """
         batch_size, seq_len = targets.size()  # seq_len = max_seq_len
 
-        feature_array = torch.zeros((batch_size, self.max_length + 1, self.goal_out_size))
-        goal_array = torch.zeros((batch_size, self.max_length + 1, self.goal_out_size))
-        leak_out_array = torch.zeros((batch_size, self.max_length + 1, self.vocab_size))
-        if self.use_gpu:
-            feature_array = feature_array.cuda(self.gpu_id)
-            goal_array = goal_array.cuda(self.gpu_id)
-            leak_out_array = leak_out_array.cuda(self.gpu_id)
+        goal_array = torch.zeros((batch_size, self.max_length + 1, self.goal_out_size), device=self.device)
+        leak_out_array = torch.zeros((batch_size, self.max_length + 1, self.vocab_size), device=self.device)
 
         work_hidden = self.init_hidden(batch_size)
         mana_hidden = self.init_hidden(batch_size)
         # Special operations for step 0
-        leak_inp_t = torch.LongTensor([self.start_idx] * batch_size)  # the input token for worker at step t
-        cur_dis_inp = torch.LongTensor([self.pad_idx] * batch_size * seq_len)  # current sentence for dis ar step t
-        cur_dis_inp = cur_dis_inp.view((batch_size, seq_len))  # bs*seq_len
-        if self.use_gpu:
-            leak_inp_t = leak_inp_t.cuda(self.gpu_id)
-            cur_dis_inp = cur_dis_inp.cuda(self.gpu_id)
+        leak_inp_t = torch.full((batch_size, ), self.start_idx, dtype=torch.long, device=self.device)
+        features = self.prefix_features(targets, dis, self.max_length)  # (max_len + 1) * batch_size * total_num_filters
+        # copied since worker_cos_reward modifies feature_array in place
+        feature_array = features.transpose(0, 1).clone()  # batch_size * (max_len + 1) * total_num_filters
 
         real_goal = self.goal_init[:batch_size, :]  # init real goal
         goal_array[:, 0, :] = real_goal
-        last_goal = torch.zeros_like(real_goal)
-        feature = dis.get_feature(cur_dis_inp).unsqueeze(0)  # !!!note: 1 * batch_size * total_num_filters
-        feature_array[:, 0, :] = feature.squeeze(0)  # batch_size * total_num_filters
         # Update the hidden state of manager using the current all padding token
-        _, mana_hidden = self.manager(feature, mana_hidden)  # mana_out: 1 * batch_size * hidden_dim
+        _, mana_hidden = self.manager(features[:1], mana_hidden)  # mana_out: 1 * batch_size * hidden_dim
 
         for i in range(1, self.max_length + 1):
-            # get current dis inp which giving the real top i token and padding token
-            given_dis_inp = targets[:, :i]  # bs*i
-            cur_dis_inp = torch.cat([given_dis_inp, cur_dis_inp], dim=1)
-            cur_dis_inp = cur_dis_inp[:, :seq_len].long()
-            # get feature
-            feature = dis.get_feature(cur_dis_inp).unsqueeze(0)  # !!!note: 1 * batch_size * total_num_filters
-            feature_array[:, i, :] = feature.squeeze(0)  # batch_size * total_num_filters
+            feature = features[i:i + 1]  # 1 * batch_size * total_num_filters
             # using input_t and feature_t to get token_t+1
             # out is the log softmax over vocab distribution
             out, cur_goal, work_hidden, mana_hidden = self.forward(
@@ -216,13 +199,35 @@ class LeakGANGenerator(UnconditionalGenerator):
 
             # use the real input token during train
             leak_inp_t = targets[:, i - 1]
-            if self.use_gpu:
-                leak_inp_t = leak_inp_t.cuda(self.gpu_id)
         # cur to seq_len
         leak_out_array = leak_out_array[:, :seq_len, :]
 
         return leak_out_array, feature_array, goal_array
 
+    def prefix_features(self, targets, dis, prefix_num):
+        r"""Get the features of the sentences given to dis at the first prefix_num + 1 steps by one call of dis.
+
+        The sentence at step 0 is all padding, and that at step i is the top i tokens of targets followed by the
+        sentence at step i - 1, cut to seq_len.
+
+        Args:
+            targets: batch_size * seq_len
+            dis: discriminator model
+            prefix_num: the number of steps given the real tokens
+
+        Returns:
+            features: (prefix_num + 1) * batch_size * total_num_filters
+        """
+        batch_size, seq_len = targets.size()
+        targets = targets.long().to(self.device)
+        cur_dis_inp = torch.full((batch_size, seq_len), self.pad_idx, dtype=torch.long, device=self.device)
+        dis_inps = [cur_dis_inp]
+        for i in range(1, prefix_num + 1):
+            cur_dis_inp = torch.cat([targets[:, :i], cur_dis_inp], dim=1)[:, :seq_len]
+            dis_inps.append(cur_dis_inp)
+        features = dis.get_feature(torch.cat(dis_inps, dim=0))  # ((prefix_num + 1) * bs) * total_num_filters
+        return features.view(prefix_num + 1, batch_size, -1)
+
     def sample_batch(self):
         r"""Sample a batch of data
         """
@@ -241,16 +246,12 @@ class LeakGANGenerator(UnconditionalGenerator):
             for i in range(1, self.max_length):
                 output, prev_state = self.LSTM(X, prev_state)
                 P = F.softmax(self.vocab_projection(output), dim=-1).squeeze(0)  # b * v
-                for j in range(self.batch_size):
-                    sentences[i][j] = torch.multinomial(P[j], 1)[0]
+                sentences[i] = torch.multinomial(P, 1).squeeze(1)  # b
                 X = self.word_embedding(sentences[i]).unsqueeze(0)  # 1 * b * e
 
             sentences = sentences.permute(1, 0)  # b * l
 
-            for i in range(self.batch_size):
-                end_pos = (sentences[i] == self.end_idx).nonzero(as_tuple=False)
-                if (end_pos.shape[0]):
-                    sentences[i][end_pos[0][0] + 1:] = self.pad_idx
+            sentences.masked_fill_(after_eos_mask(sentences, self.end_idx), self.pad_idx)
 
         self.train()
 
@@ -270,9 +271,7 @@ class LeakGANGenerator(UnconditionalGenerator):
             assert leak_sample.shape == (self.batch_size, self.max_length)
             samples[b * self.batch_size:(b + 1) * self.batch_size, :] = leak_sample
 
-        samples = samples[:sample_num, :]
-        if self.use_gpu:
-            samples = samples.cuda(self.gpu_id)
+        samples = samples[:sample_num, :].to(self.device)
 
         return samples
 
@@ -297,9 +296,8 @@ class LeakGANGenerator(UnconditionalGenerator):
                 leak_inp_t = gen_x
                 cur_dis_inp = torch.cat([gen_x.unsqueeze(dim=1), cur_dis_inp], dim=-1)
                 cur_dis_inp = cur_dis_inp[:, :self.max_length].long()
-            if self.use_gpu:
-                leak_inp_t = leak_inp_t.cuda(self.gpu_id)
-                cur_dis_inp = cur_dis_inp.cuda(self.gpu_id)
+            leak_inp_t = leak_inp_t.to(self.device)
+            cur_dis_inp = cur_dis_inp.to(self.device)
 
             # get feature
             feature = dis.get_feature(cur_dis_inp).unsqueeze(0)  # !!!note: 1 * batch_size * total_num_filters
@@ -324,9 +322,6 @@ class LeakGANGenerator(UnconditionalGenerator):
 
         samples = torch.stack(samples, dim=1)
         log_probs = torch.stack(log_probs, dim=1)
-        if self.use_gpu:
-            samples = samples.cuda(self.gpu_id)
-            log_probs = log_probs.cuda(self.gpu_id)
         return samples
 
     def generate(self, eval_data, dis):
@@ -375,12 +370,8 @@ class LeakGANGenerator(UnconditionalGenerator):
     def init_hidden(self, batch_size=1):
         r"""Init hidden state for lstm
         """
-        h = torch.zeros(1, batch_size, self.hidden_size)
-        c = torch.zeros(1, batch_size, self.hidden_size)
-
-        if self.use_gpu:
-            h = h.cuda(self.gpu_id)
-            c = c.cuda(self.gpu_id)
+        h = torch.zeros(1, batch_size, self.hidden_size, device=self.device)
+        c = torch.zeros(1, batch_size, self.hidden_size, device=self.device)
         return h, c
 
     def manager_cos_loss(self, batch_size, feature_array, goal_array):
@@ -492,9 +483,7 @@ class LeakGANGenerator(UnconditionalGenerator):
         """
         with torch.no_grad():
             batch_size = sentences.size(0)
-            rewards = torch.zeros([rollout_num * (self.max_length // self.step_size), batch_size]).float()
-            if self.use_gpu:
-                rewards = rewards.cuda(self.gpu_id)
+            rewards = torch.zeros([rollout_num * (self.max_length // self.step_size), batch_size], device=self.device)
             idx = 0
             for i in range(rollout_num):
                 for t in range(1, self.max_length // self.step_size):
@@ -557,29 +546,19 @@ class LeakGANGenerator(UnconditionalGenerator):
         real_goal = self.goal_init[:batch_size, :]
         out = 0
 
-        leak_inp_t = torch.LongTensor([self.start_idx] * batch_size)  # the input token for worker at step t
-        cur_dis_inp = torch.LongTensor([self.pad_idx] * batch_size * seq_len)  # current sentence for dis ar step t
-        cur_dis_inp = cur_dis_inp.view((batch_size, seq_len))  # bs*seq_len
+        leak_inp_t = torch.full((batch_size, ), self.start_idx, dtype=torch.long, device=self.device)
         leak_out_array = []
-        if self.use_gpu:
-            leak_inp_t = leak_inp_t.cuda(self.gpu_id)
-            cur_dis_inp = cur_dis_inp.cuda(self.gpu_id)
-            targets = targets.cuda(self.gpu_id)
+        targets = targets.to(self.device)
 
         real_goal = self.goal_init[:batch_size, :]  # init real goal
         last_goal = torch.zeros_like(real_goal)
-        feature = dis.get_feature(cur_dis_inp).unsqueeze(0)  # !!!note: 1 * batch_size * total_num_filters
+        features = self.prefix_features(targets, dis, given_num)  # (given_num + 1) * batch_size * total_num_filters
         # Update the hidden state of manager using the current all padding token
-        _, mana_hidden = self.manager(feature, mana_hidden)  # mana_out: 1 * batch_size * hidden_dim
+        _, mana_hidden = self.manager(features[:1], mana_hidden)  # mana_out: 1 * batch_size * hidden_dim
 
         # get current state
         for i in range(1, given_num + 1):
-            # get current dis inp which giving the real top i token and padding token
-            given_dis_inp = targets[:, :i]  # bs*i
-            cur_dis_inp = torch.cat([given_dis_inp, cur_dis_inp], dim=1)
-            cur_dis_inp = cur_dis_inp[:, :seq_len].long()
-            # get feature
-            feature = dis.get_feature(cur_dis_inp).unsqueeze(0)  # !!!note: 1 * batch_size * total_num_filters
+            feature = features[i:i + 1]  # 1 * batch_size * total_num_filters
             # using input_t and feature_t to get token_t+1
             # out is the log softmax over vocab distribution
             out, cur_goal, work_hidden, mana_hidden = self.forward(
@@ -590,8 +569,6 @@ class LeakGANGenerator(UnconditionalGenerator):
 
             last_goal = last_goal + cur_goal
             leak_inp_t = targets[:, i - 1]
-            if self.use_gpu:
-                leak_inp_t = leak_inp_t.cuda(self.gpu_id)
 
             # update real goal every step_size steps
             if i % self.step_size == 0:
@@ -602,8 +579,6 @@ class LeakGANGenerator(UnconditionalGenerator):
         for i in range(given_num + 1, self.max_length + 1):
             # get the generated token
             gen_x = torch.stack(leak_out_array, dim=-1)
-            if self.use_gpu:
-                gen_x = gen_x.cuda(self.gpu_id)
 
             cur_dis_inp = torch.cat([gen_x, targets], dim=-1)
             cur_dis_inp = cur_dis_inp[:, :seq_len].long()
@@ -618,9 +593,6 @@ class LeakGANGenerator(UnconditionalGenerator):
             # sample one token
             out_dis = Categorical(F.softmax(out))
             leak_inp_t = out_dis.sample()  # bs
-
-            if self.use_gpu:
-                leak_inp_t = leak_inp_t.cuda(self.gpu_id)
             leak_out_array.append(leak_inp_t)
 
             last_goal = last_goal + cur_goal
@@ -631,8 +603,6 @@ class LeakGANGenerator(UnconditionalGenerator):
 
         gen_x = torch.stack(leak_out_array, dim=-1)
         gen_x = gen_x[:, :seq_len]
-        if self.use_gpu:
-            gen_x = gen_x.cuda(self.gpu_id)
 
         return gen_x
 
@@ -12,6 +12,8 @@ import torch.nn as nn
 import torch.nn.functional as F
 import math
 from textbox.model.abstract_generator import UnconditionalGenerator
+from textbox.module.strategy import batch_idx2token, after_eos_mask, decode_until_eos
+from textbox.module.Generator.MonteCarloRollout import MonteCarloRollout
 
 
 class MaliGANGenerator(UnconditionalGenerator):
@@ -25,6 +27,7 @@ class MaliGANGenerator(UnconditionalGenerator):
         self.embedding_size = config['generator_embedding_size']
         self.max_length = config['max_seq_length'] + 2
         self.rollout_num = config['rollout_num']
+        self.rollout_batch_size = config['rollout_batch_size']
         self.eval_generate_num = config['eval_generate_num']
         self.start_idx = dataset.sos_token_idx
         self.end_idx = dataset.eos_token_idx
@@ -35,6 +38,8 @@ class MaliGANGenerator(UnconditionalGenerator):
         self.word_embedding = nn.Embedding(self.vocab_size, self.embedding_size, padding_idx=self.pad_idx)
         self.vocab_projection = nn.Linear(self.hidden_size, self.vocab_size)
 
+        self.rollout = MonteCarloRollout(self, self.rollout_num, self.rollout_batch_size)
+
     def calculate_loss(self, corpus, nll_test=False):
         r"""Calculate the generated loss of corpus.
 
@@ -84,16 +89,12 @@ class MaliGANGenerator(UnconditionalGenerator):
             for i in range(1, self.max_length):
                 output, prev_state = self.LSTM(X, prev_state)
                 P = F.softmax(self.vocab_projection(output), dim=-1).squeeze(0)  # b * v
-                for j in range(self.batch_size):
-                    sentences[i][j] = torch.multinomial(P[j], 1)[0]
+                sentences[i] = torch.multinomial(P, 1).squeeze(1)  # b
                 X = self.word_embedding(sentences[i]).unsqueeze(0)  # 1 * b * e
 
             sentences = sentences.permute(1, 0)  # b * l
 
-            for i in range(self.batch_size):
-                end_pos = (sentences[i] == self.end_idx).nonzero(as_tuple=False)
-                if (end_pos.shape[0]):
-                    sentences[i][end_pos[0][0] + 1:] = self.pad_idx
+            sentences.masked_fill_(after_eos_mask(sentences, self.end_idx), self.pad_idx)
 
         self.train()
         return sentences
@@ -108,7 +109,7 @@ class MaliGANGenerator(UnconditionalGenerator):
             torch.Tensor: The generated sentence indice, shape: [sample_num, max_seq_length].
         """
         samples = []
-        batch_num = math.ceil(sample_num // self.batch_size)
+        batch_num = math.ceil(sample_num / self.batch_size)
         for _ in range(batch_num):
             samples.append(self.sample_batch())
         samples = torch.cat(samples, dim=0)
@@ -128,30 +129,25 @@ class MaliGANGenerator(UnconditionalGenerator):
         idx2token = eval_data.idx2token
 
         with torch.no_grad():
-            for _ in range(self.eval_generate_num):
-                h_prev = torch.zeros(1, 1, self.hidden_size, device=self.device)  # 1 * 1 * h
-                o_prev = torch.zeros(1, 1, self.hidden_size, device=self.device)  # 1 * 1 * h
-                prev_state = (h_prev, o_prev)
-                X = self.word_embedding(
-                    torch.tensor([[self.start_idx]], dtype=torch.long, device=self.device)
-                )  # 1 * 1 * e
-                generate_tokens = []
-
-                for _ in range(self.max_length):
-                    output, prev_state = self.LSTM(X, prev_state)
-                    P = F.softmax(self.vocab_projection(output), dim=-1).squeeze()  # v
-                    token = torch.multinomial(P, 1)[0]
-                    X = self.word_embedding(torch.tensor([[token]], dtype=torch.long, device=self.device))  # 1 * 1 * e
-                    if (token.item() == self.end_idx):
-                        break
-                    else:
-                        generate_tokens.append(idx2token[token.item()])
-
-                generate_corpus.append(generate_tokens)
+            for start in range(0, self.eval_generate_num, self.batch_size):
+                batch_size = min(self.batch_size, self.eval_generate_num - start)
+                h_prev = torch.zeros(1, batch_size, self.hidden_size, device=self.device)  # 1 * b * h
+                o_prev = torch.zeros(1, batch_size, self.hidden_size, device=self.device)  # 1 * b * h
+                generate_idx = decode_until_eos(
+                    self._generate_step, batch_size, self.max_length, self.start_idx, self.end_idx, self.device,
+                    (h_prev, o_prev)
+                )  # b * l
+                generate_corpus += batch_idx2token(generate_idx, self.end_idx, idx2token)
 
         self.train()
         return generate_corpus
 
+    def _generate_step(self, input_seq, gen_idx, prev_state):
+        X = self.word_embedding(input_seq.t())  # 1 * b * e
+        output, prev_state = self.LSTM(X, prev_state)
+        P = F.softmax(self.vocab_projection(output), dim=-1).squeeze(0)  # b * v
+        return torch.multinomial(P, 1).squeeze(1), prev_state  # b
+
     def adversarial_loss(self, discriminator_func):
         r"""Calculate the adversarial generator loss guided by discriminator_func.
         A noval objective for the generator to optimize, using importance sampling.
@@ -168,36 +164,22 @@ class MaliGANGenerator(UnconditionalGenerator):
         """
         fake_samples = self.sample(self.batch_size)
 
-        rewards = []
+        # the discriminator is deterministic in eval mode, so the sentences are scored only once
         self.eval()
         with torch.no_grad():
-            for _ in range(self.rollout_num):
-                dis_out = discriminator_func(fake_samples)  # b
-                rewards.append(dis_out)
+            rewards = self.rollout.discriminate(fake_samples, discriminator_func)  # b
         self.train()
 
-        rewards = torch.mean(torch.stack(rewards, dim=0), dim=0)  # b
         rewards = torch.div(rewards, 1 - rewards)  # rD = D(x) / (1 - D(x))
         rewards = torch.div(rewards, torch.sum(rewards))
         #rewards -= torch.mean(rewards) # To do: set baseline
 
-        h_prev = torch.zeros(1, self.batch_size, self.hidden_size, device=self.device)  # 1 * b * h
-        o_prev = torch.zeros(1, self.batch_size, self.hidden_size, device=self.device)  # 1 * b * h
-        X = self.word_embedding(torch.tensor([self.start_idx] * self.batch_size,
-                                             device=self.device)).unsqueeze(0)  # 1 * b * e
-
-        losses = 0
-        for t in range(1, self.max_length):
-            output, (h_prev, o_prev) = self.LSTM(X, (h_prev, o_prev))
-            logits = self.vocab_projection(output).squeeze(0)  # b * v
-            P = F.log_softmax(logits, dim=-1)  # b * v
-            word_t = fake_samples[:, t]  # b
-            P_t = torch.gather(P, 1, word_t.unsqueeze(1)).squeeze(1)  # b
-            X = self.word_embedding(word_t).unsqueeze(0)  # 1 * b * e
-
-            mask = word_t != self.pad_idx
-            loss = -rewards * P_t * mask.float()
-            mask_sum = mask.sum()
-            if (mask_sum):
-                losses += loss.sum() / mask_sum
-        return losses
+        X = self.word_embedding(fake_samples[:, :-1].t())  # (l - 1) * b * e
+        output, _ = self.LSTM(X)  # (l - 1) * b * h
+        P = F.log_softmax(self.vocab_projection(output), dim=-1)  # (l - 1) * b * v
+        words = fake_samples[:, 1:].t()  # (l - 1) * b
+        P_t = torch.gather(P, 2, words.unsqueeze(2)).squeeze(2)  # (l - 1) * b
+        mask = (words != self.pad_idx).float()  # (l - 1) * b
+        losses = (-rewards * P_t * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1)  # l - 1
+
+        return losses.sum()
@@ -11,7 +11,6 @@ import torch
 import torch.nn as nn
 import torch.nn.functional as F
 from torch.distributions import Categorical
-import numpy as np
 
 from textbox.model.abstract_generator import GenerativeAdversarialNet
 from textbox.module.Encoder.rnn_encoder import BasicRNNEncoder
@@ -226,6 +225,23 @@ class MaskGANGenerator(GenerativeAdversarialNet):
 
         return mean_loss
 
+    @staticmethod
+    def discounted_returns(rewards, gamma):
+        r"""Calculate the cumulative discounted returns of every timestep in one product with the discount matrix,
+        i.e., :math:`R_t = \sum_{s \geq t} \gamma^{s - t} r_s`.
+
+        Args:
+            rewards: Tensor of rewards. Shape [batch_size, sequence_length].
+            gamma: The discount rate.
+
+        Returns:
+            Tensor of returns. Shape [batch_size, sequence_length].
+        """
+        position = torch.arange(rewards.size(1), device=rewards.device)
+        exponent = (position.unsqueeze(1) - position.unsqueeze(0)).to(rewards.dtype)  # s - t
+        discount = torch.tril(gamma ** exponent.clamp(min=0))  # seq_len * seq_len, zero for s < t
+        return torch.matmul(rewards, discount)
+
     def calculate_reinforce_objective(self, log_probs, dis_predictions, mask_present, estimated_values=None):
         r"""Calculate the REINFORCE objectives.  The REINFORCE objective should only be on the tokens that were missing.
         Specifically, the final Generator reward should be based on the Discriminator predictions on missing tokens.
@@ -257,29 +273,16 @@ class MaskGANGenerator(GenerativeAdversarialNet):
         eps = torch.tensor(1e-7)
         dis_predictions = torch.sigmoid(dis_predictions)
         rewards = torch.log(dis_predictions + eps)
-        device = dis_predictions.device
 
         # Apply only for missing elements.
         zeros = torch.zeros_like(mask_present, dtype=torch.float32)
         log_probs = torch.where(mask_present, zeros, log_probs)
         rewards = torch.where(mask_present, zeros, rewards)
         rewards = rewards.detach()
-
-        # Unstack Tensors into lists.
         missing = 1. - mask_present.float()
 
         # Cumulative Discounted Returns.  The true value function V*(s).
-        cumulative_rewards = []
-        batch_size, seq_len = dis_predictions.size()
-        for t in range(seq_len):
-            cum_value = torch.zeros((batch_size, 1))
-            cum_value = cum_value.cuda(device)
-            for s in range(t, seq_len):
-                cum_value_tmp = missing[:, s] * np.power(self.gamma, (s - t)) * rewards[:, s]
-                cum_value_tmp = cum_value_tmp.unsqueeze(dim=1)
-                cum_value += cum_value_tmp
-            cumulative_rewards.append(cum_value)  # bs*1
-        cumulative_rewards = torch.stack(cumulative_rewards, dim=1).squeeze()
+        cumulative_rewards = self.discounted_returns(missing * rewards, self.gamma)  # bs*seq_len
 
         # REINFORCE with different baselines.
         # We create a separate critic functionality for the Discriminator.  This
@@ -294,23 +297,11 @@ class MaskGANGenerator(GenerativeAdversarialNet):
         baselines = baselines.detach()
 
         ## Calculate the Advantages, A(s,a) = Q(s,a) - \hat{V}(s).
-        final_gen_objective = torch.zeros([batch_size, 1]).cuda(self.device)
-        for t in range(seq_len):
-            log_probability = log_probs[:, t].unsqueeze(dim=1)  # bs*1
-            cum_advantage = torch.zeros((batch_size, 1))  # bs*1
-            cum_advantage = cum_advantage.cuda(self.device)
-            for s in range(t, seq_len):
-                cum_advantage_tmp = missing[:, s] * np.power(self.gamma, (s - t)) * rewards[:, s]
-                cum_advantage_tmp = cum_advantage_tmp.unsqueeze(dim=1)
-                cum_advantage = cum_advantage + cum_advantage_tmp
-            cum_advantage = cum_advantage - baselines[:, t].unsqueeze(dim=1)
-            # Clip advantages.
-            cum_advantage = torch.clamp(cum_advantage, -self.advantage_clipping, self.advantage_clipping)
-            cum_advantage_ = cum_advantage.detach()
-            final_gen_objective = final_gen_objective + torch.mul(
-                log_probability, missing[:, t].unsqueeze(dim=1) * cum_advantage_
-            )
-        final_gen_objective = -torch.sum(final_gen_objective) / (torch.sum(missing))  # max the reward
+        advantages = cumulative_rewards - baselines
+        # Clip advantages.
+        advantages = torch.clamp(advantages, -self.advantage_clipping, self.advantage_clipping)
+        final_gen_objective = torch.sum(log_probs * missing * advantages)
+        final_gen_objective = -final_gen_objective / (torch.sum(missing))  # max the reward
 
         return final_gen_objective, critic_loss
 
@@ -348,8 +339,8 @@ class MaskGANGenerator(GenerativeAdversarialNet):
             inputs_length = torch.Tensor([self.max_length - 1] * self.batch_size).float()
             targets_present = torch.zeros((self.batch_size, self.max_length - 1)).byte()
             device = inputs.device
-            inputs_length = inputs_length.cuda(device)
-            targets_present = targets_present.cuda(device)
+            inputs_length = inputs_length.to(device)
+            targets_present = targets_present.to(device)
 
             sample, _, _ = self.forward(inputs, inputs_length, targets, targets_present)
 
@@ -375,7 +366,7 @@ class MaskGANGenerator(GenerativeAdversarialNet):
         batch_size, pad_seq_len = data.size()
         padded_data = torch.full((batch_size, self.max_length), self.eos_token_idx, dtype=torch.long)
         device = data.device
-        padded_data = padded_data.cuda(device)
+        padded_data = padded_data.to(device)
         for i in range(batch_size):
             l = int(length[i].cpu().data)
             if l == self.max_length + 2:
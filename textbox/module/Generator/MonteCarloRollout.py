@@ -0,0 +1,127 @@
+r"""
+Monte Carlo Rollout
+#####################
+"""
+
+import torch
+import torch.nn.functional as F
+
+
+class MonteCarloRollout(object):
+    r"""The Monte Carlo rollouts shared by the LSTM generators of SeqGAN, RankGAN and MaliGAN.
+
+    The prefix of every sampled sentence up to every timestep is completed ``rollout_num`` times by the generator.
+    Instead of rolling out the timesteps one after another, the states of the generator on all prefixes are computed
+    by one teacher-forced pass, and the rollouts of all timesteps are decoded together. The rollouts are ordered by
+    their timestep, so the rollouts of longer prefixes, which need fewer steps, drop out of the batch first. All
+    rollouts are scored by one call of the discriminator.
+
+    Args:
+        generator (torch.nn.Module): the generator with ``LSTM``, ``word_embedding`` and ``vocab_projection``.
+        rollout_num (int): the number of rollouts of every prefix.
+        rollout_batch_size (int, optional): the max number of rollouts decoded or scored together to bound the
+            memory, default: None (all rollouts at once).
+    """
+
+    def __init__(self, generator, rollout_num, rollout_batch_size=None):
+        self.generator = generator
+        self.rollout_num = rollout_num
+        self.rollout_batch_size = rollout_batch_size
+
+    def _prefix_states(self, samples):
+        r"""The states of the generator before feeding the token at every timestep t (1 <= t < max_length).
+
+        Returns:
+            tuple: h and c of the LSTM, shape: [max_length - 1, batch_size, hidden_size].
+        """
+        generator = self.generator
+        batch_size, max_length = samples.size()
+        h_prev = torch.zeros(1, batch_size, generator.hidden_size, device=samples.device)  # 1 * b * h
+        o_prev = torch.zeros(1, batch_size, generator.hidden_size, device=samples.device)  # 1 * b * h
+        h_states = []
+        o_states = []
+        for t in range(1, max_length):
+            X = generator.word_embedding(samples[:, t - 1]).unsqueeze(0)  # 1 * b * e
+            _, (h_prev, o_prev) = generator.LSTM(X, (h_prev, o_prev))
+            h_states.append(h_prev.squeeze(0))
+            o_states.append(o_prev.squeeze(0))
+        return torch.stack(h_states, dim=0), torch.stack(o_states, dim=0)
+
+    def rollout(self, samples):
+        r"""Complete the prefixes of samples up to every timestep by the generator.
+
+        Args:
+            samples (torch.Tensor): The sampled sentences starting with the sos, shape: [batch_size, max_length].
+
+        Returns:
+            torch.Tensor: The rollouts, shape: [(max_length - 1) * batch_size * rollout_num, max_length], where the
+            ``rollout_num`` rollouts of every sentence which keep its prefix up to timestep t are adjacent, and those of
+            timestep t follow those of timestep t - 1.
+        """
+        generator = self.generator
+        batch_size, max_length = samples.size()
+        group_size = batch_size * self.rollout_num  # the rollouts of a timestep
+        rollout_size = (max_length - 1) * group_size
+        chunk_size = self.rollout_batch_size or rollout_size
+
+        h_states, o_states = self._prefix_states(samples)  # (l - 1) * b * h
+        h_states = h_states.repeat_interleave(self.rollout_num, dim=1).view(rollout_size, -1)  # N * h
+        o_states = o_states.repeat_interleave(self.rollout_num, dim=1).view(rollout_size, -1)  # N * h
+        tokens = samples[:, 1:].t().repeat_interleave(self.rollout_num, dim=1).reshape(-1)  # N
+        timesteps = torch.arange(1, max_length, device=samples.device).repeat_interleave(group_size)  # N
+        rollouts = samples.repeat_interleave(self.rollout_num, dim=0).repeat(max_length - 1, 1)  # N * l
+
+        for start in range(0, rollout_size, chunk_size):
+            end = min(start + chunk_size, rollout_size)
+            h_prev = h_states[start:end].unsqueeze(0)  # 1 * n * h
+            o_prev = o_states[start:end].unsqueeze(0)  # 1 * n * h
+            X = generator.word_embedding(tokens[start:end]).unsqueeze(0)  # 1 * n * e
+
+            for i in range(max_length - 2):
+                # the rollouts of timestep t sample the token at t + i + 1, so those of t <= max_length - 2 - i remain
+                active_num = min(end, (max_length - 2 - i) * group_size) - start
+                if active_num <= 0:
+                    break
+                X = X[:, :active_num]
+                h_prev = h_prev[:, :active_num]
+                o_prev = o_prev[:, :active_num]
+                output, (h_prev, o_prev) = generator.LSTM(X, (h_prev, o_prev))
+                P = F.softmax(generator.vocab_projection(output), dim=-1).squeeze(0)  # n * v
+                token = torch.multinomial(P, 1)  # n * 1
+                position = timesteps[start:start + active_num].unsqueeze(1) + i + 1  # n * 1
+                rollouts[start:start + active_num].scatter_(1, position, token)
+                X = generator.word_embedding(token.squeeze(1)).unsqueeze(0)  # 1 * n * e
+
+        return rollouts
+
+    def discriminate(self, sequences, discriminator_func):
+        r"""Score the sequences by the discriminator, at most ``rollout_batch_size`` sequences at a time.
+
+        Args:
+            sequences (torch.Tensor): The sentence data, shape: [sequence_num, max_length].
+            discriminator_func (function): The function which scores every sentence.
+
+        Returns:
+            torch.Tensor: The scores, shape: [sequence_num].
+        """
+        chunk_size = self.rollout_batch_size or sequences.size(0)
+        scores = [
+            discriminator_func(sequences[start:start + chunk_size])
+            for start in range(0, sequences.size(0), chunk_size)
+        ]
+        return torch.cat(scores, dim=0)
+
+    def scores(self, samples, discriminator_func):
+        r"""Roll out the prefixes of samples up to every timestep and score the rollouts by the discriminator.
+
+        Args:
+            samples (torch.Tensor): The sampled sentences starting with the sos, shape: [batch_size, max_length].
+            discriminator_func (function): The function which scores every sentence.
+
+        Returns:
+            torch.Tensor: The scores of rollouts, shape: [max_length - 1, batch_size, rollout_num], where ``[t - 1]``
+            are those of the prefixes up to timestep t.
+        """
+        batch_size, max_length = samples.size()
+        scores = self.discriminate(self.rollout(samples), discriminator_func)
+        return scores.view(max_length - 1, batch_size, self.rollout_num)
@@ -11,6 +11,7 @@ import torch
 import torch.nn as nn
 import torch.nn.functional as F
 from textbox.model.abstract_generator import UnconditionalGenerator
+from textbox.module.strategy import batch_idx2token, after_eos_mask, decode_until_eos
 
 
 class TextGANGenerator(UnconditionalGenerator):
@@ -91,18 +92,15 @@ class TextGANGenerator(UnconditionalGenerator):
                 output, prev_state = self.LSTM(X, prev_state)
                 P = F.softmax(self.vocab_projection(output), dim=-1).squeeze(0)  # b * v
                 sentences_prob[i] = P
-                for j in range(self.batch_size):
-                    sentences[i][j] = torch.multinomial(P[j], 1)[0]
+                sentences[i] = torch.multinomial(P, 1).squeeze(1)  # b
                 X = self.word_embedding(sentences[i]).unsqueeze(0)  # 1 * b * e
 
             sentences = sentences.permute(1, 0)  # b * l
             sentences_prob = sentences_prob.permute(1, 0, 2)  # b * l * v
 
-            for i in range(self.batch_size):
-                end_pos = (sentences[i] == self.end_idx).nonzero(as_tuple=False)
-                if (end_pos.shape[0]):
-                    sentences_prob[i][end_pos[0][0] +
-                                      1:] = F.one_hot(torch.tensor(self.pad_idx), num_classes=self.vocab_size)
+            sentences_prob[after_eos_mask(sentences, self.end_idx)] = F.one_hot(
+                torch.tensor(self.pad_idx), num_classes=self.vocab_size
+            ).to(sentences_prob)
 
         self.train()
         return sentences_prob, h_prev.squeeze(0)
@@ -121,30 +119,25 @@ class TextGANGenerator(UnconditionalGenerator):
         idx2token = eval_data.idx2token
 
         with torch.no_grad():
-            for _ in range(self.eval_generate_num):
-                h_prev = torch.zeros(1, 1, self.hidden_size, device=self.device)  # 1 * 1 * h
-                o_prev = torch.zeros(1, 1, self.hidden_size, device=self.device)  # 1 * 1 * h
-                prev_state = (h_prev, o_prev)
-                X = self.word_embedding(
-                    torch.tensor([[self.start_idx]], dtype=torch.long, device=self.device)
-                )  # 1 * 1 * e
-                generate_tokens = []
-
-                for _ in range(self.max_length):
-                    output, prev_state = self.LSTM(X, prev_state)
-                    P = F.softmax(self.vocab_projection(output), dim=-1).squeeze()  # v
-                    token = torch.multinomial(P, 1)[0]
-                    X = self.word_embedding(torch.tensor([[token]], dtype=torch.long, device=self.device))  # 1 * 1 * e
-                    if (token.item() == self.end_idx):
-                        break
-                    else:
-                        generate_tokens.append(idx2token[token.item()])
-
-                generate_corpus.append(generate_tokens)
+            for start in range(0, self.eval_generate_num, self.batch_size):
+                batch_size = min(self.batch_size, self.eval_generate_num - start)
+                h_prev = torch.zeros(1, batch_size, self.hidden_size, device=self.device)  # 1 * b * h
+                o_prev = torch.zeros(1, batch_size, self.hidden_size, device=self.device)  # 1 * b * h
+                generate_idx = decode_until_eos(
+                    self._generate_step, batch_size, self.max_length, self.start_idx, self.end_idx, self.device,
+                    (h_prev, o_prev)
+                )  # b * l
+                generate_corpus += batch_idx2token(generate_idx, self.end_idx, idx2token)
 
         self.train()
         return generate_corpus
 
+    def _generate_step(self, input_seq, gen_idx, prev_state):
+        X = self.word_embedding(input_seq.t())  # 1 * b * e
+        output, prev_state = self.LSTM(X, prev_state)
+        P = F.softmax(self.vocab_projection(output), dim=-1).squeeze(0)  # b * v
+        return torch.multinomial(P, 1).squeeze(1), prev_state  # b
+
     def adversarial_loss(self, real_data, discriminator_func):
         r"""Calculate the adversarial generator loss of real_data guided by discriminator_func.
 
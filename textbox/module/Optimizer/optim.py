@@ -29,7 +29,15 @@ class ScheduledOptim():
         self._optimizer.zero_grad()
 
     def state_dict(self):
-        return self._optimizer.state_dict()
+        return {'optimizer': self._optimizer.state_dict(), 'n_steps': self.n_steps}
+
+    def load_state_dict(self, state_dict):
+        # checkpoints saved before the number of steps was recorded only contain the state of the optimizer
+        if 'n_steps' not in state_dict:
+            self._optimizer.load_state_dict(state_dict)
+            return
+        self._optimizer.load_state_dict(state_dict['optimizer'])
+        self.n_steps = state_dict['n_steps']
 
     def _get_lr_scale(self):
         d_model = self.d_model
@@ -43,3 +51,31 @@ class ScheduledOptim():
 
         for param_group in self._optimizer.param_groups:
             param_group['lr'] = lr
+
+
+class MultipleOptimizer():
+    r"""A simple wrapper class which updates different parameters by several optimizers together,
+    e.g., ``SparseAdam`` for sparse embeddings and ``Adam`` for the other parameters.
+    """
+
+    def __init__(self, *optimizers):
+        self.optimizers = optimizers
+
+    @property
+    def param_groups(self):
+        return [param_group for optimizer in self.optimizers for param_group in optimizer.param_groups]
+
+    def step(self):
+        for optimizer in self.optimizers:
+            optimizer.step()
+
+    def zero_grad(self):
+        for optimizer in self.optimizers:
+            optimizer.zero_grad()
+
+    def state_dict(self):
+        return [optimizer.state_dict() for optimizer in self.optimizers]
+
+    def load_state_dict(self, state_dict):
+        for optimizer, optimizer_state_dict in zip(self.optimizers, state_dict):
+            optimizer.load_state_dict(optimizer_state_dict)
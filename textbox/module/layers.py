@@ -14,7 +14,10 @@ import math
 import torch
 import torch.nn as nn
 import torch.nn.functional as F
+import inspect
+from typing import Dict, Optional
 from torch.nn.init import normal_
+from torch.utils.checkpoint import checkpoint
 from textbox.module.Attention.attention_mechanism import MultiHeadAttention
 
 
@@ -47,6 +50,108 @@ class Highway(nn.Module):
         return x
 
 
+_checkpoint_parameters = inspect.signature(checkpoint).parameters
+
+
+def checkpoint_layer(layer, *inputs):
+    r"""Run the layer with activation checkpointing, i.e., the intermediate activations of the layer are not kept for
+    backward but recomputed from ``inputs`` during backward, which trades computation for memory.
+
+    Args:
+        layer (torch.nn.Module): the layer to run.
+        inputs: the positional inputs of the layer, where ``None`` is allowed.
+
+    Returns:
+        the outputs of the layer.
+    """
+    if 'use_reentrant' in _checkpoint_parameters:
+        return checkpoint(layer, *inputs, use_reentrant=False)
+    return checkpoint(layer, *inputs)
+
+
+class FactorizedLinear(nn.Module):
+    r"""Low-rank factorized linear layer, which projects the input onto ``rank`` dimensions without bias and then onto
+    the output, so it takes ``rank * (input_size + output_size)`` weights instead of ``input_size * output_size``.
+
+    Args:
+        input_size (int): size of input.
+        output_size (int): size of output.
+        rank (int): size of the low-rank bottleneck.
+    """
+
+    def __init__(self, input_size, output_size, rank):
+        super(FactorizedLinear, self).__init__()
+        self.rank = rank
+        self.down = nn.Linear(input_size, rank, bias=False)
+        self.up = nn.Linear(rank, output_size)
+
+    def forward(self, x):
+        return self.up(self.down(x))
+
+
+def factorize_linear(linear, rank):
+    r"""Convert a trained ``nn.Linear`` into a :class:`FactorizedLinear` of ``rank`` by truncated SVD, i.e., the best
+    rank-``rank`` approximation of the weight. The singular values are split evenly between the two factors.
+
+    Args:
+        linear (torch.nn.Linear): the trained linear layer, weight shape: [output_size, input_size].
+        rank (int): size of the low-rank bottleneck.
+
+    Returns:
+        FactorizedLinear: the factorized layer.
+    """
+    output_size, input_size = linear.weight.size()
+    if not 0 < rank < min(output_size, input_size):
+        raise ValueError('Rank {} should be in (0, {}).'.format(rank, min(output_size, input_size)))
+    factorized = FactorizedLinear(input_size, output_size, rank).to(linear.weight.device)
+    with torch.no_grad():
+        u, s, v = torch.svd(linear.weight.float())
+        sqrt_s = s[:rank].sqrt()
+        factorized.down.weight.copy_(v[:, :rank].t() * sqrt_s.unsqueeze(1))
+        factorized.up.weight.copy_(u[:, :rank] * sqrt_s.unsqueeze(0))
+        if linear.bias is not None:
+            factorized.up.bias.copy_(linear.bias)
+        else:
+            factorized.up.bias.zero_()
+    return factorized
+
+
+def build_vocab_layer(config, input_size, vocab_size):
+    r"""Build the output layer which projects hidden states onto the vocabulary, decided by ``output_layer``:
+
+        - ``linear`` (default): a dense ``nn.Linear``.
+        - ``factorized``: a :class:`FactorizedLinear` with the bottleneck size ``vocab_rank`` (default: 128).
+        - ``adaptive``: an ``nn.AdaptiveLogSoftmaxWithLoss`` whose clusters are split by ``adaptive_cutoffs``
+          (default: ``[2000, 10000]``, cutoffs not less than ``vocab_size`` are dropped) and whose projection sizes
+          are reduced by ``adaptive_div_value`` (default: 4.0) cluster by cluster. Tokens should be sorted by
+          frequency, which is the case for vocabularies built by TextBox.
+
+    Args:
+        config (Config): An instance object of Config, used to record parameter information.
+        input_size (int): the size of hidden states.
+        vocab_size (int): the size of vocabulary.
+
+    Returns:
+        torch.nn.Module: the output layer.
+    """
+    output_layer = config['output_layer'] or 'linear'
+    if output_layer == 'linear':
+        return nn.Linear(input_size, vocab_size)
+    elif output_layer == 'factorized':
+        return FactorizedLinear(input_size, vocab_size, config['vocab_rank'] or 128)
+    elif output_layer == 'adaptive':
+        cutoffs = [cutoff for cutoff in (config['adaptive_cutoffs'] or [2000, 10000]) if 0 < cutoff < vocab_size - 1]
+        if not cutoffs:
+            raise ValueError("No adaptive cutoff is less than the vocabulary size {}.".format(vocab_size))
+        return nn.AdaptiveLogSoftmaxWithLoss(
+            input_size, vocab_size, cutoffs, div_value=config['adaptive_div_value'] or 4.0
+        )
+    else:
+        raise ValueError(
+            "No such output layer {}, which should be 'linear', 'factorized' or 'adaptive'.".format(output_layer)
+        )
+
+
 class TransformerLayer(torch.nn.Module):
     r"""Transformer Layer, including
         a multi-head self-attention,
@@ -58,6 +163,9 @@ class TransformerLayer(torch.nn.Module):
         self_attn_mask (torch.bool): the attention mask for the multi head attention sublayer.
         external_states (torch.Tensor): the external context for decoder, e.g., hidden states from encoder.
         external_padding_mask (torch.bool): the padding mask for the external states.
+        layer_cache (dict): the cache of ``'self'`` and ``'external'`` attention for incremental decoding, see
+            :meth:`~textbox.module.Decoder.transformer_decoder.TransformerDecoder.init_cache`.
+        position (int): the position of the first token of x in the cache.
 
     Returns:
         feedforward_output (torch.Tensor): the output of the point-wise feed-forward sublayer, is the output of the transformer layer
@@ -110,12 +218,26 @@ class TransformerLayer(torch.nn.Module):
         self_padding_mask=None,
         self_attn_mask=None,
         external_states=None,
-        external_padding_mask=None
+        external_padding_mask=None,
+        layer_cache: Optional[Dict[str, Dict[str, torch.Tensor]]] = None,
+        position: int = 0
     ):
+        self_cache: Optional[Dict[str, torch.Tensor]] = None
+        external_cache: Optional[Dict[str, torch.Tensor]] = None
+        if layer_cache is not None:
+            self_cache = layer_cache['self']
+            external_cache = layer_cache['external']
+
         residual = x
         if kv is None:
             x, self_attn_weights = self.multi_head_attention(
-                query=x, key=x, value=x, key_padding_mask=self_padding_mask, attn_mask=self_attn_mask
+                query=x,
+                key=x,
+                value=x,
+                key_padding_mask=self_padding_mask,
+                attn_mask=self_attn_mask,
+                layer_cache=self_cache,
+                position=position
             )
         else:
             x, self_attn_weights = self.multi_head_attention(
@@ -127,7 +249,11 @@ class TransformerLayer(torch.nn.Module):
         if self.with_external:
             residual = x
             x, external_attn_weights = self.external_multi_head_attention(
-                query=x, key=external_states, value=external_states, key_padding_mask=external_padding_mask
+                query=x,
+                key=external_states,
+                value=external_states,
+                key_padding_mask=external_padding_mask,
+                layer_cache=external_cache
             )
             x = self.attn_dropout(x)
             x = self.external_layer_norm(residual + x)
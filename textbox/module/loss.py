@@ -0,0 +1,182 @@
+"""
+textbox.module.loss
+#############################
+Common Losses in text generation
+"""
+
+import math
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+
+from textbox.module.layers import FactorizedLinear
+
+
+class ChunkedLinearCrossEntropy(torch.autograd.Function):
+    r"""Fuse the vocabulary projection, log-softmax and negative log-likelihood, and compute them chunk by chunk of
+    tokens. Only the logits of one chunk are materialized at a time, and they are recomputed in backward instead of
+    being kept, so the peak memory is proportional to ``chunk_size * vocab_size`` rather than
+    ``num_tokens * vocab_size``.
+    """
+
+    @staticmethod
+    def forward(ctx, hidden, weight, bias, target, chunk_size, ignore_index):
+        valid = target.ne(ignore_index)
+        safe_target = target.masked_fill(~valid, 0)
+        loss = hidden.new_zeros(target.size(0))
+        with torch.no_grad():
+            for start in range(0, target.size(0), chunk_size):
+                end = start + chunk_size
+                logits = F.linear(hidden[start:end], weight, bias)
+                target_logits = logits.gather(1, safe_target[start:end].unsqueeze(1)).squeeze(1)
+                loss[start:end] = torch.logsumexp(logits, dim=-1) - target_logits
+        loss = loss.masked_fill(~valid, 0.)
+
+        ctx.save_for_backward(hidden, weight, bias, safe_target, valid)
+        ctx.chunk_size = chunk_size
+        return loss
+
+    @staticmethod
+    def backward(ctx, grad_loss):
+        hidden, weight, bias, safe_target, valid = ctx.saved_tensors
+        chunk_size = ctx.chunk_size
+        grad_loss = grad_loss * valid.to(grad_loss.dtype)
+
+        grad_hidden = torch.zeros_like(hidden) if ctx.needs_input_grad[0] else None
+        grad_weight = torch.zeros_like(weight) if ctx.needs_input_grad[1] else None
+        grad_bias = torch.zeros_like(bias) if bias is not None and ctx.needs_input_grad[2] else None
+
+        for start in range(0, safe_target.size(0), chunk_size):
+            end = start + chunk_size
+            chunk_hidden = hidden[start:end]
+            logits = F.linear(chunk_hidden, weight, bias)
+            # d(logsumexp(z) - z_y) / dz = softmax(z) - onehot(y)
+            grad_logits = torch.softmax(logits, dim=-1)
+            grad_logits[torch.arange(grad_logits.size(0), device=grad_logits.device), safe_target[start:end]] -= 1
+            grad_logits = grad_logits * grad_loss[start:end].unsqueeze(1)
+
+            if grad_hidden is not None:
+                grad_hidden[start:end] = grad_logits.mm(weight)
+            if grad_weight is not None:
+                grad_weight.add_(grad_logits.t().mm(chunk_hidden))
+            if grad_bias is not None:
+                grad_bias.add_(grad_logits.sum(dim=0))
+
+        return grad_hidden, grad_weight, grad_bias, None, None, None
+
+
+def sampled_softmax_loss(hidden_states, vocab_linear, target, sampled_num):
+    r"""Calculate the sampled softmax loss of target tokens (Jean et al. "On Using Very Large Target Vocabulary for
+    Neural Machine Translation" in ACL 2015), which approximates the softmax over the vocabulary by the target token
+    and ``sampled_num`` negative tokens shared by the batch. Negative tokens are drawn without replacement from the
+    log-uniform (Zipfian) distribution, which fits vocabularies sorted by frequency. Logits are corrected by the log
+    of sampling probabilities, and negative tokens which hit the target token are removed.
+
+    Args:
+        hidden_states (torch.Tensor): hidden states, shape: [num_tokens, hidden_size].
+        vocab_linear (torch.nn.Linear): the projection layer onto the vocabulary.
+        target (torch.LongTensor): the target tokens, shape: [num_tokens].
+        sampled_num (int): the number of negative tokens.
+
+    Returns:
+        torch.Tensor: the loss of every token, shape: [num_tokens].
+    """
+    vocab_size = vocab_linear.weight.size(0)
+    ranks = torch.arange(vocab_size, dtype=torch.float, device=hidden_states.device)
+    sample_probs = (torch.log(ranks + 2) - torch.log(ranks + 1)) / math.log(vocab_size + 1)
+    sampled = torch.multinomial(sample_probs, min(sampled_num, vocab_size), replacement=False)
+
+    weight, bias = vocab_linear.weight, vocab_linear.bias
+    target_logits = (hidden_states * weight[target]).sum(dim=-1)
+    sampled_logits = hidden_states.mm(weight[sampled].t())
+    if bias is not None:
+        target_logits = target_logits + bias[target]
+        sampled_logits = sampled_logits + bias[sampled]
+    target_logits = target_logits - torch.log(sample_probs[target])
+    sampled_logits = sampled_logits - torch.log(sample_probs[sampled])
+    sampled_logits = sampled_logits.masked_fill(sampled.unsqueeze(0) == target.unsqueeze(1), -math.inf)
+
+    logits = torch.cat([target_logits.unsqueeze(1), sampled_logits], dim=1)
+    return -F.log_softmax(logits, dim=-1)[:, 0]
+
+
+def vocab_nll_loss(hidden_states, vocab_linear, target, ignore_index, chunk_size=None, sampled_num=None):
+    r"""Project hidden states onto the vocabulary and calculate the negative log-likelihood of target tokens,
+    which is the same as ``CrossEntropyLoss(ignore_index=ignore_index, reduction='none')`` on the logits of
+    ``vocab_linear``.
+
+    If ``chunk_size`` is set, the projection, log-softmax and NLL are fused and computed every ``chunk_size`` tokens
+    (e.g., ``batch_size * k`` for chunks of ``k`` time steps) by :class:`ChunkedLinearCrossEntropy`, which avoids
+    materializing the logits tensor of all tokens for large vocabularies.
+
+    If ``vocab_linear`` is an ``nn.AdaptiveLogSoftmaxWithLoss``, the NLL is calculated by the adaptive softmax.
+    Otherwise, if ``sampled_num`` is set and ``vocab_linear`` is in training mode, the loss is approximated by
+    :func:`sampled_softmax_loss`, while the full softmax is still used for evaluation.
+
+    Args:
+        hidden_states (torch.Tensor): the output of decoder, shape: [batch_size, sequence_length, hidden_size].
+        vocab_linear (torch.nn.Module): the output layer, ``nn.Linear``, ``nn.AdaptiveLogSoftmaxWithLoss`` or
+            :class:`~textbox.module.layers.FactorizedLinear`.
+        target (torch.LongTensor): the target tokens, shape: [batch_size, sequence_length].
+        ignore_index (int): the target index which is ignored and gets zero loss, i.e., padding token index.
+        chunk_size (int, optional): the number of tokens in a chunk, default: None (no chunking).
+        sampled_num (int, optional): the number of negative tokens of sampled softmax, default: None (full softmax).
+
+    Returns:
+        torch.Tensor: the loss of every token, shape: [batch_size, sequence_length].
+    """
+    hidden_states = hidden_states.reshape(-1, hidden_states.size(-1))
+    flat_target = target.reshape(-1)
+    if isinstance(vocab_linear, FactorizedLinear):
+        # project onto the bottleneck first, then the output factor is an ordinary linear layer
+        hidden_states = vocab_linear.down(hidden_states)
+        vocab_linear = vocab_linear.up
+    if isinstance(vocab_linear, nn.AdaptiveLogSoftmaxWithLoss) or (sampled_num and vocab_linear.training):
+        valid = flat_target.ne(ignore_index)
+        loss = hidden_states.new_zeros(flat_target.size(0))
+        if isinstance(vocab_linear, nn.AdaptiveLogSoftmaxWithLoss):
+            valid_loss = -vocab_linear(hidden_states[valid], flat_target[valid]).output
+        else:
+            valid_loss = sampled_softmax_loss(hidden_states[valid], vocab_linear, flat_target[valid], sampled_num)
+        loss = loss.masked_scatter(valid, valid_loss)
+    elif chunk_size and isinstance(vocab_linear, nn.Linear):
+        loss = ChunkedLinearCrossEntropy.apply(
+            hidden_states, vocab_linear.weight, vocab_linear.bias, flat_target, int(chunk_size), ignore_index
+        )
+    else:
+        token_logits = vocab_linear(hidden_states)
+        loss = F.cross_entropy(token_logits, flat_target, ignore_index=ignore_index, reduction='none')
+    return loss.reshape_as(target)
+
+
+def distillation_loss(student_logits, teacher_logits, target, ignore_index, temperature=1.0, alpha=0.5):
+    r"""Calculate the token-level knowledge distillation loss (Hinton et al. "Distilling the Knowledge in a Neural
+    Network" in 2015), which interpolates the KL divergence from the softened teacher distribution to the softened
+    student distribution and the negative log-likelihood of target tokens:
+    ``alpha * T^2 * KL(p_teacher / T || p_student / T) + (1 - alpha) * NLL``.
+
+    Args:
+        student_logits (torch.Tensor): the logits (or log-probabilities) of student, shape: [batch_size,
+            sequence_length, vocab_size].
+        teacher_logits (torch.Tensor): the logits (or log-probabilities) of teacher over the same vocabulary, shape:
+            [batch_size, sequence_length, vocab_size].
+        target (torch.LongTensor): the target tokens, shape: [batch_size, sequence_length].
+        ignore_index (int): the target index which is ignored and gets zero loss, i.e., padding token index.
+        temperature (float, optional): the softmax temperature ``T``, default: 1.0.
+        alpha (float, optional): the weight of the distillation term, default: 0.5.
+
+    Returns:
+        torch.Tensor: the loss of every token, shape: [batch_size, sequence_length].
+    """
+    vocab_size = student_logits.size(-1)
+    student_log_probs = F.log_softmax(student_logits.reshape(-1, vocab_size) / temperature, dim=-1)
+    teacher_log_probs = F.log_softmax(teacher_logits.reshape(-1, vocab_size).detach() / temperature, dim=-1)
+    kl_loss = (teacher_log_probs.exp() * (teacher_log_probs - student_log_probs)).sum(dim=-1) * temperature**2
+
+    flat_target = target.reshape(-1)
+    nll_loss = F.cross_entropy(
+        student_logits.reshape(-1, vocab_size), flat_target, ignore_index=ignore_index, reduction='none'
+    )
+    loss = alpha * kl_loss + (1 - alpha) * nll_loss
+    loss = loss.masked_fill(flat_target.eq(ignore_index), 0.)
+    return loss.reshape_as(target)
@@ -77,6 +77,144 @@ def greedy_search(logits):
     return logits.squeeze(1).argmax(dim=-1)
 
 
+def vocab_logits(hidden_states, vocab_layer):
+    r"""Project hidden states onto the vocabulary by the output layer for decoding.
+
+    Args:
+        hidden_states (torch.Tensor): hidden states, shape: [batch_size, sequence_length, hidden_size].
+        vocab_layer (torch.nn.Module): ``nn.Linear`` or ``nn.AdaptiveLogSoftmaxWithLoss``.
+
+    Return:
+        torch.Tensor: logits (log-probabilities for adaptive softmax), shape: [batch_size, sequence_length, vocab_size]
+    """
+    if isinstance(vocab_layer, nn.AdaptiveLogSoftmaxWithLoss):
+        log_probs = vocab_layer.log_prob(hidden_states.reshape(-1, hidden_states.size(-1)))
+        return log_probs.view(*hidden_states.size()[:-1], -1)
+    return vocab_layer(hidden_states)
+
+
+def vocab_topk(hidden_states, vocab_layer, k):
+    r"""Find the top-k tokens of the output layer. For adaptive softmax, a tail cluster is only evaluated for the rows
+    where its cluster log-probability exceeds the k-th best log-probability in the head, because the log-probability of
+    a tail token is never greater than that of its cluster.
+
+    Args:
+        hidden_states (torch.Tensor): hidden states, shape: [batch_size, sequence_length, hidden_size].
+        vocab_layer (torch.nn.Module): ``nn.Linear`` or ``nn.AdaptiveLogSoftmaxWithLoss``.
+        k (int): the number of tokens.
+
+    Return:
+        tuple:
+            - torch.Tensor: the top-k logits (log-probabilities for adaptive softmax), shape: [batch_size, length, k]
+            - torch.LongTensor: the top-k token indexes, shape: [batch_size, length, k]
+    """
+    if not isinstance(vocab_layer, nn.AdaptiveLogSoftmaxWithLoss):
+        logits = vocab_layer(hidden_states)
+        if k == 1:
+            values, indexes = logits.max(dim=-1, keepdim=True)
+            return values, indexes
+        return logits.topk(k, dim=-1)
+
+    size = hidden_states.size()[:-1]
+    hidden_states = hidden_states.reshape(-1, hidden_states.size(-1))
+    head_log_probs = F.log_softmax(vocab_layer.head(hidden_states), dim=-1)
+    shortlist_size = vocab_layer.shortlist_size
+    values, indexes = head_log_probs[:, :shortlist_size].topk(min(k, shortlist_size), dim=-1)
+    threshold = values[:, -1] if values.size(-1) == k else torch.full_like(values[:, 0], -math.inf)
+
+    for i, tail in enumerate(vocab_layer.tail):
+        cluster_log_probs = head_log_probs[:, shortlist_size + i]
+        rows = (cluster_log_probs > threshold).nonzero(as_tuple=True)[0]
+        if rows.numel() == 0:
+            continue
+        start, end = vocab_layer.cutoffs[i], vocab_layer.cutoffs[i + 1]
+        tail_log_probs = F.log_softmax(tail(hidden_states[rows]), dim=-1) + cluster_log_probs[rows].unsqueeze(1)
+        tail_values, tail_indexes = tail_log_probs.topk(min(k, end - start), dim=-1)
+
+        candidate_values = torch.full(
+            (hidden_states.size(0), tail_values.size(1)), -math.inf, dtype=values.dtype, device=values.device
+        )
+        candidate_indexes = torch.zeros_like(candidate_values, dtype=torch.long)
+        candidate_values[rows] = tail_values
+        candidate_indexes[rows] = tail_indexes + start
+
+        values = torch.cat([values, candidate_values], dim=-1)
+        values, positions = values.topk(min(k, values.size(-1)), dim=-1)
+        indexes = torch.cat([indexes, candidate_indexes], dim=-1).gather(1, positions)
+        threshold = values[:, -1]
+
+    return values.view(*size, -1), indexes.view(*size, -1)
+
+
+def batch_idx2token(token_idx, eos_token_idx, idx2token):
+    r"""Convert the token indexes decoded for a batch into tokens, where every sequence ends before its first eos.
+    The indexes are copied to the host only once.
+
+    Args:
+        token_idx (torch.LongTensor): the decoded token indexes, shape: [batch_size, length].
+        eos_token_idx (int): the index of the end of sequence.
+        idx2token (dict): map token index to token.
+
+    Return:
+        List[List[str]]: the generated tokens of every sequence
+    """
+    generate_corpus = []
+    for sequence in token_idx.tolist():
+        generate_tokens = []
+        for idx in sequence:
+            if idx == eos_token_idx:
+                break
+            generate_tokens.append(idx2token[idx])
+        generate_corpus.append(generate_tokens)
+    return generate_corpus
+
+
+def decode_until_eos(step_func, batch_size, max_length, sos_token_idx, eos_token_idx, device, states=None):
+    r"""Decode a batch of sequences one step at a time, until every sequence has generated the eos or ``max_length``
+    steps are decoded.
+
+    Args:
+        step_func (function): called as ``step_func(input_seq, gen_idx, states)`` with the input token indexes of
+            shape [batch_size, 1], and returns the decoded token indexes of shape [batch_size] and the new states.
+        batch_size (int): the number of sequences.
+        max_length (int): the max number of decoding steps.
+        sos_token_idx (int): the index of the start of sequence, which is the input of the first step.
+        eos_token_idx (int): the index of the end of sequence.
+        device (torch.device): the device of the token indexes.
+        states (optional): the initial states passed to ``step_func``, default: None.
+
+    Return:
+        torch.LongTensor: the decoded token indexes, shape: [batch_size, length].
+    """
+    input_seq = torch.full((batch_size, 1), sos_token_idx, dtype=torch.long, device=device)
+    unfinished = torch.ones(batch_size, dtype=torch.bool, device=device)
+    generate_idx = []
+
+    for gen_idx in range(max_length):
+        token_idx, states = step_func(input_seq, gen_idx, states)
+        generate_idx.append(token_idx)
+        unfinished &= token_idx.ne(eos_token_idx)
+        if not unfinished.any():
+            break
+        input_seq = token_idx.unsqueeze(1)
+
+    return torch.stack(generate_idx, dim=1)
+
+
+def after_eos_mask(token_idx, eos_token_idx):
+    r"""Find the positions after the first eos of every sequence, e.g., to be replaced by padding.
+
+    Args:
+        token_idx (torch.LongTensor): the token indexes, shape: [batch_size, length].
+        eos_token_idx (int): the index of the end of sequence.
+
+    Return:
+        torch.BoolTensor: whether a position follows the first eos of its sequence, shape: [batch_size, length].
+    """
+    is_eos = token_idx.eq(eos_token_idx).long()
+    return (is_eos.cumsum(dim=1) - is_eos) > 0
+
+
 class Beam_Search_Hypothesis(object):
     r""" Class designed for beam search.
     """
@@ -180,11 +318,147 @@ class Beam_Search_Hypothesis(object):
             returns += [decoder_states]
 
         if (encoder_output is not None):
-            encoder_output = encoder_output[0:1].repeat(hyp_num, 1, 1)
+            encoder_output = encoder_output[0:1].expand(hyp_num, -1, -1)
             returns += [encoder_output]
         
         if (encoder_mask is not None):
-            encoder_mask = encoder_mask[0:1].repeat(hyp_num, 1)
+            encoder_mask = encoder_mask[0:1].expand(hyp_num, -1)
             returns += [encoder_mask]
 
         return returns
+
+
+def expand_beam(states, beam_size, dim=0):
+    r"""Repeat every example ``beam_size`` times along ``dim``, so that the hypotheses of an example are adjacent.
+
+    Args:
+        states (torch.Tensor or tuple): the states of examples, e.g., encoder outputs or ``(h, c)`` of LSTM.
+        beam_size (int): the beam size.
+        dim (int, optional): the batch dimension, default: 0.
+
+    Return:
+        torch.Tensor or tuple: the states of hypotheses, whose batch dimension is ``batch_size * beam_size``.
+    """
+    if isinstance(states, tuple):
+        return tuple(expand_beam(state, beam_size, dim) for state in states)
+    return states.repeat_interleave(beam_size, dim=dim)
+
+
+def reorder_beam(states, beam_idx, dim=0):
+    r"""Select the states of the hypotheses kept by :meth:`BeamSearch.step`.
+
+    Args:
+        states (torch.Tensor or tuple): the states of hypotheses, e.g., hidden states of RNN or ``(h, c)`` of LSTM.
+        beam_idx (torch.LongTensor): the hypothesis which every new hypothesis extends, shape: [batch_size * beam_size].
+        dim (int, optional): the batch dimension, default: 0.
+
+    Return:
+        torch.Tensor or tuple: the reordered states.
+    """
+    if isinstance(states, tuple):
+        return tuple(reorder_beam(state, beam_idx, dim) for state in states)
+    return states.index_select(dim, beam_idx)
+
+
+class BeamSearch(object):
+    r"""Beam search for a batch of examples, whose ``batch_size * beam_size`` hypotheses are decoded together.
+    The hypotheses of the ``i``-th example are rows ``[i * beam_size, (i + 1) * beam_size)``, so the states of
+    examples are expanded by :func:`expand_beam` and the states of hypotheses are reordered by :func:`reorder_beam`
+    with the index returned by :meth:`step`.
+
+    A hypothesis is finished when it ends with eos, and its score is normalized by its length to the power of
+    ``length_penalty``. Only the best finished hypothesis of every example is kept. An example stops when
+    ``beam_size`` hypotheses are finished, and the search stops when all the examples stop.
+
+    Args:
+        batch_size (int): the number of examples.
+        beam_size (int): the beam size.
+        max_length (int): the max number of decoding steps.
+        sos_token_idx (int): the index of the start of sequence.
+        eos_token_idx (int): the index of the end of sequence.
+        device (torch.device): the device of decoding.
+        length_penalty (float, optional): the exponent of the length normalization, default: 1.0.
+    """
+
+    def __init__(
+        self, batch_size, beam_size, max_length, sos_token_idx, eos_token_idx, device, length_penalty=1.0
+    ):
+        self.batch_size = batch_size
+        self.beam_size = beam_size
+        self.max_length = max_length
+        self.eos_token_idx = eos_token_idx
+        self.length_penalty = length_penalty
+
+        self.sequences = torch.full((batch_size * beam_size, 1), sos_token_idx, dtype=torch.long, device=device)
+        # all the hypotheses of an example start from the same sos, so only the first one is alive at first
+        self.hyp_scores = torch.full((batch_size, beam_size), -math.inf, device=device)
+        self.hyp_scores[:, 0] = 0
+        self.beam_offset = torch.arange(batch_size, device=device).unsqueeze(1) * beam_size
+
+        self.best_scores = torch.full((batch_size, ), -math.inf, device=device)
+        self.best_sequences = torch.full((batch_size, max_length), eos_token_idx, dtype=torch.long, device=device)
+        self.finished_num = torch.zeros(batch_size, dtype=torch.long, device=device)
+
+    @property
+    def input_seq(self):
+        r"""The last token of every hypothesis, shape: [batch_size * beam_size, 1]."""
+        return self.sequences[:, -1:]
+
+    def step(self, gen_idx, token_logits):
+        r""" A step for beam search.
+
+        Args:
+            gen_idx (int): the generated step number.
+            token_logits (torch.Tensor): logits distribution, shape: [batch_size * beam_size, 1, vocab_size].
+
+        Return:
+            torch.LongTensor: the hypothesis which every new hypothesis extends, shape: [batch_size * beam_size].
+        """
+        token_probs = F.log_softmax(token_logits.float(), dim=-1).view(self.batch_size, self.beam_size, -1)
+        vocab_size = token_probs.size(-1)
+        scores = (self.hyp_scores.unsqueeze(2) + token_probs).view(self.batch_size, -1)
+        # at most beam_size candidates end with eos, so there are always beam_size candidates to keep alive
+        top_scores, top_pos = scores.topk(2 * self.beam_size, dim=-1)
+        hyp_ids = top_pos // vocab_size
+        word_ids = top_pos % vocab_size
+        eos_mask = word_ids.eq(self.eos_token_idx)
+
+        # the candidates ending with eos among the top beam_size ones are finished
+        finished = eos_mask.clone()
+        finished[:, self.beam_size:] = False
+        finished &= self.finished_num.lt(self.beam_size).unsqueeze(1)
+        finished_scores = (top_scores / (gen_idx + 1) ** self.length_penalty).masked_fill(~finished, -math.inf)
+        best_scores, best_pos = finished_scores.max(dim=-1)
+        update = best_scores > self.best_scores
+        best_hyps = (hyp_ids.gather(1, best_pos.unsqueeze(1)) + self.beam_offset).squeeze(1)
+        best_sequences = self.best_sequences.clone()
+        best_sequences[:, :gen_idx] = self.sequences.index_select(0, best_hyps)[:, 1:]
+        self.best_sequences = torch.where(update.unsqueeze(1), best_sequences, self.best_sequences)
+        self.best_scores = torch.where(update, best_scores, self.best_scores)
+        self.finished_num += finished.sum(dim=-1)
+
+        # the top beam_size candidates not ending with eos are kept alive
+        self.hyp_scores, live_pos = top_scores.masked_fill(eos_mask, -math.inf).topk(self.beam_size, dim=-1)
+        beam_idx = (hyp_ids.gather(1, live_pos) + self.beam_offset).view(-1)
+        word_idx = word_ids.gather(1, live_pos).view(-1, 1)
+        self.sequences = torch.cat([self.sequences.index_select(0, beam_idx), word_idx], dim=1)
+        return beam_idx
+
+    def stop(self):
+        r""" Determine if the beam search is over.
+
+        Return:
+            Bool: ``True`` represents all the examples have finished ``beam_size`` hypotheses.
+        """
+        return bool(self.finished_num.ge(self.beam_size).all())
+
+    def generate(self):
+        r""" Pick the best finished hypothesis of every example, or the best alive one if none is finished.
+
+        Return:
+            torch.LongTensor: the generated token indexes padded with eos, shape: [batch_size, max_length].
+        """
+        alive_sequences = self.sequences.view(self.batch_size, self.beam_size, -1)[:, 0, 1:]
+        best_alive = torch.full_like(self.best_sequences, self.eos_token_idx)
+        best_alive[:, :alive_sequences.size(1)] = alive_sequences
+        return torch.where(torch.isinf(self.best_scores).unsqueeze(1), best_alive, self.best_sequences)
@@ -1 +1,4 @@
-from textbox.quick_start.quick_start import run_textbox
+from textbox.quick_start.quick_start import run_textbox, run_textbox_distributed, run_distillation
+from textbox.quick_start.tuner import tune_batch_size
+from textbox.quick_start.sweep import run_sweep
+from textbox.quick_start.factorize import factorize_vocab_layer
@@ -0,0 +1,115 @@
+"""
+textbox.quick_start.factorize
+########################
+"""
+import os
+import torch
+import torch.nn as nn
+from time import time
+from logging import getLogger
+
+from textbox.utils import init_logger, get_model, get_trainer, init_seed
+from textbox.data import data_preparation
+from textbox.module.layers import FactorizedLinear, factorize_linear
+from textbox.module.strategy import vocab_topk
+
+
+def _layer_size(layer):
+    parameters = list(layer.parameters())
+    return sum(p.numel() for p in parameters), sum(p.numel() * p.element_size() for p in parameters) / 1024 / 1024
+
+
+def _decode_time(layer, input_size, batch_size, device, repeat=100):
+    r"""The time of projecting one decoding step of ``batch_size`` hidden states and finding the best tokens, per
+    token in ms."""
+    hidden_states = torch.randn(batch_size, 1, input_size, device=device)
+    with torch.no_grad():
+        vocab_topk(hidden_states, layer, 1)
+        if device.type == 'cuda':
+            torch.cuda.synchronize(device)
+        start_time = time()
+        for _ in range(repeat):
+            vocab_topk(hidden_states, layer, 1)
+        if device.type == 'cuda':
+            torch.cuda.synchronize(device)
+    return (time() - start_time) * 1000 / repeat / batch_size
+
+
+def factorize_vocab_layer(model_file, rank, finetune_epochs=0, output_file=None, config_dict=None):
+    r"""Convert the trained ``vocab_linear`` of a model into a rank-``rank`` :class:`FactorizedLinear` by SVD, and
+    optionally fine-tune the converted model for ``finetune_epochs`` epochs to recover quality.
+
+    The model is rebuilt from the config and parameters of ``model_file``, a checkpoint saved by the trainer. The
+    converted checkpoint sets ``output_layer: factorized`` and ``vocab_rank`` in its config, so it can be loaded and
+    fine-tuned as other checkpoints. The parameters, memory and per-token decoding time of ``vocab_linear``, and the
+    valid loss before conversion, after conversion and after fine-tuning are reported.
+
+    Args:
+        model_file (str): the checkpoint of a model whose ``vocab_linear`` is ``nn.Linear``, e.g., RNN, RNNEncDec
+            or TransformerEncDec
+        rank (int): the size of the low-rank bottleneck
+        finetune_epochs (int, optional): the number of fine-tuning epochs, default: 0 (no fine-tuning)
+        output_file (str, optional): the converted checkpoint, default: ``model_file`` with the suffix ``-rank[rank]``
+        config_dict (dict, optional): parameters to override in the config of the checkpoint, e.g., learning_rate
+
+    Returns:
+        dict: the report of the conversion
+    """
+    checkpoint = torch.load(model_file)
+    config = checkpoint['config']
+    for key, value in (config_dict or dict()).items():
+        config[key] = value
+    init_seed(config['seed'], config['reproducibility'])
+    init_logger(config)
+    logger = getLogger()
+
+    train_data, valid_data, test_data = data_preparation(config)
+    model = get_model(config['model'])(config, train_data).to(config['device'])
+    model.load_state_dict(checkpoint['state_dict'])
+    if not isinstance(getattr(model, 'vocab_linear', None), nn.Linear):
+        raise ValueError('The vocab_linear of {} should be nn.Linear.'.format(config['model']))
+    trainer = get_trainer(config['MODEL_TYPE'], config['model'])(config, model)
+
+    linear = model.vocab_linear
+    input_size = linear.in_features
+    batch_size = config['eval_batch_size']
+    report = {'rank': rank}
+    report['params'], report['memory_mb'] = _layer_size(linear)
+    report['decode_ms_per_token'] = _decode_time(linear, input_size, batch_size, config['device'])
+    with torch.no_grad():
+        report['valid_loss'] = trainer._valid_epoch(valid_data)[0]
+
+    model.vocab_linear = factorize_linear(linear, rank)
+    config['output_layer'] = 'factorized'
+    config['vocab_rank'] = rank
+    report['factorized_params'], report['factorized_memory_mb'] = _layer_size(model.vocab_linear)
+    report['factorized_decode_ms_per_token'] = _decode_time(
+        model.vocab_linear, input_size, batch_size, config['device']
+    )
+    with torch.no_grad():
+        report['factorized_valid_loss'] = trainer._valid_epoch(valid_data)[0]
+
+    if output_file is None:
+        output_file = '{}-rank{}.pth'.format(os.path.splitext(model_file)[0], rank)
+    # the optimizer and checkpoint of the trainer are rebuilt for the factorized model
+    trainer = get_trainer(config['MODEL_TYPE'], config['model'])(config, model)
+    trainer.saved_model_file = output_file
+    if finetune_epochs > 0:
+        trainer.epochs = finetune_epochs
+        trainer.eval_step = min(trainer.eval_step, finetune_epochs)
+        report['finetuned_valid_loss'], _ = trainer.fit(train_data, valid_data)
+    else:
+        trainer._save_checkpoint(-1)
+
+    # make sure that the converted checkpoint can be rebuilt from its config
+    rebuilt_model = get_model(config['model'])(config, train_data)
+    if not isinstance(rebuilt_model.vocab_linear, FactorizedLinear):
+        raise ValueError('{} does not build the factorized output layer.'.format(config['model']))
+    rebuilt_model.load_state_dict(torch.load(output_file)['state_dict'])
+
+    report['params_saving'] = 1 - report['factorized_params'] / report['params']
+    report['memory_saving'] = 1 - report['factorized_memory_mb'] / report['memory_mb']
+    report['decode_speedup'] = report['decode_ms_per_token'] / report['factorized_decode_ms_per_token']
+    logger.info('Converted vocab_linear of {} to rank {}: {}'.format(config['model'], rank, report))
+    logger.info('Converted checkpoint is written into {}'.format(output_file))
+    return report
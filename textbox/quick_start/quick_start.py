@@ -16,16 +16,24 @@
 textbox.quick_start
 ########################
 """
+import os
 import logging
+import torch
 from logging import getLogger
-from textbox.utils import init_logger, get_model, get_trainer, init_seed
+from textbox.utils import init_logger, get_model, get_trainer, init_seed, compile_model, init_distributed, \
+    is_main_process, cleanup_distributed
 from textbox.config import Config
 from textbox.data import create_dataset, data_preparation
 
 
 def run_textbox(model=None, dataset=None, config_file_list=None, config_dict=None, saved=True):
     r""" A fast running api, which includes the complete process of
-    training and testing a model on a specified dataset
+    training and testing a model on a specified dataset.
+
+    It can be launched by ``torchrun`` to train the model with several processes, for example
+    ``torchrun --nproc_per_node=4 run_textbox.py --model=RNN --use_gpu=False``.
+    In this case, each process trains on a shard of the train data, and only rank 0 writes
+    checkpoints and generated text and tests the model.
 
     Args:
         model (str): model name
@@ -36,6 +44,7 @@ def run_textbox(model=None, dataset=None, config_file_list=None, config_dict=Non
     """
     # configurations initialization
     config = Config(model=model, dataset=dataset, config_file_list=config_file_list, config_dict=config_dict)
+    init_distributed(config)
 
     init_seed(config['seed'], config['reproducibility'])
     # logger initialization
@@ -50,13 +59,16 @@ def run_textbox(model=None, dataset=None, config_file_list=None, config_dict=Non
     # model loading and initialization
     model = get_model(config['model'])(config, train_data).to(config['device'])
     logger.info(model)
+    model = compile_model(model, config['compile_model'])
 
     # trainer loading and initialization
     trainer = get_trainer(config['MODEL_TYPE'], config['model'])(config, model)
 
     if config['test_only']:
         logger.info('Test only')
-        test_result = trainer.evaluate(test_data, load_best_model=saved, model_file=config['load_experiment'])
+        if is_main_process():
+            test_result = trainer.evaluate(test_data, load_best_model=saved, model_file=config['load_experiment'])
+            logger.info('test result: {}'.format(test_result))
     else:
         if config['load_experiment'] is not None:
             trainer.resume_checkpoint(resume_file=config['load_experiment'])
@@ -64,8 +76,105 @@ def run_textbox(model=None, dataset=None, config_file_list=None, config_dict=Non
         best_valid_score, best_valid_result = trainer.fit(train_data, valid_data, saved=saved)
 
         # model evaluation
-        test_result = trainer.evaluate(test_data, load_best_model=saved)
+        if is_main_process():
+            test_result = trainer.evaluate(test_data, load_best_model=saved)
+
+            logger.info('best valid loss: {}, best valid ppl: {}'.format(best_valid_score, best_valid_result))
+            logger.info('test result: {}'.format(test_result))
+
+    # only rank 0 evaluates on the test data, so the other ranks leave without waiting for it
+    cleanup_distributed()
+
+
+def _run_textbox_worker(local_rank, nproc, master_port, kwargs):
+    os.environ['MASTER_ADDR'] = os.environ.get('MASTER_ADDR', '127.0.0.1')
+    os.environ['MASTER_PORT'] = str(master_port)
+    os.environ['WORLD_SIZE'] = str(nproc)
+    os.environ['RANK'] = str(local_rank)
+    os.environ['LOCAL_RANK'] = str(local_rank)
+    run_textbox(**kwargs)
+
+
+def run_textbox_distributed(nproc, master_port=29500, **kwargs):
+    r"""Launch :func:`run_textbox` with ``nproc`` local processes, which is equivalent to
+    ``torchrun --nproc_per_node=nproc`` on a single machine.
+
+    Args:
+        nproc (int): the number of processes
+        master_port (int, optional): a free port used by the processes to communicate, default: 29500
+        **kwargs: the arguments of :func:`run_textbox`
+    """
+    import torch.multiprocessing as mp
+    mp.spawn(_run_textbox_worker, args=(nproc, master_port, kwargs), nprocs=nproc, join=True)
+
+
+def run_distillation(model=None, dataset=None, config_file_list=None, config_dict=None, teacher_file=None, saved=True):
+    r"""Distill a trained teacher model into a student model by
+    :class:`~textbox.trainer.trainer.DistillationTrainer`, and compare their BLEU, ROUGE and decoding latency
+    on the test data.
+
+    The teacher is rebuilt from the config and parameters in its checkpoint ``teacher_file``, which is saved by the
+    trainer, e.g., ``saved/BART-CNN_DM-xxx.pth``. Teachers with the vocabulary of the dataset (e.g.,
+    TransformerEncDec) should be trained with the same dataset parameters as the student.
+
+    Args:
+        model (str): model name of the student
+        dataset (str): dataset name
+        config_file_list (list): config files used to modify experiment parameters of the student
+        config_dict (dict): parameters dictionary used to modify experiment parameters of the student
+        teacher_file (str): the checkpoint file of the teacher
+        saved (bool): whether to save the student model
+
+    Returns:
+        dict: the test results of ``'teacher'`` and ``'student'``
+    """
+    from textbox.trainer import DistillationTrainer
+
+    config = Config(model=model, dataset=dataset, config_file_list=config_file_list, config_dict=config_dict)
+    init_seed(config['seed'], config['reproducibility'])
+    init_logger(config)
+    logger = getLogger()
+    logger.info(config)
+
+    train_data, valid_data, test_data = data_preparation(config)
+
+    checkpoint = torch.load(teacher_file, map_location=config['device'])
+    teacher_config = checkpoint['config']
+    teacher_config['device'] = config['device']
+    teacher = get_model(teacher_config['model'])(teacher_config, train_data).to(config['device'])
+    teacher.load_state_dict(checkpoint['state_dict'])
+    if config['distillation'] == 'token':
+        # the teacher is rebuilt on the data of the student, so its own vocabulary is restored from its dataset
+        teacher.target_idx2token = create_dataset(teacher_config).target_idx2token
+    logger.info('Teacher {} loaded from {}'.format(teacher_config['model'], teacher_file))
+
+    model = get_model(config['model'])(config, train_data).to(config['device'])
+    logger.info(model)
+    model = compile_model(model, config['compile_model'])
 
-        logger.info('best valid loss: {}, best valid ppl: {}'.format(best_valid_score, best_valid_result))
+    teacher_name = os.path.splitext(os.path.basename(teacher_file))[0]
+    # the cached distilled data is regenerated if the checkpoint or the decoding config of the teacher changes
+    teacher_signature = {
+        'checkpoint': os.path.abspath(teacher_file),
+        'checkpoint_mtime': os.path.getmtime(teacher_file),
+        'model': teacher_config['model'],
+        'decoding_strategy': teacher_config['decoding_strategy'],
+        'beam_size': teacher_config['beam_size'],
+        'max_length': teacher_config['target_max_seq_length'],
+    }
+    trainer = DistillationTrainer(
+        config, model, teacher, teacher_name=teacher_name, teacher_signature=teacher_signature
+    )
+    best_valid_score, best_valid_result = trainer.fit(train_data, valid_data, saved=saved)
+    results = trainer.compare(test_data, load_best_model=saved)
 
-    logger.info('test result: {}'.format(test_result))
+    logger.info('best valid loss: {}, best valid ppl: {}'.format(best_valid_score, best_valid_result))
+    keys = list(results['student'])
+    logger.info('{:<10}'.format('') + ''.join('{:>14}'.format(key) for key in keys))
+    for name in ['teacher', 'student']:
+        logger.info(
+            '{:<10}'.format(name) +
+            ''.join('{:>14.4f}'.format(results[name][key]) if key in results[name] else '{:>14}'.format('-')
+                    for key in keys)
+        )
+    return results
@@ -0,0 +1,208 @@
+"""
+textbox.quick_start.sweep
+########################
+"""
+import os
+import csv
+import math
+import random
+import itertools
+import tempfile
+import multiprocessing
+import torch
+from time import time
+from logging import getLogger
+
+from textbox.utils import init_logger, get_model, get_trainer, init_seed, compile_model, ensure_dir, \
+    dataset_arguments
+from textbox.config import Config
+from textbox.data import data_preparation
+from textbox.data.shared import dump_dataloader, load_dataloader
+
+# the parameters which change the preprocessed data, trials sharing all of them share the data
+data_signature_arguments = sorted(
+    set(dataset_arguments + [
+        'dataset', 'data_path', 'task_type', 'seed', 'max_seq_length', 'tokenize_strategy', 'overlength_strategy',
+        'language', 'user_token_list', 'sentence_split_token', 'group_split_token', 'max_sentence_num'
+    ])
+)
+
+
+def _grid_trials(search_space):
+    values = []
+    for key, space in search_space.items():
+        if isinstance(space, dict):
+            raise ValueError('Range [{}] of [{}] can only be used in random search.'.format(space, key))
+        values.append(space if isinstance(space, (list, tuple)) else [space])
+    return [dict(zip(search_space.keys(), combination)) for combination in itertools.product(*values)]
+
+
+def _sample(space, rng):
+    if isinstance(space, dict):
+        low, high = space['min'], space['max']
+        if space.get('log', False):
+            value = math.exp(rng.uniform(math.log(low), math.log(high)))
+        else:
+            value = rng.uniform(low, high)
+        return int(round(value)) if isinstance(low, int) and isinstance(high, int) else value
+    if isinstance(space, (list, tuple)):
+        return rng.choice(list(space))
+    return space
+
+
+def _random_trials(search_space, num_trials, seed):
+    rng = random.Random(seed)
+    return [{key: _sample(space, rng) for key, space in search_space.items()} for _ in range(num_trials)]
+
+
+def _data_signature(config):
+    return tuple((key, repr(config[key])) for key in data_signature_arguments)
+
+
+def _run_trial(job):
+    r"""Train and test one trial in a worker process on the shared preprocessed data."""
+    trial_id, params, model, dataset, config_file_list, config_dict, data_dir, num_threads, saved = job
+    torch.set_num_threads(num_threads)
+
+    config = Config(model=model, dataset=dataset, config_file_list=config_file_list, config_dict=config_dict)
+    # trials started in the same second should not share checkpoints, logs and generated text
+    config['filename'] = '{}-trial{}'.format(config['filename'], trial_id)
+    init_seed(config['seed'], config['reproducibility'])
+    init_logger(config)
+    logger = getLogger()
+
+    result = {'trial': trial_id}
+    result.update(params)
+    start_time = time()
+    try:
+        train_data = load_dataloader(os.path.join(data_dir, 'train'), config, config['train_batch_size'], True)
+        valid_data = load_dataloader(os.path.join(data_dir, 'valid'), config, config['eval_batch_size'], False)
+        test_data = load_dataloader(os.path.join(data_dir, 'test'), config, config['eval_batch_size'], False)
+
+        model = get_model(config['model'])(config, train_data).to(config['device'])
+        model = compile_model(model, config['compile_model'])
+        trainer = get_trainer(config['MODEL_TYPE'], config['model'])(config, model)
+
+        best_valid_score, _ = trainer.fit(train_data, valid_data, saved=saved)
+        test_result = trainer.evaluate(test_data, load_best_model=saved)
+        result['best_valid_score'] = best_valid_score
+        result.update(test_result)
+    except Exception as e:
+        # a failed trial should not stop the others
+        logger.exception('Trial {} failed'.format(trial_id))
+        result['error'] = '{}: {}'.format(type(e).__name__, e)
+    result['time'] = time() - start_time
+    return result
+
+
+def _write_table(results, output_file):
+    columns = []
+    for result in results:
+        columns += [key for key in result if key not in columns]
+    ensure_dir(os.path.dirname(os.path.abspath(output_file)))
+    with open(output_file, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=columns)
+        writer.writeheader()
+        writer.writerows(results)
+    return columns
+
+
+def run_sweep(
+    model=None,
+    dataset=None,
+    config_file_list=None,
+    config_dict=None,
+    search_space=None,
+    search='grid',
+    num_trials=10,
+    num_workers=1,
+    output_file=None,
+    saved=True
+):
+    r"""Run a hyperparameter sweep of a model on a dataset, where every trial is trained and tested as
+    :func:`~textbox.quick_start.run_textbox` does.
+
+    Trials are generated from ``search_space``, which maps parameter names to a list of values, or to a range
+    ``{'min': low, 'max': high, 'log': False}`` (random search only, integers if both bounds are integers). The grid
+    search runs every combination of values, and the random search samples ``num_trials`` combinations.
+
+    The data is preprocessed (loaded, tokenized and indexed) only once for each distinct data configuration, i.e.,
+    the parameters in :attr:`data_signature_arguments`, in the main process. The token indices are saved as numpy
+    files by :func:`~textbox.data.shared.dump_dataloader`, and trials memory-map them, so that the trials running in
+    parallel share one copy of index data. Trials are run in a pool of ``num_workers`` processes, each of which uses
+    an equal share of CPU threads and starts from a fresh process. The parameters, the best valid score, the test
+    result and the time of all the trials are collected into one CSV table.
+
+    Args:
+        model (str): model name
+        dataset (str): dataset name
+        config_file_list (list): config files used to modify experiment parameters
+        config_dict (dict): parameters dictionary used to modify experiment parameters, shared by all the trials
+        search_space (dict): the values or ranges of parameters to search
+        search (str, optional): ``'grid'`` or ``'random'``, default: ``'grid'``
+        num_trials (int, optional): the number of trials of random search, default: 10
+        num_workers (int, optional): the number of trials run in parallel, default: 1
+        output_file (str, optional): the CSV file to write, default: ``sweep/[model]-[dataset].csv``
+        saved (bool, optional): whether to save the model of every trial, default: True
+
+    Returns:
+        list: the result of every trial, sorted by the trial id
+    """
+    config_dict = config_dict or dict()
+    base_config = Config(model=model, dataset=dataset, config_file_list=config_file_list, config_dict=config_dict)
+    init_logger(base_config)
+    logger = getLogger()
+
+    if not search_space:
+        raise ValueError('The search space of the sweep is empty.')
+    if search == 'grid':
+        trials = _grid_trials(search_space)
+    elif search == 'random':
+        trials = _random_trials(search_space, num_trials, base_config['seed'])
+    else:
+        raise ValueError('Search [{}] should be grid or random.'.format(search))
+    num_workers = max(1, min(num_workers, len(trials)))
+    num_threads = max(1, torch.get_num_threads() // num_workers)
+    logger.info(
+        'Sweep {} trials of {} on {} with {} workers'.format(
+            len(trials), base_config['model'], base_config['dataset'], num_workers
+        )
+    )
+
+    with tempfile.TemporaryDirectory(prefix='textbox-sweep-') as data_root:
+        data_dirs = dict()
+        jobs = []
+        for trial_id, params in enumerate(trials):
+            trial_config_dict = dict(config_dict, **params)
+            config = Config(
+                model=model, dataset=dataset, config_file_list=config_file_list, config_dict=trial_config_dict
+            )
+            signature = _data_signature(config)
+            if signature not in data_dirs:
+                data_dirs[signature] = os.path.join(data_root, str(len(data_dirs)))
+                logger.info('Preprocess data {} for trial {}'.format(len(data_dirs) - 1, trial_id))
+                init_seed(config['seed'], config['reproducibility'])
+                for name, dataloader in zip(['train', 'valid', 'test'], data_preparation(config)):
+                    dump_dataloader(dataloader, os.path.join(data_dirs[signature], name))
+            jobs.append((
+                trial_id, params, model, dataset, config_file_list, trial_config_dict, data_dirs[signature],
+                num_threads, saved
+            ))
+
+        results = []
+        context = multiprocessing.get_context('spawn')
+        with context.Pool(num_workers, maxtasksperchild=1) as pool:
+            for result in pool.imap_unordered(_run_trial, jobs):
+                logger.info('trial {}: {}'.format(result['trial'], result))
+                results.append(result)
+    results.sort(key=lambda result: result['trial'])
+
+    if output_file is None:
+        output_file = os.path.join('sweep', '{}-{}.csv'.format(base_config['model'], base_config['dataset']))
+    columns = _write_table(results, output_file)
+    logger.info('Results of the sweep are written into {}'.format(output_file))
+    logger.info('\n' + '\n'.join(
+        ' | '.join(str(result.get(column, '')) for column in columns) for result in [dict(zip(columns, columns))] +
+        results
+    ))
+    return results
@@ -0,0 +1,283 @@
+"""
+textbox.quick_start.tuner
+########################
+"""
+import os
+import yaml
+import torch
+from time import time
+from logging import getLogger
+
+from textbox.utils import init_logger, get_model, get_trainer, init_seed, compile_model, ensure_dir, ModelType
+from textbox.config import Config
+from textbox.data import data_preparation
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+class _OutOfMemory(Exception):
+    pass
+
+
+def _is_oom_error(e):
+    message = str(e).lower()
+    return isinstance(e, MemoryError) or 'out of memory' in message or "can't allocate memory" in message
+
+
+def _default_memory_limit(device):
+    r"""90% of device memory on GPU and 80% of physical memory on CPU, in MB."""
+    if device.type == 'cuda':
+        return torch.cuda.get_device_properties(device).total_memory * 0.9 / 1024 / 1024
+    try:
+        return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES') * 0.8 / 1024 / 1024
+    except (ValueError, OSError, AttributeError):
+        return None
+
+
+def _reset_peak_memory(device):
+    if device.type == 'cuda':
+        torch.cuda.empty_cache()
+        torch.cuda.reset_peak_memory_stats(device)
+        return
+    try:
+        # reset the peak RSS (VmHWM) of the process on Linux
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+    except OSError:
+        pass
+
+
+def _peak_memory(device):
+    r"""Peak allocated memory on GPU or peak RSS of the process on CPU, in MB."""
+    if device.type == 'cuda':
+        return torch.cuda.max_memory_allocated(device) / 1024 / 1024
+    try:
+        with open('/proc/self/status', 'r') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    if resource is not None:
+        # ru_maxrss is in kilobytes on Linux, and it can not be reset
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return None
+
+
+def _count(data):
+    samples, tokens = 0, 0
+    for key, value in data.items():
+        if (key.endswith('_length') or key.endswith('_idx_length_data')) and isinstance(value, torch.Tensor):
+            samples = max(samples, value.size(0))
+            tokens += int(value.sum())
+    return samples, tokens
+
+
+class _SingleBatch(object):
+    r"""A view of ``dataloader`` which yields only ``data``, so that ``generate()`` decodes one batch of it."""
+
+    def __init__(self, dataloader, data):
+        self.dataloader = dataloader
+        self.data = data
+
+    def __iter__(self):
+        return iter([self.data])
+
+    def __len__(self):
+        return 1
+
+    def __getattr__(self, name):
+        return getattr(self.dataloader, name)
+
+
+def _probe(trainer, dataloader, batch_size, warmup, steps, train, memory_limit):
+    r"""Run ``warmup + steps`` batches of ``batch_size`` from ``dataloader``, and measure the throughput. Training
+    batches run a forward, backward and optimizer step, and evaluation batches run ``generate()``, where unconditional
+    models sample ``batch_size`` sentences.
+
+    Returns:
+        dict: samples/sec, tokens/sec and peak memory of the probe
+    Raises:
+        _OutOfMemory: if the memory is out or exceeds ``memory_limit``
+    """
+    model, device = trainer.model, trainer.device
+    dataloader.batch_size = dataloader.step = batch_size
+    dataloader.pr = 0
+    _reset_peak_memory(device)
+
+    model.train(train)
+    # unconditional models sample eval_generate_num sentences in batches of eval_batch_size
+    generate_attrs = {
+        name: getattr(model, name)
+        for name in ['eval_generate_num', 'eval_batch_size'] if hasattr(model, name)
+    }
+    samples, tokens, elapsed_time, step = 0, 0, 0., 0
+    try:
+        while step < warmup + steps:
+            batch_num = 0
+            for data in dataloader:
+                batch_num += 1
+                if device.type == 'cuda':
+                    torch.cuda.synchronize(device)
+                start_time = time()
+                if train:
+                    trainer.optimizer.zero_grad()
+                    losses = trainer.distributed_model(data, epoch_idx=0)
+                    loss = sum(losses) if isinstance(losses, tuple) else losses
+                    loss.backward()
+                    trainer.optimizer.step()
+                else:
+                    for name in generate_attrs:
+                        setattr(model, name, batch_size)
+                    with torch.no_grad():
+                        generate_corpus = model.generate(_SingleBatch(dataloader, data))
+                if device.type == 'cuda':
+                    torch.cuda.synchronize(device)
+                if step >= warmup:
+                    elapsed_time += time() - start_time
+                    if train:
+                        batch_samples, batch_tokens = _count(data)
+                    else:
+                        batch_samples, batch_tokens = len(generate_corpus), sum(map(len, generate_corpus))
+                    samples += batch_samples
+                    tokens += batch_tokens
+                step += 1
+
+                peak_memory = _peak_memory(device)
+                if memory_limit is not None and peak_memory is not None and peak_memory > memory_limit:
+                    raise _OutOfMemory('peak memory {:.1f} MB exceeds the limit {:.1f} MB'.format(
+                        peak_memory, memory_limit
+                    ))
+                if step == warmup + steps:
+                    break
+            if batch_num == 0:
+                raise ValueError('The dataloader yields no batch of batch size {}.'.format(batch_size))
+    except (RuntimeError, MemoryError) as e:
+        if not _is_oom_error(e):
+            raise
+        raise _OutOfMemory(str(e).split('\n')[0])
+    finally:
+        dataloader.pr = 0
+        for name, value in generate_attrs.items():
+            setattr(model, name, value)
+        if train:
+            trainer.optimizer.zero_grad()
+
+    elapsed_time = max(elapsed_time, 1e-12)
+    return {
+        'samples_per_sec': samples / elapsed_time,
+        'tokens_per_sec': tokens / elapsed_time,
+        'peak_memory_mb': _peak_memory(device),
+    }
+
+
+def _search(trainer, dataloader, name, train, min_batch_size, max_batch_size, warmup, steps, memory_limit):
+    logger = getLogger()
+    results = []
+    num_samples = dataloader.pr_end
+    batch_size = min_batch_size
+    while batch_size <= max_batch_size:
+        try:
+            result = _probe(trainer, dataloader, batch_size, warmup, steps, train, memory_limit)
+        except _OutOfMemory as e:
+            logger.info('{} = {}: out of memory ({})'.format(name, batch_size, e))
+            break
+        result['batch_size'] = batch_size
+        results.append(result)
+        logger.info(
+            '{} = {}: {:.1f} samples/s, {:.1f} tokens/s, peak memory {} MB'.format(
+                name, batch_size, result['samples_per_sec'], result['tokens_per_sec'], result['peak_memory_mb']
+            )
+        )
+        if batch_size >= num_samples:
+            # the whole data is in one batch, so larger batch sizes make no difference
+            break
+        batch_size *= 2
+
+    if not results:
+        raise ValueError('{} = {} is already out of memory.'.format(name, min_batch_size))
+    key = 'tokens_per_sec' if any(result['tokens_per_sec'] > 0 for result in results) else 'samples_per_sec'
+    return max(results, key=lambda result: result[key]), results
+
+
+def tune_batch_size(
+    model=None,
+    dataset=None,
+    config_file_list=None,
+    config_dict=None,
+    output_file=None,
+    min_batch_size=8,
+    max_batch_size=4096,
+    warmup=1,
+    steps=3,
+    memory_limit=None
+):
+    r"""Tune ``train_batch_size`` and ``eval_batch_size`` of a model on a dataset.
+
+    The model is built from :class:`~textbox.config.Config` as :func:`~textbox.quick_start.run_textbox` does.
+    Then short probes on real batches are run at doubling batch sizes, i.e., forward, backward and optimizer steps
+    for ``train_batch_size`` and ``generate()`` with the decoding strategy of config for ``eval_batch_size``, whose
+    throughput counts the generated tokens. Probing stops when an out-of-memory error is raised or the peak memory
+    exceeds ``memory_limit``, where the peak memory is the peak allocated memory on GPU or the peak RSS of the process
+    on CPU. The batch sizes with the best throughput (tokens/sec) are written into ``output_file``, which can be
+    passed to ``config_file_list`` afterwards.
+
+    Args:
+        model (str): model name
+        dataset (str): dataset name
+        config_file_list (list): config files used to modify experiment parameters
+        config_dict (dict): parameters dictionary used to modify experiment parameters
+        output_file (str, optional): the YAML file to write, default: ``tuned/[model]-[dataset].yaml``. If it exists,
+            the batch sizes are updated and other parameters are kept.
+        min_batch_size (int, optional): the first batch size to probe, default: 8
+        max_batch_size (int, optional): the largest batch size to probe, default: 4096
+        warmup (int, optional): the number of batches not measured in each probe, default: 1
+        steps (int, optional): the number of batches measured in each probe, default: 3
+        memory_limit (float, optional): the memory limit in MB, default: 90% of GPU memory or 80% of physical memory
+
+    Returns:
+        dict: the tuned ``train_batch_size`` and ``eval_batch_size``, and the probe results of each batch size
+    """
+    config = Config(model=model, dataset=dataset, config_file_list=config_file_list, config_dict=config_dict)
+    init_seed(config['seed'], config['reproducibility'])
+    init_logger(config)
+    logger = getLogger()
+
+    train_data, valid_data, test_data = data_preparation(config)
+    model = get_model(config['model'])(config, train_data).to(config['device'])
+    if model.type == ModelType.GAN:
+        raise NotImplementedError('Batch size tuning of GAN models is not supported.')
+    model = compile_model(model, config['compile_model'])
+    trainer = get_trainer(config['MODEL_TYPE'], config['model'])(config, model)
+
+    device = config['device']
+    if memory_limit is None:
+        memory_limit = _default_memory_limit(device)
+    logger.info('Tuning batch size of {} on {} with memory limit {} MB'.format(
+        config['model'], config['dataset'], memory_limit
+    ))
+
+    best_train, train_results = _search(
+        trainer, train_data, 'train_batch_size', True, min_batch_size, max_batch_size, warmup, steps, memory_limit
+    )
+    best_eval, eval_results = _search(
+        trainer, valid_data, 'eval_batch_size', False, min_batch_size, max_batch_size, warmup, steps, memory_limit
+    )
+    tuned = {'train_batch_size': best_train['batch_size'], 'eval_batch_size': best_eval['batch_size']}
+
+    if output_file is None:
+        output_file = os.path.join('tuned', '{}-{}.yaml'.format(config['model'], config['dataset']))
+    ensure_dir(os.path.dirname(os.path.abspath(output_file)))
+    parameters = dict()
+    if os.path.exists(output_file):
+        with open(output_file, 'r', encoding='utf-8') as f:
+            parameters = yaml.safe_load(f) or dict()
+    parameters.update(tuned)
+    with open(output_file, 'w', encoding='utf-8') as f:
+        yaml.safe_dump(parameters, f, default_flow_style=False)
+    logger.info('Tuned batch sizes {} are written into {}'.format(tuned, output_file))
+
+    return {'train': train_results, 'eval': eval_results, **tuned}
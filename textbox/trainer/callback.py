@@ -0,0 +1,282 @@
+r"""
+textbox.trainer.callback
+################################
+"""
+
+import os
+import signal
+import threading
+import torch
+
+from contextlib import contextmanager
+from logging import getLogger
+
+from textbox.utils import ensure_dir, get_rank, get_world_size, reduce_mean
+
+
+class Callback(object):
+    r"""Base class of callbacks, which are extension points of the training process of trainers.
+    A callback is registered by :meth:`~textbox.trainer.trainer.Trainer.add_callback`, after which
+    :attr:`trainer` refers to the trainer. Every hook does nothing by default.
+
+    The ``phase`` of epoch hooks is ``train`` for :class:`~textbox.trainer.trainer.Trainer`, and ``g_pretrain``,
+    ``d_pretrain`` or ``adversarial`` for :class:`~textbox.trainer.trainer.GANTrainer`. The ``name`` of section
+    hooks is one of ``forward``, ``backward`` and ``optimizer``.
+    """
+
+    trainer = None
+
+    def on_fit_start(self):
+        r"""Called at the beginning of ``fit()``."""
+        pass
+
+    def on_fit_end(self):
+        r"""Called at the end of ``fit()``."""
+        pass
+
+    def on_epoch_start(self, phase, epoch_idx):
+        r"""Called before a training epoch of the given phase."""
+        pass
+
+    def on_epoch_end(self, phase, epoch_idx, loss):
+        r"""Called after a training epoch of the given phase with its average loss."""
+        pass
+
+    def on_batch_start(self, batch_idx):
+        r"""Called when a batch is fetched, before it is fed into the model."""
+        pass
+
+    def on_batch_end(self, batch_idx, data, loss):
+        r"""Called after the optimizer step of a batch with the batch data and its loss."""
+        pass
+
+    def on_section_start(self, name):
+        r"""Called before the forward, backward or optimizer section of a batch."""
+        pass
+
+    def on_section_end(self, name):
+        r"""Called after the forward, backward or optimizer section of a batch."""
+        pass
+
+    def on_eval(self, epoch_idx, valid_score, valid_result):
+        r"""Called after the validation of an epoch."""
+        pass
+
+    def on_save(self, epoch_idx, checkpoint_file):
+        r"""Called after a checkpoint is saved."""
+        pass
+
+
+class CallbackList(Callback):
+    r"""Container of callbacks, which calls the hooks of every registered callback in order.
+
+    Args:
+        trainer (Trainer): the trainer which callbacks are attached to.
+    """
+
+    def __init__(self, trainer):
+        self.trainer = trainer
+        self.callbacks = []
+
+    def append(self, callback):
+        callback.trainer = self.trainer
+        self.callbacks.append(callback)
+
+    def __iter__(self):
+        return iter(self.callbacks)
+
+    def __len__(self):
+        return len(self.callbacks)
+
+    def on_fit_start(self):
+        for callback in self.callbacks:
+            callback.on_fit_start()
+
+    def on_fit_end(self):
+        for callback in self.callbacks:
+            callback.on_fit_end()
+
+    def on_epoch_start(self, phase, epoch_idx):
+        for callback in self.callbacks:
+            callback.on_epoch_start(phase, epoch_idx)
+
+    def on_epoch_end(self, phase, epoch_idx, loss):
+        for callback in self.callbacks:
+            callback.on_epoch_end(phase, epoch_idx, loss)
+
+    def on_batch_start(self, batch_idx):
+        for callback in self.callbacks:
+            callback.on_batch_start(batch_idx)
+
+    def on_batch_end(self, batch_idx, data, loss):
+        for callback in self.callbacks:
+            callback.on_batch_end(batch_idx, data, loss)
+
+    def on_section_start(self, name):
+        for callback in self.callbacks:
+            callback.on_section_start(name)
+
+    def on_section_end(self, name):
+        for callback in reversed(self.callbacks):
+            callback.on_section_end(name)
+
+    def on_eval(self, epoch_idx, valid_score, valid_result):
+        for callback in self.callbacks:
+            callback.on_eval(epoch_idx, valid_score, valid_result)
+
+    def on_save(self, epoch_idx, checkpoint_file):
+        for callback in self.callbacks:
+            callback.on_save(epoch_idx, checkpoint_file)
+
+    @contextmanager
+    def section(self, name):
+        r"""Context manager which calls :meth:`on_section_start` and :meth:`on_section_end` around its block.
+
+        Args:
+            name (str): the name of section, i.e. ``forward``, ``backward`` or ``optimizer``.
+        """
+        self.on_section_start(name)
+        try:
+            yield
+        finally:
+            self.on_section_end(name)
+
+
+class ProfilerCallback(Callback):
+    r"""ProfilerCallback profiles training steps by ``torch.profiler``. After ``profiler_wait`` steps are skipped and
+    ``profiler_warmup`` steps are warmed up, ``profiler_active`` steps are recorded, and this cycle is repeated
+    ``profiler_repeat`` times. Each recorded window is exported as a Chrome trace (open it in ``chrome://tracing``)
+    and an operator table of the top ``profiler_row_limit`` operators in the directory ``log/[filename]-profiler/``.
+
+    Args:
+        config (Config): An instance object of Config, used to record parameter information.
+    """
+
+    def __init__(self, config):
+        self.logger = getLogger()
+        self.wait = config['profiler_wait'] if config['profiler_wait'] is not None else 1
+        self.warmup = config['profiler_warmup'] if config['profiler_warmup'] is not None else 1
+        self.active = config['profiler_active'] or 3
+        self.repeat = config['profiler_repeat'] if config['profiler_repeat'] is not None else 1
+        self.row_limit = config['profiler_row_limit'] or 30
+        self.use_cuda = config['device'].type == 'cuda'
+        self.trace_dir = os.path.join('./log/', config['filename'] + '-profiler')
+        self.profiler = None
+        self.records = []
+
+    def on_fit_start(self):
+        activities = [torch.profiler.ProfilerActivity.CPU]
+        if self.use_cuda:
+            activities.append(torch.profiler.ProfilerActivity.CUDA)
+        self.profiler = torch.profiler.profile(
+            activities=activities,
+            schedule=torch.profiler.schedule(
+                wait=self.wait, warmup=self.warmup, active=self.active, repeat=self.repeat
+            ),
+            on_trace_ready=self._export,
+            record_shapes=True,
+            profile_memory=True
+        )
+        self.profiler.start()
+
+    def on_section_start(self, name):
+        record = torch.autograd.profiler.record_function(name)
+        record.__enter__()
+        self.records.append(record)
+
+    def on_section_end(self, name):
+        record = self.records.pop()
+        record.__exit__(None, None, None)
+
+    def on_batch_end(self, batch_idx, data, loss):
+        if self.profiler is not None:
+            self.profiler.step()
+
+    def on_fit_end(self):
+        if self.profiler is not None:
+            self.profiler.stop()
+            self.profiler = None
+
+    def _export(self, profiler):
+        ensure_dir(self.trace_dir)
+        name = 'rank{}_step{}'.format(get_rank(), profiler.step_num)
+        trace_file = os.path.join(self.trace_dir, 'trace_{}.json'.format(name))
+        profiler.export_chrome_trace(trace_file)
+
+        sort_by = 'self_cuda_time_total' if self.use_cuda else 'self_cpu_time_total'
+        table = profiler.key_averages().table(sort_by=sort_by, row_limit=self.row_limit)
+        with open(os.path.join(self.trace_dir, 'operators_{}.txt'.format(name)), 'w') as fout:
+            fout.write(table)
+        self.logger.info('Profiler trace saved in {}'.format(trace_file))
+
+
+class PreemptionCallback(Callback):
+    r"""PreemptionCallback makes the training preemptible. After ``SIGTERM`` (or ``signum``) is received, the current
+    optimization step is finished, a resumable checkpoint is written by
+    :meth:`~textbox.trainer.trainer.Trainer._save_resume_checkpoint` and the process exits with code 0. The
+    checkpoint is checked after every batch and before every epoch, and the training can be continued from it by
+    :meth:`~textbox.trainer.trainer.Trainer.resume_checkpoint`.
+
+    In distributed training, the processes agree on the preemption after every batch, so that all of them stop at
+    the same step even if they receive the signal at different steps.
+
+    Args:
+        signum (int, optional): the signal to handle, default: ``signal.SIGTERM``.
+    """
+
+    def __init__(self, signum=signal.SIGTERM):
+        self.logger = getLogger()
+        self.signum = signum
+        self.received = False
+        self.previous_handler = None
+        self.installed = False
+        self.phase = None
+        self.epoch_idx = None
+        self.total_loss = None
+
+    def _handle(self, signum, frame):
+        self.logger.warning('Received signal {}, training will stop after the current step.'.format(signum))
+        self.received = True
+
+    def _preempted(self):
+        if get_world_size() > 1:
+            return reduce_mean(float(self.received)) > 0
+        return self.received
+
+    def _check(self):
+        if not self._preempted():
+            return
+        resume_file = self.trainer._save_resume_checkpoint(self.phase, self.epoch_idx, self.total_loss)
+        self.logger.info(
+            'Training is preempted in {} epoch {}, resume it from {}'.format(self.phase, self.epoch_idx, resume_file)
+        )
+        # the callbacks are finished by the ``finally`` of ``fit()``
+        raise SystemExit(0)
+
+    def on_fit_start(self):
+        # signal handlers can only be set in the main thread of the main interpreter
+        if threading.current_thread() is not threading.main_thread():
+            self.logger.warning('Training is not run in the main thread, signal {} is not handled.'.format(self.signum))
+            return
+        self.received = False
+        self.previous_handler = signal.signal(self.signum, self._handle)
+        self.installed = True
+
+    def on_epoch_start(self, phase, epoch_idx):
+        self.phase = phase
+        self.epoch_idx = epoch_idx
+        self.total_loss = self.trainer._resumed_loss(phase, epoch_idx, pop=False)
+        self._check()
+
+    def on_batch_end(self, batch_idx, data, loss):
+        if isinstance(loss, tuple):
+            loss = tuple(per_loss.item() for per_loss in loss)
+            self.total_loss = loss if self.total_loss is None else tuple(map(sum, zip(self.total_loss, loss)))
+        else:
+            self.total_loss = loss.item() if self.total_loss is None else self.total_loss + loss.item()
+        self._check()
+
+    def on_fit_end(self):
+        if self.installed:
+            signal.signal(self.signum, self.previous_handler if self.previous_handler is not None else signal.SIG_DFL)
+            self.installed = False
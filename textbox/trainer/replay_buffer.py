@@ -0,0 +1,83 @@
+r"""
+textbox.trainer.replay_buffer
+################################
+"""
+
+import math
+import torch
+
+
+class ReplayBuffer(object):
+    r"""ReplayBuffer keeps the fake samples which the discriminator of GAN models is trained on, so that a discriminator
+    epoch only samples a part of them from the generator instead of all of them.
+
+    The buffer is filled by ``capacity`` samples at the first :meth:`update`. Every following update ages the samples
+    by one epoch, and replaces the oldest ``ceil(capacity * refresh_ratio)`` samples, as well as all samples which have
+    been trained on for ``max_age`` epochs, with new samples of the generator.
+
+    Args:
+        capacity (int): the number of fake samples in the buffer.
+        refresh_ratio (float, optional): the ratio of samples replaced at every update, default: 1.0 (all samples).
+        max_age (int, optional): the max number of updates a sample is kept for, default: None (no limit).
+    """
+
+    def __init__(self, capacity, refresh_ratio=1.0, max_age=None):
+        if refresh_ratio is not None and not 0 < refresh_ratio <= 1:
+            raise ValueError('refresh_ratio [{}] should be in (0, 1].'.format(refresh_ratio))
+        self.capacity = capacity
+        self.refresh_num = capacity if refresh_ratio is None else max(1, math.ceil(capacity * refresh_ratio))
+        self.max_age = max_age or None
+        self.samples = None
+        self.ages = None
+        self.position = 0  # where the oldest samples start, as the buffer is written circularly
+
+    def __len__(self):
+        return 0 if self.samples is None else self.samples.size(0)
+
+    def state_dict(self):
+        r"""The samples in the buffer and their ages, so that the buffer can be restored by :meth:`load_state_dict`.
+
+        Returns:
+            dict: the state of the buffer
+        """
+        return {'samples': self.samples, 'ages': self.ages, 'position': self.position}
+
+    def load_state_dict(self, state_dict):
+        r"""Restore the samples and their ages saved by :meth:`state_dict`.
+
+        Args:
+            state_dict (dict): the state of the buffer
+        """
+        self.samples = state_dict['samples']
+        self.ages = state_dict['ages']
+        self.position = state_dict['position']
+
+    def update(self, sample_func):
+        r"""Replace the oldest samples by new samples of the generator.
+
+        Args:
+            sample_func (function): The function which samples the given number of sentences from the generator.
+
+        Returns:
+            torch.Tensor: The fake samples in the buffer, shape: [capacity, max_seq_length].
+        """
+        if self.samples is None:
+            self.samples = sample_func(self.capacity)
+            self.ages = torch.zeros(self.capacity, dtype=torch.long, device=self.samples.device)
+            return self.samples
+
+        self.ages += 1
+        refresh_num = self.refresh_num
+        if self.max_age is not None:
+            refresh_num = max(refresh_num, self.ages.ge(self.max_age).sum().item())
+        if refresh_num >= self.capacity:
+            self.samples = sample_func(self.capacity)
+            self.ages.zero_()
+            self.position = 0
+            return self.samples
+
+        index = (torch.arange(refresh_num, device=self.samples.device) + self.position) % self.capacity
+        self.samples[index] = sample_func(refresh_num).to(self.samples.device)
+        self.ages[index] = 0
+        self.position = (self.position + refresh_num) % self.capacity
+        return self.samples
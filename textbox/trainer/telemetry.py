@@ -0,0 +1,209 @@
+r"""
+textbox.trainer.telemetry
+################################
+"""
+
+import os
+import json
+import csv
+import torch
+
+from time import time
+from logging import getLogger
+
+from textbox.trainer.callback import Callback
+from textbox.utils import ensure_dir, is_main_process
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+class Telemetry(Callback):
+    r"""Telemetry is a callback which records the training throughput and efficiency of trainers, including
+    tokens/sec, samples/sec, padding fraction, data-wait time, the time split of forward, backward and optimizer step,
+    and peak memory.
+
+    Records are aggregated every ``telemetry_interval`` batches (and at the end of each phase), and written as
+    ``jsonl`` or ``csv`` (decided by ``telemetry``) next to the log file. A summary of every phase is logged and
+    written at the end of ``fit()``, and it can also be obtained by :meth:`summary`.
+
+    Args:
+        config (Config): An instance object of Config, used to record parameter information.
+    """
+
+    fields = [
+        'phase', 'epoch', 'step', 'samples', 'tokens', 'samples_per_sec', 'tokens_per_sec', 'padding_fraction',
+        'data_wait_time', 'forward_time', 'backward_time', 'optimizer_time', 'elapsed_time', 'peak_memory_mb'
+    ]
+    counters = [
+        'samples', 'tokens', 'padded_tokens', 'data_wait_time', 'forward_time', 'backward_time', 'optimizer_time',
+        'elapsed_time'
+    ]
+
+    def __init__(self, config):
+        self.logger = getLogger()
+        self.format = 'csv' if str(config['telemetry']).lower() == 'csv' else 'jsonl'
+        self.interval = config['telemetry_interval'] or 100
+        self.device = config['device']
+
+        log_dir = './log/'
+        self.telemetry_file = os.path.join(log_dir, config['filename'] + '.telemetry.' + self.format)
+        self.summary_file = os.path.join(log_dir, config['filename'] + '.telemetry_summary.json')
+        if is_main_process():
+            ensure_dir(log_dir)
+
+        self.phase = 'train'
+        self.epoch = None
+        self.step = 0
+        self.last_time = None
+        self._interval = self._new_counter()
+        self._summary = dict()
+        self._section_start_time = None
+
+    def _new_counter(self):
+        return dict.fromkeys(self.counters, 0)
+
+    def _synchronize(self):
+        if self.device is not None and self.device.type == 'cuda':
+            torch.cuda.synchronize(self.device)
+
+    def on_epoch_start(self, phase, epoch_idx):
+        if phase != self.phase:
+            self._flush()
+        self.phase = phase
+        self.epoch = epoch_idx
+        self.last_time = time()
+
+    def on_batch_start(self, batch_idx):
+        # the time since the end of last batch is counted as data-wait time
+        now = time()
+        if self.last_time is None:
+            self.last_time = now
+        self._interval['data_wait_time'] += now - self.last_time
+        self._interval['elapsed_time'] += now - self.last_time
+        self.last_time = now
+
+    def on_section_start(self, name):
+        self._synchronize()
+        self._section_start_time = time()
+
+    def on_section_end(self, name):
+        self._synchronize()
+        self._interval[name + '_time'] += time() - self._section_start_time
+
+    def on_batch_end(self, batch_idx, data, loss):
+        now = time()
+        self._interval['elapsed_time'] += now - self.last_time
+        self.last_time = now
+
+        # tensor data of GAN trainers is padded by pad_idx of the trainer
+        samples, tokens, padded_tokens = self._count(data, getattr(self.trainer, 'pad_idx', None))
+        self._interval['samples'] += samples
+        self._interval['tokens'] += tokens
+        self._interval['padded_tokens'] += padded_tokens
+        self.step += 1
+        if self.step % self.interval == 0:
+            self._flush()
+
+    def _count(self, data, pad_idx):
+        if isinstance(data, (tuple, list)):
+            counts = [self._count(d, pad_idx) for d in data]
+            return tuple(sum(c) for c in zip(*counts)) if counts else (0, 0, 0)
+        if isinstance(data, torch.Tensor):
+            tokens = data.numel() if pad_idx is None else int((data != pad_idx).sum())
+            return data.size(0), tokens, data.numel()
+
+        samples, tokens, padded_tokens = 0, 0, 0
+        for key, value in data.items():
+            if key.endswith('_idx_length_data'):
+                idx_key = key[:-len('_idx_length_data')] + '_text_idx_data'
+            elif key.endswith('_length'):
+                idx_key = key[:-len('_length')] + '_idx'
+            else:
+                continue
+            if idx_key not in data:
+                continue
+            samples = max(samples, value.size(0))
+            tokens += int(value.sum())
+            padded_tokens += data[idx_key].numel()
+        return samples, tokens, padded_tokens
+
+    def _peak_memory(self):
+        if self.device is not None and self.device.type == 'cuda':
+            return torch.cuda.max_memory_allocated(self.device) / 1024 / 1024
+        if resource is not None:
+            # ru_maxrss is in kilobytes on Linux
+            return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        return None
+
+    def _make_record(self, counter, phase, epoch, step):
+        elapsed_time = max(counter['elapsed_time'], 1e-12)
+        return {
+            'phase': phase,
+            'epoch': epoch,
+            'step': step,
+            'samples': counter['samples'],
+            'tokens': counter['tokens'],
+            'samples_per_sec': counter['samples'] / elapsed_time,
+            'tokens_per_sec': counter['tokens'] / elapsed_time,
+            'padding_fraction': 1 - counter['tokens'] / counter['padded_tokens'] if counter['padded_tokens'] else 0,
+            'data_wait_time': counter['data_wait_time'],
+            'forward_time': counter['forward_time'],
+            'backward_time': counter['backward_time'],
+            'optimizer_time': counter['optimizer_time'],
+            'elapsed_time': counter['elapsed_time'],
+            'peak_memory_mb': self._peak_memory(),
+        }
+
+    def _flush(self):
+        if self._interval['elapsed_time'] == 0:
+            return
+        record = self._make_record(self._interval, self.phase, self.epoch, self.step)
+        if is_main_process():
+            self._write(record)
+
+        summary = self._summary.setdefault(self.phase, self._new_counter())
+        for key in self.counters:
+            summary[key] += self._interval[key]
+        self._interval = self._new_counter()
+
+    def _write(self, record):
+        if self.format == 'csv':
+            write_header = not os.path.exists(self.telemetry_file)
+            with open(self.telemetry_file, 'a', newline='') as fout:
+                writer = csv.DictWriter(fout, fieldnames=self.fields)
+                if write_header:
+                    writer.writeheader()
+                writer.writerow(record)
+        else:
+            with open(self.telemetry_file, 'a') as fout:
+                fout.write(json.dumps(record) + '\n')
+
+    def summary(self):
+        r"""Summarize the records of every phase.
+
+        Returns:
+            dict: key is the phase and value is the summarized record of this phase
+        """
+        return {
+            phase: self._make_record(counter, phase, None, None)
+            for phase, counter in self._summary.items()
+        }
+
+    def on_fit_end(self):
+        self._flush()
+        summary = self.summary()
+        for phase, record in summary.items():
+            self.logger.info(
+                'telemetry [%s]: %.1f tokens/s, %.1f samples/s, padding %.2f%%, data wait %.2fs, forward %.2fs, '
+                'backward %.2fs, optimizer %.2fs, peak memory %s MB' % (
+                    phase, record['tokens_per_sec'], record['samples_per_sec'], record['padding_fraction'] * 100,
+                    record['data_wait_time'], record['forward_time'], record['backward_time'],
+                    record['optimizer_time'], record['peak_memory_mb']
+                )
+            )
+        if is_main_process():
+            with open(self.summary_file, 'w') as fout:
+                json.dump(summary, fout, indent=2)
@@ -14,19 +14,27 @@ textbox.trainer.trainer
 
 import os
 import torch
+import torch.nn as nn
 import torch.optim as optim
 import numpy as np
-import matplotlib.pyplot as plt
 import copy
 import math
+import hashlib
 
 from torch.utils.data import DataLoader
+from torch.nn.parallel import DistributedDataParallel
 from time import time
 from logging import getLogger
 
-from textbox.module.Optimizer.optim import ScheduledOptim
+from textbox.module.Optimizer.optim import ScheduledOptim, MultipleOptimizer
+from textbox.trainer.callback import CallbackList, ProfilerCallback, PreemptionCallback
+from textbox.trainer.telemetry import Telemetry
+from textbox.trainer.replay_buffer import ReplayBuffer
 from textbox.evaluator import NgramEvaluator, TranslationEvaluator, SummarizationEvaluator
-from textbox.utils import ensure_dir, early_stopping
+from textbox.module.loss import distillation_loss
+from textbox.data.utils import dump_distilled_data, load_distilled_data
+from textbox.utils import ensure_dir, early_stopping, get_world_size, get_rank, is_main_process, reduce_mean, \
+    quantize_model, get_rng_state, set_rng_state
 
 
 class AbstractTrainer(object):
@@ -66,6 +74,9 @@ class Trainer(AbstractTrainer):
     More information can be found in [placeholder]. `model` is the instantiated object of a Model Class.
     """
 
+    # whether the training can be preempted and continued from a checkpoint saved in the middle of an epoch
+    support_preemption = True
+
     def __init__(self, config, model):
         super(Trainer, self).__init__(config, model)
 
@@ -94,7 +105,29 @@ class Trainer(AbstractTrainer):
         self.best_valid_score = 100000000
         self.best_valid_result = None
         self.train_loss_dict = dict()
+        self.train_data = None
+        self.resume_state = None
+        self.sparse_embeddings = config['sparse_embeddings']
+        self.quantize = config['quantize']
+        self.quantized = False
         self.optimizer = self._build_optimizer()
+        self.world_size = get_world_size()
+        self.distributed_model = self._build_distributed_model()
+        self.callbacks = CallbackList(self)
+        self.telemetry = None
+        if config['telemetry']:
+            self.telemetry = Telemetry(config)
+            self.add_callback(self.telemetry)
+        if config['profiler']:
+            self.add_callback(ProfilerCallback(config))
+        if config['preemptible']:
+            if self.support_preemption:
+                self.add_callback(PreemptionCallback())
+            else:
+                self.logger.warning(
+                    'Preemption is not supported by {}, the training is not checkpointed on SIGTERM and has to be '
+                    'restarted from the last saved epoch.'.format(self.__class__.__name__)
+                )
         self.task_type = config['task_type'].lower()
         if self.task_type in ["translation", "attribute", "multi_dialog", "poem"]:
             self.evaluator = TranslationEvaluator(config)
@@ -108,29 +141,83 @@ class Trainer(AbstractTrainer):
         self.iid_field = config['ITEM_ID_FIELD']
 
     def _build_optimizer(self):
-        r"""Init the Optimizer
+        r"""Init the Optimizer. If ``sparse_embeddings`` is set, the token embedders are updated by ``SparseAdam``
+        and the other parameters are updated by the configured learner.
 
         Returns:
             torch.optim: the optimizer
         """
+        parameters = self.model.parameters()
+        sparse_parameters = self._sparse_embedding_parameters() if self.sparse_embeddings else []
+        if sparse_parameters:
+            sparse_ids = set(id(p) for p in sparse_parameters)
+            parameters = [p for p in self.model.parameters() if id(p) not in sparse_ids]
+
         if self.learner.lower() == 'adam':
-            optimizer = optim.Adam(self.model.parameters(), lr=self.learning_rate)
+            optimizer = optim.Adam(parameters, lr=self.learning_rate)
         elif self.learner.lower() == 'sgd':
-            optimizer = optim.SGD(self.model.parameters(), lr=self.learning_rate)
+            optimizer = optim.SGD(parameters, lr=self.learning_rate)
         elif self.learner.lower() == 'adagrad':
-            optimizer = optim.Adagrad(self.model.parameters(), lr=self.learning_rate)
+            optimizer = optim.Adagrad(parameters, lr=self.learning_rate)
         elif self.learner.lower() == 'rmsprop':
-            optimizer = optim.RMSprop(self.model.parameters(), lr=self.learning_rate)
+            optimizer = optim.RMSprop(parameters, lr=self.learning_rate)
         elif self.learner.lower() == 'schedule':
             optimizer = ScheduledOptim(
-                optim.Adam(self.model.parameters(), betas=(0.9, 0.98), eps=1e-09), self.learning_rate,
-                self.embedding_size, self.warmup_steps
+                optim.Adam(parameters, betas=(0.9, 0.98), eps=1e-09), self.learning_rate, self.embedding_size,
+                self.warmup_steps
             )
         else:
             self.logger.warning('Received unrecognized optimizer, set default Adam optimizer')
-            optimizer = optim.Adam(self.model.parameters(), lr=self.learning_rate)
+            optimizer = optim.Adam(parameters, lr=self.learning_rate)
+
+        if sparse_parameters:
+            if isinstance(optimizer, ScheduledOptim):
+                # the learning rate of SparseAdam is scheduled as well
+                optimizer._optimizer = MultipleOptimizer(
+                    optimizer._optimizer, optim.SparseAdam(sparse_parameters, betas=(0.9, 0.98), eps=1e-09)
+                )
+            else:
+                optimizer = MultipleOptimizer(optimizer, optim.SparseAdam(sparse_parameters, lr=self.learning_rate))
         return optimizer
 
+    def _sparse_embedding_parameters(self):
+        r"""Make the token embedders of the model produce sparse gradients, whose rows are only the tokens in a batch.
+
+        Returns:
+            list: the weights of token embedders
+        """
+        parameters = []
+        for name, module in self.model.named_modules():
+            if isinstance(module, nn.Embedding) and 'token_embedder' in name and module.weight.requires_grad:
+                module.sparse = True
+                parameters.append(module.weight)
+        if parameters:
+            self.logger.info(
+                'Sparse embeddings: {} token embedders are updated by SparseAdam'.format(len(parameters))
+            )
+        else:
+            self.logger.warning('Sparse embeddings: no token embedder is found in the model')
+        return parameters
+
+    def add_callback(self, callback):
+        r"""Register a callback, whose hooks will be called during training.
+
+        Args:
+            callback (~textbox.trainer.callback.Callback): the callback to be registered
+        """
+        self.callbacks.append(callback)
+
+    def _build_distributed_model(self):
+        r"""Wrap the model with DistributedDataParallel if more than one process is launched. The wrapped model
+        computes the training loss in its forward function, and synchronizes gradients across processes in backward.
+
+        Returns:
+            torch.nn.Module: the model used to calculate training loss
+        """
+        if self.world_size <= 1:
+            return self.model
+        return DistributedDataParallel(self.model, find_unused_parameters=True)
+
     def _train_epoch(self, train_data, epoch_idx):
         r"""Train the model in an epoch
 
@@ -144,10 +231,12 @@ class Trainer(AbstractTrainer):
             tuple which includes the sum of loss in each part.
         """
         self.model.train()
-        total_loss = None
+        total_loss = self._resumed_loss('train', epoch_idx)
         for batch_idx, data in enumerate(train_data):
+            self.callbacks.on_batch_start(batch_idx)
             self.optimizer.zero_grad()
-            losses = self.model.calculate_loss(data, epoch_idx=epoch_idx)
+            with self.callbacks.section('forward'):
+                losses = self.distributed_model(data, epoch_idx=epoch_idx)
             if isinstance(losses, tuple):
                 loss = sum(losses)
                 loss_tuple = tuple(per_loss.item() for per_loss in losses)
@@ -156,9 +245,12 @@ class Trainer(AbstractTrainer):
                 loss = losses
                 total_loss = losses.item() if total_loss is None else total_loss + losses.item()
             self._check_nan(loss)
-            loss.backward()
-            self.optimizer.step()
-        train_loss = total_loss / len(train_data)
+            with self.callbacks.section('backward'):
+                loss.backward()
+            with self.callbacks.section('optimizer'):
+                self.optimizer.step()
+            self.callbacks.on_batch_end(batch_idx, data, losses)
+        train_loss = reduce_mean(total_loss / len(train_data))
         return train_loss
 
     def _valid_epoch(self, valid_data):
@@ -183,7 +275,7 @@ class Trainer(AbstractTrainer):
                 loss = losses
                 total_loss = losses.item() if total_loss is None else total_loss + losses.item()
             self._check_nan(loss)
-        valid_loss = total_loss / len(valid_data)
+        valid_loss = reduce_mean(total_loss / len(valid_data))
         ppl = np.exp(valid_loss)
         return valid_loss, ppl
 
@@ -194,6 +286,8 @@ class Trainer(AbstractTrainer):
             epoch (int): the current epoch id
 
         """
+        if not is_main_process():
+            return
         state = {
             'config': self.config,
             'epoch': epoch,
@@ -203,6 +297,106 @@ class Trainer(AbstractTrainer):
             'optimizer': self.optimizer.state_dict(),
         }
         torch.save(state, self.saved_model_file)
+        self.callbacks.on_save(epoch, self.saved_model_file)
+
+    def _optimizer_state_dict(self):
+        r"""The states of all the optimizers of the trainer."""
+        return self.optimizer.state_dict()
+
+    def _load_optimizer_state_dict(self, state_dict):
+        r"""Restore the states of all the optimizers returned by :meth:`_optimizer_state_dict`."""
+        self.optimizer.load_state_dict(state_dict)
+
+    def _progress_state_dict(self):
+        r"""The progress inside the preempted epoch which is not kept by the train data, e.g., the finished parts of
+        an adversarial epoch. The epochs of :class:`Trainer` only iterate the train data, so there is none."""
+        return None
+
+    def _load_progress_state_dict(self, state_dict):
+        r"""Restore the progress returned by :meth:`_progress_state_dict`."""
+        pass
+
+    def _save_resume_checkpoint(self, phase, epoch_idx, total_loss=None):
+        r"""Store a checkpoint from which the training can be continued in the middle of an epoch, including the
+        states of all the optimizers, the random number generators and the train data, besides the information of
+        :meth:`_save_checkpoint`. The checkpoint is written into ``[checkpoint_dir]/[filename]-resume.pth``.
+
+        Args:
+            phase (str): the phase of the interrupted epoch, e.g., ``train``, ``g_pretrain``
+            epoch_idx (int): the interrupted epoch id
+            total_loss (float/tuple, optional): the sum of loss of the finished batches in the epoch, default: None
+
+        Returns:
+            str: the checkpoint file
+        """
+        resume_file = os.path.join(self.checkpoint_dir, self.config['filename'] + '-resume.pth')
+        if not is_main_process():
+            return resume_file
+        state = {
+            'config': self.config,
+            'epoch': epoch_idx,
+            'cur_step': self.cur_step,
+            'best_valid_score': self.best_valid_score,
+            'best_valid_result': self.best_valid_result,
+            'state_dict': self.model.state_dict(),
+            'optimizer': self._optimizer_state_dict(),
+            'loss_dicts': {key: value for key, value in vars(self).items() if key.endswith('_loss_dict')},
+            'preemption': {
+                'phase': phase,
+                'epoch': epoch_idx,
+                'total_loss': total_loss,
+                'data': None if self.train_data is None else self.train_data.state_dict(),
+                'progress': self._progress_state_dict(),
+                'rng': get_rng_state(),
+            },
+        }
+        # the previous checkpoint is kept if the process is killed while writing
+        torch.save(state, resume_file + '.tmp')
+        os.replace(resume_file + '.tmp', resume_file)
+        self.callbacks.on_save(epoch_idx, resume_file)
+        return resume_file
+
+    def _resumed_loss(self, phase, epoch_idx, pop=True):
+        r"""The sum of loss of the batches finished before the preemption, if the given epoch is the preempted one.
+
+        Args:
+            phase (str): the phase of the epoch
+            epoch_idx (int): the epoch id
+            pop (bool, optional): whether the loss is only used once, default: True
+
+        Returns:
+            float/tuple: the sum of loss, or None if the epoch is not resumed
+        """
+        state = self.resume_state
+        if state is None or state['phase'] != phase or state['epoch'] != epoch_idx:
+            return None
+        if pop:
+            self.resume_state = None
+        return state['total_loss']
+
+    def _resumed_start_epochs(self, phases):
+        r"""The first epoch of every phase of ``fit()``. If the training is resumed from a preempted checkpoint, the
+        phases before the preempted one are skipped, and the preempted phase starts from the preempted epoch.
+
+        Args:
+            phases (list of tuple): the name and the number of epochs of every phase, in order
+
+        Returns:
+            list of int: the first epoch of every phase
+        """
+        if self.resume_state is None:
+            return [0] * len(phases)
+        index = [name for name, _ in phases].index(self.resume_state['phase'])
+        return [epochs for _, epochs in phases[:index]] + [self.resume_state['epoch']] + [0] * (len(phases) - index - 1)
+
+    def _start_fit(self, train_data):
+        r"""Called at the beginning of ``fit()``. If the training is resumed from a preempted checkpoint, the train
+        data continues from the position where it was interrupted.
+        """
+        self.train_data = train_data
+        if self.resume_state is not None and self.resume_state['data'] is not None:
+            train_data.load_state_dict(self.resume_state['data'])
+        self.callbacks.on_fit_start()
 
     def _save_generated_text(self, generated_corpus):
         r"""Store the generated text by our model.
@@ -210,6 +404,8 @@ class Trainer(AbstractTrainer):
         Args:
             corpus (list of string list):
         """
+        if not is_main_process():
+            return
         with open(self.saved_text_file, 'w') as fin:
             for tokens in generated_corpus:
                 fin.write(' '.join(tokens) + '\n')
@@ -223,7 +419,9 @@ class Trainer(AbstractTrainer):
         """
         resume_file = str(resume_file)
         checkpoint = torch.load(resume_file)
-        self.start_epoch = checkpoint['epoch'] + 1
+        preemption = checkpoint.get('preemption')
+        # the preempted epoch is continued, otherwise the training starts from the next epoch
+        self.start_epoch = checkpoint['epoch'] + (0 if preemption is not None else 1)
         self.cur_step = checkpoint['cur_step']
         self.best_valid_score = checkpoint['best_valid_score']
 
@@ -236,8 +434,20 @@ class Trainer(AbstractTrainer):
         self.model.load_state_dict(checkpoint['state_dict'])
 
         # load optimizer state from checkpoint only when optimizer type is not changed
-        self.optimizer.load_state_dict(checkpoint['optimizer'])
-        message_output = 'Checkpoint loaded. Resume training from epoch {}'.format(self.start_epoch)
+        if 'optimizer' in checkpoint:
+            self._load_optimizer_state_dict(checkpoint['optimizer'])
+        if preemption is not None:
+            self.best_valid_result = checkpoint['best_valid_result']
+            for key, value in checkpoint['loss_dicts'].items():
+                setattr(self, key, value)
+            self._load_progress_state_dict(preemption.get('progress'))
+            set_rng_state(preemption['rng'])
+            self.resume_state = preemption
+            message_output = 'Preempted checkpoint loaded. Resume training from {} epoch {}'.format(
+                preemption['phase'], preemption['epoch']
+            )
+        else:
+            message_output = 'Checkpoint loaded. Resume training from epoch {}'.format(self.start_epoch)
         self.logger.info(message_output)
 
     def _check_nan(self, loss):
@@ -267,56 +477,63 @@ class Trainer(AbstractTrainer):
         Returns:
              (float, dict): best valid score and best valid result. If valid_data is None, it returns (-1, None)
         """
-        for epoch_idx in range(self.start_epoch, self.epochs):
-            # train
-            training_start_time = time()
-            train_loss = self._train_epoch(train_data, epoch_idx)
-            self.train_loss_dict[epoch_idx] = sum(train_loss) if isinstance(train_loss, tuple) else train_loss
-            training_end_time = time()
-            self._save_checkpoint(epoch_idx)
-            train_loss_output = \
-                self._generate_train_loss_output(epoch_idx, training_start_time, training_end_time, train_loss)
-            if verbose:
-                self.logger.info(train_loss_output)
-
-            # eval
-            if self.eval_step <= 0 or not valid_data:
-                if saved:
-                    self._save_checkpoint(epoch_idx)
-                    update_output = 'Saving current: %s' % self.saved_model_file
-                    if verbose:
-                        self.logger.info(update_output)
-                continue
-            if (epoch_idx + 1) % self.eval_step == 0:
-                valid_start_time = time()
-                with torch.no_grad():
-                    valid_score, valid_result = self._valid_epoch(valid_data)
-                # valid_loss, ppl
-                self.best_valid_score, self.cur_step, stop_flag, update_flag = early_stopping(
-                    valid_score, self.best_valid_score, self.cur_step, max_step=self.stopping_step, bigger=False
-                )
-                # better model are supposed to provide smaller perplexity and loss
-                valid_end_time = time()
-                valid_score_output = "epoch %d evaluating [time: %.2fs, valid_loss: %f]" % \
-                                     (epoch_idx, valid_end_time - valid_start_time, valid_score)
-                valid_result_output = 'valid ppl: {}'.format(valid_result)
+        self._start_fit(train_data)
+        try:
+            for epoch_idx in range(self.start_epoch, self.epochs):
+                # train
+                training_start_time = time()
+                self.callbacks.on_epoch_start('train', epoch_idx)
+                train_loss = self._train_epoch(train_data, epoch_idx)
+                self.callbacks.on_epoch_end('train', epoch_idx, train_loss)
+                self.train_loss_dict[epoch_idx] = sum(train_loss) if isinstance(train_loss, tuple) else train_loss
+                training_end_time = time()
+                self._save_checkpoint(epoch_idx)
+                train_loss_output = \
+                    self._generate_train_loss_output(epoch_idx, training_start_time, training_end_time, train_loss)
                 if verbose:
-                    self.logger.info(valid_score_output)
-                    self.logger.info(valid_result_output)
-                if update_flag:
+                    self.logger.info(train_loss_output)
+
+                # eval
+                if self.eval_step <= 0 or not valid_data:
                     if saved:
                         self._save_checkpoint(epoch_idx)
-                        update_output = 'Saving current best: %s' % self.saved_model_file
+                        update_output = 'Saving current: %s' % self.saved_model_file
                         if verbose:
                             self.logger.info(update_output)
-                    self.best_valid_result = valid_result
-
-                if stop_flag:
-                    stop_output = 'Finished training, best eval result in epoch %d' % \
-                                  (epoch_idx - self.cur_step * self.eval_step)
+                    continue
+                if (epoch_idx + 1) % self.eval_step == 0:
+                    valid_start_time = time()
+                    with torch.no_grad():
+                        valid_score, valid_result = self._valid_epoch(valid_data)
+                    self.callbacks.on_eval(epoch_idx, valid_score, valid_result)
+                    # valid_loss, ppl
+                    self.best_valid_score, self.cur_step, stop_flag, update_flag = early_stopping(
+                        valid_score, self.best_valid_score, self.cur_step, max_step=self.stopping_step, bigger=False
+                    )
+                    # better model are supposed to provide smaller perplexity and loss
+                    valid_end_time = time()
+                    valid_score_output = "epoch %d evaluating [time: %.2fs, valid_loss: %f]" % \
+                                         (epoch_idx, valid_end_time - valid_start_time, valid_score)
+                    valid_result_output = 'valid ppl: {}'.format(valid_result)
                     if verbose:
-                        self.logger.info(stop_output)
-                    break
+                        self.logger.info(valid_score_output)
+                        self.logger.info(valid_result_output)
+                    if update_flag:
+                        if saved:
+                            self._save_checkpoint(epoch_idx)
+                            update_output = 'Saving current best: %s' % self.saved_model_file
+                            if verbose:
+                                self.logger.info(update_output)
+                        self.best_valid_result = valid_result
+
+                    if stop_flag:
+                        stop_output = 'Finished training, best eval result in epoch %d' % \
+                                      (epoch_idx - self.cur_step * self.eval_step)
+                        if verbose:
+                            self.logger.info(stop_output)
+                        break
+        finally:
+            self.callbacks.on_fit_end()
         return self.best_valid_score, self.best_valid_result
 
     def _evaluate_nll_test(self, eval_data):
@@ -335,6 +552,45 @@ class Trainer(AbstractTrainer):
             total_loss += float(nll_test)
         return total_loss / len(eval_data)
 
+    def _quantize_model(self):
+        if self.device.type != 'cpu':
+            raise ValueError('Dynamic int8 quantization only supports CPU inference, please set use_gpu=False.')
+        quantize_model(self.model)
+        self.quantized = True
+        self.logger.info('Model is quantized to int8 dynamically')
+
+    def _load_evaluation_model(self, load_best_model=True, model_file=None):
+        r"""Load the model to evaluate, and apply dynamic int8 quantization to it if ``quantize`` is set.
+
+        A quantized checkpoint is loaded into a quantized model. When a float checkpoint is quantized, the quantized
+        checkpoint is saved beside it with the suffix ``-int8``, which can be passed to ``model_file`` afterwards.
+
+        Args:
+            load_best_model (bool, optional): whether load the best model in the training process, default: True.
+            model_file (str, optional): the saved model file, default: None.
+        """
+        checkpoint_file = None
+        if load_best_model:
+            checkpoint_file = model_file or self.saved_model_file
+            checkpoint = torch.load(checkpoint_file)
+            if checkpoint.get('quantized', False) and not self.quantized:
+                self._quantize_model()
+            elif not checkpoint.get('quantized', False) and self.quantized:
+                raise ValueError(
+                    'Float checkpoint {} can not be loaded into a quantized model.'.format(checkpoint_file)
+                )
+            self.model.load_state_dict(checkpoint['state_dict'])
+            message_output = 'Loading model structure and parameters from {}'.format(checkpoint_file)
+            self.logger.info(message_output)
+
+        if self.quantize and not self.quantized:
+            self._quantize_model()
+            if checkpoint_file is not None and is_main_process():
+                quantized_file = os.path.splitext(checkpoint_file)[0] + '-int8.pth'
+                state = {'config': self.config, 'state_dict': self.model.state_dict(), 'quantized': True}
+                torch.save(state, quantized_file)
+                self.logger.info('Saving quantized model: {}'.format(quantized_file))
+
     @torch.no_grad()
     def evaluate(self, eval_data, load_best_model=True, model_file=None):
         r"""Evaluate the model based on the eval data.
@@ -349,15 +605,7 @@ class Trainer(AbstractTrainer):
         Returns:
             dict: eval result, key is the eval metric and value in the corresponding metric value
         """
-        if load_best_model:
-            if model_file:
-                checkpoint_file = model_file
-            else:
-                checkpoint_file = self.saved_model_file
-            checkpoint = torch.load(checkpoint_file)
-            self.model.load_state_dict(checkpoint['state_dict'])
-            message_output = 'Loading model structure and parameters from {}'.format(checkpoint_file)
-            self.logger.info(message_output)
+        self._load_evaluation_model(load_best_model, model_file)
 
         self.model.eval()
         with torch.no_grad():
@@ -377,6 +625,7 @@ class Trainer(AbstractTrainer):
             save_path (str, optional): the data path to save the figure, default: None.
                                        If it's None, it will not be saved.
         """
+        import matplotlib.pyplot as plt
         epochs = list(self.train_loss_dict.keys())
         epochs.sort()
         values = [float(self.train_loss_dict[epoch]) for epoch in epochs]
@@ -396,6 +645,8 @@ class GANTrainer(Trainer):
 
     def __init__(self, config, model):
         super(GANTrainer, self).__init__(config, model)
+        if self.world_size > 1:
+            raise NotImplementedError('Distributed training is not supported for GAN models.')
 
         self.optimizer = None
         self.g_optimizer = self._build_module_optimizer(self.model.generator)
@@ -408,6 +659,13 @@ class GANTrainer(Trainer):
         self.d_sample_training_epochs = config['d_sample_training_epochs']
         self.adversarail_training_epochs = config['adversarail_training_epochs']
         self.adversarail_d_epochs = config['adversarail_d_epochs']
+        self.d_replay_refresh_ratio = config['d_replay_refresh_ratio']
+        self.d_replay_max_age = config['d_replay_max_age']
+        self.replay_buffer = None
+        self.real_data_cache = None
+        # the finished parts of the current discriminator and adversarial epochs, to continue them after preemption
+        self.d_progress = None
+        self.adversarial_progress = None
 
         self.g_pretraining_loss_dict = dict()
         self.d_pretraining_loss_dict = dict()
@@ -437,6 +695,39 @@ class GANTrainer(Trainer):
 
         return optimizer
 
+    def _optimizer_state_dict(self):
+        return {'g': self.g_optimizer.state_dict(), 'd': self.d_optimizer.state_dict()}
+
+    def _load_optimizer_state_dict(self, state_dict):
+        self.g_optimizer.load_state_dict(state_dict['g'])
+        self.d_optimizer.load_state_dict(state_dict['d'])
+
+    def _progress_state_dict(self):
+        return {
+            'd': self.d_progress,
+            'adversarial': self.adversarial_progress,
+            'replay_buffer': None if self.replay_buffer is None else self.replay_buffer.state_dict(),
+        }
+
+    def _load_progress_state_dict(self, state_dict):
+        if state_dict is None:
+            return
+        self.d_progress = state_dict['d']
+        self.adversarial_progress = state_dict['adversarial']
+        if state_dict['replay_buffer'] is not None:
+            buffer_state = state_dict['replay_buffer']
+            self.replay_buffer = ReplayBuffer(
+                buffer_state['samples'].size(0), self.d_replay_refresh_ratio, self.d_replay_max_age
+            )
+            self.replay_buffer.load_state_dict(buffer_state)
+
+    def _save_resume_checkpoint(self, phase, epoch_idx, total_loss=None):
+        # the callback sums the loss of all batches, which mixes the generator and discriminator steps of an
+        # adversarial epoch, so the loss of discriminator and adversarial epochs is kept by their progress instead
+        if phase != 'g_pretrain':
+            total_loss = None
+        return super(GANTrainer, self)._save_resume_checkpoint(phase, epoch_idx, total_loss)
+
     def _optimize_step(self, losses, total_loss, model, opt):
         r"""The opt uses the cliped losses to conduct an optimize step to optimize model
         and sum up losses to the total_loss.
@@ -460,9 +751,11 @@ class GANTrainer(Trainer):
         self._check_nan(loss)
 
         opt.zero_grad()
-        loss.backward()
-        torch.nn.utils.clip_grad_norm_(model.parameters(), self.grad_clip)
-        opt.step()
+        with self.callbacks.section('backward'):
+            loss.backward()
+        with self.callbacks.section('optimizer'):
+            torch.nn.utils.clip_grad_norm_(model.parameters(), self.grad_clip)
+            opt.step()
         return total_loss
 
     def _save_checkpoint(self, epoch):
@@ -474,6 +767,7 @@ class GANTrainer(Trainer):
             'state_dict': self.model.state_dict()
         }
         torch.save(state, self.saved_model_file)
+        self.callbacks.on_save(epoch, self.saved_model_file)
 
     def _add_pad(self, data):
         r"""Pad the data to the max length of corpus.
@@ -507,6 +801,128 @@ class GANTrainer(Trainer):
         real_datas = torch.cat(real_datas, dim=0)
         return real_datas
 
+    def _get_cached_real_data(self, train_data):
+        r"""Get the target text index of the train data by :meth:`_get_real_data`, which is built once for the train
+        data and reused by all following epochs.
+
+        Args:
+            train_data (DataLoader): the train data.
+
+        Returns:
+            torch.Tensor: The target text index, shape: [data_num, max_seq_length].
+        """
+        if self.real_data_cache is None or self.real_data_cache[0] is not train_data:
+            real_data = self._get_real_data(train_data)
+            if train_data.sample_order is not None and len(train_data.sample_order) == real_data.size(0):
+                # the samples are kept in their original order rather than the shuffled one, so that the batch
+                # orders of a preempted epoch refer to the same samples after resuming
+                order = torch.tensor(train_data.sample_order, dtype=torch.long, device=real_data.device)
+                real_data = torch.empty_like(real_data).index_copy_(0, order, real_data)
+            self.real_data_cache = (train_data, real_data)
+        return self.real_data_cache[1]
+
+    def _get_fake_data(self, sample_num):
+        r"""Get the fake samples of a discriminator epoch from the replay buffer, where the oldest samples are replaced
+        by new samples of the generator according to ``d_replay_refresh_ratio`` and ``d_replay_max_age``.
+
+        Args:
+            sample_num (int): the number of fake samples.
+
+        Returns:
+            torch.Tensor: The fake samples, shape: [sample_num, max_seq_length].
+        """
+        if self.replay_buffer is None or self.replay_buffer.capacity != sample_num:
+            self.replay_buffer = ReplayBuffer(sample_num, self.d_replay_refresh_ratio, self.d_replay_max_age)
+        return self.replay_buffer.update(self.model.sample)
+
+    def _batch_orders(self, data_num, batch_num):
+        r"""Shuffle the data into batches like a shuffled DataLoader which drops the last incomplete batch. The orders
+        are kept in the progress of an epoch, so that a preempted epoch continues with the same batches.
+
+        Args:
+            data_num (int): the number of data.
+            batch_num (int): the number of batches.
+
+        Returns:
+            torch.LongTensor: The indexes of data in every batch, shape: [batch_num, batch_size].
+        """
+        batch_size = self.model.batch_size
+        return torch.randperm(data_num)[:batch_num * batch_size].view(batch_num, batch_size)
+
+    def _new_d_progress(self, data_nums, batch_num, **kwargs):
+        r"""Start the progress of a discriminator epoch, i.e., the batch orders of its ``d_sample_training_epochs``
+        passes, the number of finished passes and batches, and the sum of their loss.
+
+        Args:
+            data_nums (dict): the number of every kind of data shuffled into batches, e.g., ``real`` and ``fake``.
+            batch_num (int): the number of batches in every pass.
+            kwargs: other states of the epoch to be kept, e.g., the indexes of reference data.
+
+        Returns:
+            dict: The progress of the discriminator epoch.
+        """
+        orders = [{key: self._batch_orders(data_num, batch_num)
+                   for key, data_num in data_nums.items()}
+                  for _ in range(self.d_sample_training_epochs)]
+        return dict(orders=orders, sample_epoch=0, batch=0, loss=None, **kwargs)
+
+    def _run_d_epoch(self, d_step):
+        r"""Train the discriminator on the remaining batches of :attr:`d_progress`, and finish the epoch.
+
+        Args:
+            d_step (function): called as ``d_step(indexes)`` with the data indexes of a batch for every kind of data,
+                returns the losses and the batch data.
+
+        Returns:
+            float/tuple: The sum of loss returned by all batches in this epoch.
+        """
+        progress = self.d_progress
+        while progress['sample_epoch'] < self.d_sample_training_epochs:
+            orders = progress['orders'][progress['sample_epoch']]
+            while progress['batch'] < len(orders['real']):
+                batch_idx = progress['batch']
+                self.callbacks.on_batch_start(batch_idx)
+                with self.callbacks.section('forward'):
+                    losses, data = d_step({key: order[batch_idx] for key, order in orders.items()})
+                progress['loss'] = \
+                    self._optimize_step(losses, progress['loss'], self.model.discriminator, self.d_optimizer)
+                # the progress is updated before the batch hooks, where the training may be preempted
+                progress['batch'] += 1
+                self.callbacks.on_batch_end(batch_idx, data, losses)
+            progress['sample_epoch'] += 1
+            progress['batch'] = 0
+        self.d_progress = None
+        return progress['loss']
+
+    def _new_adversarial_progress(self, **kwargs):
+        r"""Start the progress of an adversarial epoch, i.e., the number of finished generator steps and the sum of
+        their loss, and the number of finished discriminator epochs.
+
+        Args:
+            kwargs: other states of the epoch to be kept, e.g., the batch orders of generator steps.
+
+        Returns:
+            dict: The progress of the adversarial epoch.
+        """
+        return dict(g_batch=0, g_loss=None, d_epoch=0, **kwargs)
+
+    def _adversarial_d_train(self, train_data):
+        r"""Train the discriminator for the remaining ``adversarail_d_epochs`` of :attr:`adversarial_progress` after
+        the generator steps, and finish the adversarial epoch.
+
+        Args:
+            train_data (DataLoader): the train data
+
+        Returns:
+            float/tuple: The sum of loss of the generator steps in this epoch.
+        """
+        progress = self.adversarial_progress
+        while progress['d_epoch'] < self.adversarail_d_epochs:
+            self._d_train_epoch(train_data, epoch_idx=progress['d_epoch'])
+            progress['d_epoch'] += 1
+        self.adversarial_progress = None
+        return progress['g_loss']
+
     def _g_train_epoch(self, train_data, epoch_idx):
         r"""Train the generator module in an epoch
 
@@ -520,11 +936,14 @@ class GANTrainer(Trainer):
             tuple which includes the sum of loss in each part.
         """
         self.model.generator.train()
-        total_loss = None
+        total_loss = self._resumed_loss('g_pretrain', epoch_idx)
 
         for batch_idx, data in enumerate(train_data):
-            losses = self.model.calculate_g_train_loss(data, epoch_idx=epoch_idx)
+            self.callbacks.on_batch_start(batch_idx)
+            with self.callbacks.section('forward'):
+                losses = self.model.calculate_g_train_loss(data, epoch_idx=epoch_idx)
             total_loss = self._optimize_step(losses, total_loss, self.model.generator, self.g_optimizer)
+            self.callbacks.on_batch_end(batch_idx, data, losses)
         total_loss = [l / len(train_data)
                       for l in total_loss] if isinstance(total_loss, tuple) else total_loss / len(train_data)
         total_loss = tuple(total_loss) if isinstance(total_loss, list) else total_loss
@@ -543,18 +962,22 @@ class GANTrainer(Trainer):
             tuple which includes the sum of loss in each part.
         """
         self.model.discriminator.train()
-        total_loss = None
-        real_data = self._get_real_data(train_data)
-        real_dataloader = DataLoader(real_data, batch_size=self.model.batch_size, shuffle=True, drop_last=True)
-        fake_data = self.model.sample(self.d_sample_num)
-        fake_dataloader = DataLoader(fake_data, batch_size=self.model.batch_size, shuffle=True, drop_last=True)
+        real_data = self._get_cached_real_data(train_data)
+        if self.d_progress is None:
+            fake_data = self._get_fake_data(self.d_sample_num)
+            batch_num = min(real_data.size(0), fake_data.size(0)) // self.model.batch_size
+            self.d_progress = self._new_d_progress({'real': real_data.size(0), 'fake': fake_data.size(0)}, batch_num)
+        else:
+            # the fake samples of a resumed epoch are restored with the replay buffer
+            fake_data = self.replay_buffer.samples
+        batch_num = len(self.d_progress['orders'][0]['real'])
 
-        for _ in range(self.d_sample_training_epochs):  # d_epoch
-            for real_data, fake_data in zip(real_dataloader, fake_dataloader):
-                losses = self.model.calculate_d_train_loss(real_data, fake_data, epoch_idx=epoch_idx)
-                total_loss = self._optimize_step(losses, total_loss, self.model.discriminator, self.d_optimizer)
+        def d_step(indexes):
+            real_batch, fake_batch = real_data[indexes['real']], fake_data[indexes['fake']]
+            losses = self.model.calculate_d_train_loss(real_batch, fake_batch, epoch_idx=epoch_idx)
+            return losses, (real_batch, fake_batch)
 
-        return total_loss / min(len(real_dataloader), len(fake_dataloader)) / self.d_sample_training_epochs
+        return self._run_d_epoch(d_step) / batch_num / self.d_sample_training_epochs
 
     def _adversarial_train_epoch(self, train_data, epoch_idx):
         r"""Adversarial training in an epoch
@@ -569,64 +992,84 @@ class GANTrainer(Trainer):
             tuple which includes the sum of loss in each part.
         """
         self.model.generator.train()
-        total_loss = None
-        losses = self.model.calculate_g_adversarial_loss(epoch_idx=epoch_idx)
-        total_loss = self._optimize_step(losses, total_loss, self.model.generator, self.g_optimizer)
-
-        for epoch_idx in range(self.adversarail_d_epochs):
-            self._d_train_epoch(train_data, epoch_idx=epoch_idx)
-
-        return total_loss
+        if self.adversarial_progress is None:
+            self.adversarial_progress = self._new_adversarial_progress()
+        progress = self.adversarial_progress
+        if progress['g_batch'] == 0:
+            self.callbacks.on_batch_start(0)
+            with self.callbacks.section('forward'):
+                losses = self.model.calculate_g_adversarial_loss(epoch_idx=epoch_idx)
+            progress['g_loss'] = self._optimize_step(losses, None, self.model.generator, self.g_optimizer)
+            progress['g_batch'] = 1
+            self.callbacks.on_batch_end(0, (), losses)
+
+        return self._adversarial_d_train(train_data)
 
     def fit(self, train_data, valid_data=None, verbose=True, saved=True):
-        # generator pretraining
-        if verbose:
-            self.logger.info("Start generator pretraining...")
-        for epoch_idx in range(self.g_pretraining_epochs):
-            training_start_time = time()
-            train_loss = self._g_train_epoch(train_data, epoch_idx)
-            self.g_pretraining_loss_dict[epoch_idx] = sum(train_loss) if isinstance(train_loss, tuple) else train_loss
-            training_end_time = time()
-            train_loss_output = \
-                self._generate_train_loss_output(epoch_idx, training_start_time, training_end_time, train_loss,
-                                                 "generator pre")
+        self._start_fit(train_data)
+        try:
+            g_start_epoch, d_start_epoch, adversarial_start_epoch = self._resumed_start_epochs([
+                ('g_pretrain', self.g_pretraining_epochs), ('d_pretrain', self.d_pretraining_epochs),
+                ('adversarial', self.adversarail_training_epochs)
+            ])
+            # generator pretraining
             if verbose:
-                self.logger.info(train_loss_output)
-        if verbose:
-            self.logger.info("End generator pretraining...")
+                self.logger.info("Start generator pretraining...")
+            for epoch_idx in range(g_start_epoch, self.g_pretraining_epochs):
+                training_start_time = time()
+                self.callbacks.on_epoch_start('g_pretrain', epoch_idx)
+                train_loss = self._g_train_epoch(train_data, epoch_idx)
+                self.callbacks.on_epoch_end('g_pretrain', epoch_idx, train_loss)
+                self.g_pretraining_loss_dict[epoch_idx] = \
+                    sum(train_loss) if isinstance(train_loss, tuple) else train_loss
+                training_end_time = time()
+                train_loss_output = \
+                    self._generate_train_loss_output(epoch_idx, training_start_time, training_end_time, train_loss,
+                                                     "generator pre")
+                if verbose:
+                    self.logger.info(train_loss_output)
+            if verbose:
+                self.logger.info("End generator pretraining...")
 
-        # discriminator pretraining
-        if verbose:
-            self.logger.info("Start discriminator pretraining...")
-        for epoch_idx in range(self.d_pretraining_epochs):
-            training_start_time = time()
-            train_loss = self._d_train_epoch(train_data, epoch_idx)
-            self.d_pretraining_loss_dict[epoch_idx] = sum(train_loss) if isinstance(train_loss, tuple) else train_loss
-            training_end_time = time()
-            train_loss_output = \
-                self._generate_train_loss_output(epoch_idx, training_start_time, training_end_time, train_loss,
-                                                 "discriminator pre")
+            # discriminator pretraining
             if verbose:
-                self.logger.info(train_loss_output)
-        if verbose:
-            self.logger.info("End discriminator pretraining...")
+                self.logger.info("Start discriminator pretraining...")
+            for epoch_idx in range(d_start_epoch, self.d_pretraining_epochs):
+                training_start_time = time()
+                self.callbacks.on_epoch_start('d_pretrain', epoch_idx)
+                train_loss = self._d_train_epoch(train_data, epoch_idx)
+                self.callbacks.on_epoch_end('d_pretrain', epoch_idx, train_loss)
+                self.d_pretraining_loss_dict[epoch_idx] = \
+                    sum(train_loss) if isinstance(train_loss, tuple) else train_loss
+                training_end_time = time()
+                train_loss_output = \
+                    self._generate_train_loss_output(epoch_idx, training_start_time, training_end_time, train_loss,
+                                                     "discriminator pre")
+                if verbose:
+                    self.logger.info(train_loss_output)
+            if verbose:
+                self.logger.info("End discriminator pretraining...")
 
-        # adversarial training
-        if verbose:
-            self.logger.info("Start adversarial training...")
-        for epoch_idx in range(self.adversarail_training_epochs):
-            training_start_time = time()
-            train_loss = self._adversarial_train_epoch(train_data, epoch_idx)
-            self.train_loss_dict[epoch_idx] = sum(train_loss) if isinstance(train_loss, tuple) else train_loss
-            training_end_time = time()
-            train_loss_output = \
-                self._generate_train_loss_output(epoch_idx, training_start_time, training_end_time, train_loss)
+            # adversarial training
             if verbose:
-                self.logger.info(train_loss_output)
-        if verbose:
-            self.logger.info("End adversarial pretraining...")
+                self.logger.info("Start adversarial training...")
+            for epoch_idx in range(adversarial_start_epoch, self.adversarail_training_epochs):
+                training_start_time = time()
+                self.callbacks.on_epoch_start('adversarial', epoch_idx)
+                train_loss = self._adversarial_train_epoch(train_data, epoch_idx)
+                self.callbacks.on_epoch_end('adversarial', epoch_idx, train_loss)
+                self.train_loss_dict[epoch_idx] = sum(train_loss) if isinstance(train_loss, tuple) else train_loss
+                training_end_time = time()
+                train_loss_output = \
+                    self._generate_train_loss_output(epoch_idx, training_start_time, training_end_time, train_loss)
+                if verbose:
+                    self.logger.info(train_loss_output)
+            if verbose:
+                self.logger.info("End adversarial pretraining...")
 
-        self._save_checkpoint(self.adversarail_training_epochs)
+            self._save_checkpoint(self.adversarail_training_epochs)
+        finally:
+            self.callbacks.on_fit_end()
         return -1, None
 
 
@@ -640,38 +1083,44 @@ class TextGANTrainer(GANTrainer):
 
     def _d_train_epoch(self, train_data, epoch_idx):
         self.model.discriminator.train()
-        total_loss = None
-        real_data = self._get_real_data(train_data)
-        real_dataloader = DataLoader(real_data, batch_size=self.model.batch_size, shuffle=True, drop_last=True)
-
-        for _ in range(self.d_sample_training_epochs):
-            for idx, real_data in enumerate(real_dataloader):
-                fake_data, z = self.model.sample()
-                losses = self.model.calculate_d_train_loss(real_data, fake_data, z, epoch_idx=epoch_idx)
-                total_loss = self._optimize_step(losses, total_loss, self.model.discriminator, self.d_optimizer)
-                if (idx * self.model.batch_size >= self.d_sample_num):
-                    break
-
-        return total_loss / min(
-            len(real_dataloader), self.d_sample_num // self.model.batch_size
+        real_data = self._get_cached_real_data(train_data)
+        real_batch_num = real_data.size(0) // self.model.batch_size
+        if self.d_progress is None:
+            # every pass stops after the first batch which reaches d_sample_num samples
+            batch_num = min(real_batch_num, math.ceil(self.d_sample_num / self.model.batch_size) + 1)
+            self.d_progress = self._new_d_progress({'real': real_data.size(0)}, batch_num)
+
+        def d_step(indexes):
+            real_batch = real_data[indexes['real']]
+            fake_data, z = self.model.sample()
+            losses = self.model.calculate_d_train_loss(real_batch, fake_data, z, epoch_idx=epoch_idx)
+            return losses, (real_batch, fake_data)
+
+        return self._run_d_epoch(d_step) / min(
+            real_batch_num, self.d_sample_num // self.model.batch_size
         ) / self.d_sample_training_epochs
 
     def _adversarial_train_epoch(self, train_data, epoch_idx):
         self.model.generator.train()
-        total_loss = None
-        real_data = self._get_real_data(train_data)
-        real_dataloader = DataLoader(real_data, batch_size=self.model.batch_size, shuffle=True, drop_last=True)
-
-        for idx, real_data in enumerate(real_dataloader):
-            if (idx == self.adversarail_g_epochs):
-                break
-            losses = self.model.calculate_g_adversarial_loss(real_data, epoch_idx=epoch_idx)
-            total_loss = self._optimize_step(losses, total_loss, self.model.generator, self.g_optimizer)
-
-        for epoch_idx in range(self.adversarail_d_epochs):
-            self._d_train_epoch(train_data, epoch_idx=epoch_idx)
-
-        return total_loss / min(len(real_dataloader), self.adversarail_g_epochs)
+        real_data = self._get_cached_real_data(train_data)
+        if self.adversarial_progress is None:
+            batch_num = min(real_data.size(0) // self.model.batch_size, self.adversarail_g_epochs)
+            self.adversarial_progress = \
+                self._new_adversarial_progress(g_orders=self._batch_orders(real_data.size(0), batch_num))
+        progress = self.adversarial_progress
+
+        g_orders = progress['g_orders']
+        while progress['g_batch'] < len(g_orders):
+            idx = progress['g_batch']
+            real_batch = real_data[g_orders[idx]]
+            self.callbacks.on_batch_start(idx)
+            with self.callbacks.section('forward'):
+                losses = self.model.calculate_g_adversarial_loss(real_batch, epoch_idx=epoch_idx)
+            progress['g_loss'] = self._optimize_step(losses, progress['g_loss'], self.model.generator, self.g_optimizer)
+            progress['g_batch'] += 1
+            self.callbacks.on_batch_end(idx, real_batch, losses)
+
+        return self._adversarial_d_train(train_data) / len(g_orders)
 
 
 class RankGANTrainer(GANTrainer):
@@ -694,21 +1143,26 @@ class RankGANTrainer(GANTrainer):
             tuple which includes the sum of loss in each part.
         """
         self.model.discriminator.train()
-        total_loss = None
-        real_data = self._get_real_data(train_data)
-        real_dataloader = DataLoader(real_data, batch_size=self.model.batch_size, shuffle=True, drop_last=True)
-        fake_data = self.model.sample(self.d_sample_num)
-        fake_dataloader = DataLoader(fake_data, batch_size=self.model.batch_size, shuffle=True, drop_last=True)
-
-        ref_index = np.random.randint(0, real_data.shape[0], size=self.model.ref_size)
-        ref_data = real_data[ref_index]  # ref_size * l
+        real_data = self._get_cached_real_data(train_data)
+        if self.d_progress is None:
+            fake_data = self._get_fake_data(self.d_sample_num)
+            batch_num = min(real_data.size(0), fake_data.size(0)) // self.model.batch_size
+            ref_index = np.random.randint(0, real_data.shape[0], size=self.model.ref_size)
+            self.d_progress = self._new_d_progress(
+                {'real': real_data.size(0), 'fake': fake_data.size(0)}, batch_num, ref_index=ref_index
+            )
+        else:
+            # the fake samples of a resumed epoch are restored with the replay buffer
+            fake_data = self.replay_buffer.samples
+        batch_num = len(self.d_progress['orders'][0]['real'])
+        ref_data = real_data[self.d_progress['ref_index']]  # ref_size * l
 
-        for _ in range(self.d_sample_training_epochs):
-            for real_data, fake_data in zip(real_dataloader, fake_dataloader):
-                losses = self.model.calculate_d_train_loss(real_data, fake_data, ref_data, epoch_idx=epoch_idx)
-                total_loss = self._optimize_step(losses, total_loss, self.model.discriminator, self.d_optimizer)
+        def d_step(indexes):
+            real_batch, fake_batch = real_data[indexes['real']], fake_data[indexes['fake']]
+            losses = self.model.calculate_d_train_loss(real_batch, fake_batch, ref_data, epoch_idx=epoch_idx)
+            return losses, (real_batch, fake_batch)
 
-        return total_loss / min(len(real_dataloader), len(fake_dataloader)) / self.d_sample_training_epochs
+        return self._run_d_epoch(d_step) / batch_num / self.d_sample_training_epochs
 
     def _adversarial_train_epoch(self, train_data, epoch_idx):
         r"""Adversarial training in an epoch
@@ -723,20 +1177,22 @@ class RankGANTrainer(GANTrainer):
             tuple which includes the sum of loss in each part.
         """
         self.model.generator.train()
-        total_loss = None
-        real_data = self._get_real_data(train_data)
-        ref_index = np.random.randint(0, real_data.shape[0], size=self.model.ref_size)
-        ref_data = real_data[ref_index]  # ref_size * l
+        if self.adversarial_progress is None:
+            self.adversarial_progress = self._new_adversarial_progress()
+        progress = self.adversarial_progress
+        if progress['g_batch'] == 0:
+            real_data = self._get_cached_real_data(train_data)
+            ref_index = np.random.randint(0, real_data.shape[0], size=self.model.ref_size)
+            ref_data = real_data[ref_index]  # ref_size * l
 
-        losses = self.model.calculate_g_adversarial_loss(ref_data, epoch_idx=epoch_idx)
-        total_loss = self._optimize_step(losses, total_loss, self.model.generator, self.g_optimizer)
+            self.callbacks.on_batch_start(0)
+            with self.callbacks.section('forward'):
+                losses = self.model.calculate_g_adversarial_loss(ref_data, epoch_idx=epoch_idx)
+            progress['g_loss'] = self._optimize_step(losses, None, self.model.generator, self.g_optimizer)
+            progress['g_batch'] = 1
+            self.callbacks.on_batch_end(0, ref_data, losses)
 
-        d_loss = 0
-        for epoch_idx in range(self.adversarail_d_epochs):
-            d_loss += self._d_train_epoch(train_data, epoch_idx=epoch_idx)
-        d_loss = d_loss / self.adversarail_d_epochs
-
-        return total_loss
+        return self._adversarial_d_train(train_data)
 
 
 class Seq2SeqTrainer(Trainer):
@@ -760,15 +1216,7 @@ class Seq2SeqTrainer(Trainer):
         Returns:
             dict: eval result, key is the eval metric and value in the corresponding metric value
         """
-        if load_best_model:
-            if model_file:
-                checkpoint_file = model_file
-            else:
-                checkpoint_file = self.saved_model_file
-            checkpoint = torch.load(checkpoint_file)
-            self.model.load_state_dict(checkpoint['state_dict'])
-            message_output = 'Loading model structure and parameters from {}'.format(checkpoint_file)
-            self.logger.info(message_output)
+        self._load_evaluation_model(load_best_model, model_file)
 
         self.model.eval()
         generate_corpus = self.model.generate(eval_data)
@@ -779,10 +1227,188 @@ class Seq2SeqTrainer(Trainer):
         return result
 
 
+class _TokenDistillation(nn.Module):
+    r"""Calculate the token-level distillation loss of the student in forward, so that it can be wrapped by
+    :class:`~torch.nn.parallel.DistributedDataParallel` as the model itself.
+    """
+
+    def __init__(self, student, teacher, temperature, alpha):
+        super(_TokenDistillation, self).__init__()
+        self.student = student
+        self.teacher = teacher
+        self.temperature = temperature
+        self.alpha = alpha
+
+    def forward(self, corpus, epoch_idx=0):
+        student_logits = self.student.calculate_token_logits(corpus)
+        with torch.no_grad():
+            teacher_logits = self.teacher.calculate_token_logits(corpus)
+        target_text = corpus['target_idx'][:, 1:]
+        loss = distillation_loss(
+            student_logits, teacher_logits, target_text, self.student.padding_token_idx, self.temperature, self.alpha
+        )
+        length = corpus['target_length'] - 1
+        loss = loss.sum(dim=1) / length.float()
+        return loss.mean()
+
+
+class DistillationTrainer(Seq2SeqTrainer):
+    r"""DistillationTrainer distills a trained teacher model, e.g., BART, BERT2BERT or a large TransformerEncDec,
+    into a smaller student Seq2Seq model, which is trained in the same way as :class:`Seq2SeqTrainer`.
+
+    If ``distillation`` is ``'sequence'`` (Kim and Rush "Sequence-Level Knowledge Distillation" in EMNLP 2016),
+    the targets of the train data are replaced by the text generated by the teacher, which is generated once and
+    cached in the dataset dir by :func:`~textbox.data.utils.dump_distilled_data` with the signature of the teacher
+    and the train data. The teacher can use any vocabulary.
+    If ``distillation`` is ``'token'``, the student is trained on the gold targets with the soft targets of the
+    teacher by :func:`~textbox.module.loss.distillation_loss`, weighted by ``distill_alpha`` and softened by
+    ``distill_temperature``. The teacher should share the target vocabulary (``target_idx2token``) with the student.
+
+    Args:
+        config (Config): the config of the student
+        model (Seq2SeqGenerator): the student model
+        teacher (Seq2SeqGenerator): the trained teacher model
+        teacher_name (str, optional): the name of the teacher used to cache the distilled data, default: ``'teacher'``
+        teacher_signature (dict, optional): the checkpoint and decoding config of the teacher, which the cached
+            distilled data should be generated with, default: None
+    """
+
+    def __init__(self, config, model, teacher, teacher_name='teacher', teacher_signature=None):
+        self.teacher = teacher
+        self.teacher_name = teacher_name
+        self.teacher_signature = teacher_signature
+        self.distillation = config['distillation']
+        self.distill_temperature = config['distill_temperature']
+        self.distill_alpha = config['distill_alpha']
+        if self.distillation not in ['sequence', 'token']:
+            raise ValueError('Distillation [{}] should be sequence or token.'.format(self.distillation))
+        if self.distillation == 'token' and \
+                getattr(teacher, 'target_idx2token', None) != getattr(model, 'target_idx2token', None):
+            raise ValueError('Token-level distillation needs the teacher and the student to share the vocabulary.')
+
+        self.teacher.eval()
+        for parameter in self.teacher.parameters():
+            parameter.requires_grad_(False)
+        self.distilled = False
+        super(DistillationTrainer, self).__init__(config, model)
+        if self.task_type == 'summarization':
+            self.bleu_evaluator = TranslationEvaluator(config)
+            self.rouge_evaluator = None
+        else:
+            self.bleu_evaluator = None
+            self.rouge_evaluator = SummarizationEvaluator(config)
+
+    def _build_distributed_model(self):
+        if self.distillation != 'token':
+            return super(DistillationTrainer, self)._build_distributed_model()
+        distiller = _TokenDistillation(self.model, self.teacher, self.distill_temperature, self.distill_alpha)
+        if self.world_size <= 1:
+            return distiller
+        return DistributedDataParallel(distiller, find_unused_parameters=True)
+
+    @torch.no_grad()
+    def distill_data(self, train_data):
+        r"""Replace the targets of the train data by the text generated by the teacher. The generated text is
+        loaded from the cache if it has been generated.
+
+        Args:
+            train_data (DataLoader): the train data, whose samples are in their original order
+        """
+        teacher_name = self.teacher_name
+        if self.world_size > 1:
+            teacher_name = '{}.{}-of-{}'.format(teacher_name, get_rank(), self.world_size)
+        signature = self._distillation_signature(train_data)
+        distilled_data = load_distilled_data(self.config['data_path'], teacher_name, signature)
+        if distilled_data is None:
+            self.logger.info('Generating distilled targets of {} samples by the teacher'.format(train_data.pr_end))
+            shuffle = train_data.shuffle
+            train_data.shuffle = False
+            self.teacher.eval()
+            distilled_data = self.teacher.generate(train_data)
+            train_data.shuffle = shuffle
+            dump_distilled_data(self.config['data_path'], distilled_data, teacher_name, signature)
+        else:
+            self.logger.info('Loading distilled targets of the teacher {}'.format(teacher_name))
+        train_data.replace_target_text(distilled_data)
+        self.distilled = True
+
+    def _distillation_signature(self, train_data):
+        r"""What the distilled data is generated from, i.e., the teacher signature and the source text of the train
+        data, so that the cached data of another teacher checkpoint, decoding config or dataset is not reused.
+
+        Args:
+            train_data (DataLoader): the train data
+
+        Returns:
+            dict: the signature of the distilled data
+        """
+        source_hash = hashlib.md5()
+        for tokens in train_data.source_text_data:
+            source_hash.update(' '.join(tokens).encode('utf-8'))
+            source_hash.update(b'\n')
+        signature = dict(self.teacher_signature or {})
+        signature.update({
+            'teacher': self.teacher_name,
+            'dataset': self.config['dataset'],
+            'sample_num': train_data.pr_end,
+            'source_md5': source_hash.hexdigest(),
+        })
+        return signature
+
+    def fit(self, train_data, valid_data=None, verbose=True, saved=True):
+        if self.distillation == 'sequence' and not self.distilled:
+            self.distill_data(train_data)
+        return super(DistillationTrainer, self).fit(train_data, valid_data, verbose=verbose, saved=saved)
+
+    def _timed_generate(self, model, eval_data):
+        model.eval()
+        if self.device.type == 'cuda':
+            torch.cuda.synchronize(self.device)
+        start_time = time()
+        generate_corpus = model.generate(eval_data)
+        if self.device.type == 'cuda':
+            torch.cuda.synchronize(self.device)
+        return generate_corpus, time() - start_time
+
+    @torch.no_grad()
+    def compare(self, eval_data, load_best_model=True, model_file=None):
+        r"""Evaluate the teacher and the student on the eval data, and measure their decoding latency.
+
+        Args:
+            eval_data (DataLoader): the eval data
+            load_best_model (bool, optional): whether load the best student in the training process, default: True.
+            model_file (str, optional): the saved student model file, default: None.
+
+        Returns:
+            dict: the results of ``'teacher'`` and ``'student'``, including BLEU, ROUGE and
+            ``latency_ms``, the decoding time per sample in ms. The student result also includes ``speedup``.
+        """
+        self._load_evaluation_model(load_best_model, model_file)
+
+        reference_corpus = eval_data.get_reference()
+        results = dict()
+        for name, model in [('teacher', self.teacher), ('student', self.model)]:
+            generate_corpus, elapsed_time = self._timed_generate(model, eval_data)
+            result = self.evaluator.evaluate(generate_corpus, reference_corpus)
+            for evaluator in [self.bleu_evaluator, self.rouge_evaluator]:
+                if evaluator is not None:
+                    result.update(evaluator.evaluate(generate_corpus, reference_corpus))
+            result['latency_ms'] = elapsed_time * 1000 / max(len(generate_corpus), 1)
+            results[name] = result
+            self.logger.info('{} result: {}'.format(name, result))
+        self._save_generated_text(generate_corpus)
+        results['student']['speedup'] = results['teacher']['latency_ms'] / max(results['student']['latency_ms'], 1e-12)
+        return results
+
+
 class MaskGANTrainer(GANTrainer):
     r""" Trainer specifically designed for MaskGAN training process.
     """
 
+    # the adversarial epochs of MaskGAN run generator, critic and discriminator steps without the epoch progress
+    # of GANTrainer, so they cannot be continued in the middle
+    support_preemption = False
+
     def __init__(self, config, model):
         super(MaskGANTrainer, self).__init__(config, model)
         self.max_length = config["max_seq_length"]
@@ -861,7 +1487,7 @@ class MaskGANTrainer(GANTrainer):
             lengths = torch.tensor([seq_len] * bs)
             target_present = torch.ones_like(input).byte()
             device = target.device
-            lengths = lengths.cuda(device)
+            lengths = lengths.to(device)
 
             # pretaining
             encoder_outputs = pre_train_lm(input, lengths, target, target_present, pretrain=True)
@@ -875,7 +1501,7 @@ class MaskGANTrainer(GANTrainer):
         lm_opt = self._build_module_optimizer_(pre_train_lm, lr=0.001)
         for epoch in range(self.pretrain_lm_epochs):
             total_loss = None
-            real_data = self._get_real_data(train_data)  # bs * self.max_len
+            real_data = self._get_cached_real_data(train_data)  # bs * self.max_len
             real_dataloader = DataLoader(real_data, batch_size=self.model.batch_size, shuffle=True, drop_last=True)
             for batch_idx, data in enumerate(real_dataloader):
 
@@ -921,7 +1547,7 @@ class MaskGANTrainer(GANTrainer):
     def _g_train_epoch(self, train_data, epoch_idx):
         self.model.generator.train()
         total_loss = None
-        real_data = self._get_real_data(train_data)  # bs * self.max_len
+        real_data = self._get_cached_real_data(train_data)  # bs * self.max_len
         real_dataloader = DataLoader(real_data, batch_size=self.model.batch_size, shuffle=True, drop_last=True)
         for batch_idx, data in enumerate(real_dataloader):
             loss = self.model.calculate_g_train_loss(data, epoch_idx=epoch_idx)
@@ -944,7 +1570,7 @@ class MaskGANTrainer(GANTrainer):
     def _d_train_epoch(self, train_data, epoch_idx):
         self.model.discriminator.train()
         total_loss = None
-        real_data = self._get_real_data(train_data)
+        real_data = self._get_cached_real_data(train_data)
         real_dataloader = DataLoader(real_data, batch_size=self.model.batch_size, shuffle=True, drop_last=True)
         for batch_idx, data in enumerate(real_dataloader):
             losses = self.model.calculate_d_train_loss(data, epoch_idx=epoch_idx)
@@ -960,7 +1586,7 @@ class MaskGANTrainer(GANTrainer):
         critic_total_loss = None
         g_num = 0.0
         d_num = 0.0
-        real_data = self._get_real_data(train_data)
+        real_data = self._get_cached_real_data(train_data)
         real_dataloader = DataLoader(real_data, batch_size=self.model.batch_size, shuffle=True, drop_last=True)
 
         dis_train_data = copy.deepcopy(real_dataloader)
@@ -1044,9 +1670,11 @@ class MaskGANTrainer(GANTrainer):
         if postfix is not None:
             path = self.saved_model_file + "_" + str(epoch) + "_" + postfix
             torch.save(state, path)
+            self.callbacks.on_save(epoch, path)
             return path
         else:
             torch.save(state, self.saved_model_file)
+            self.callbacks.on_save(epoch, self.saved_model_file)
 
     def _load_generated_text(self):
         r""" Load the generated text by our model to log.
@@ -1059,6 +1687,13 @@ class MaskGANTrainer(GANTrainer):
             return samples
 
     def fit(self, train_data, valid_data=None, verbose=True, saved=True):
+        self.callbacks.on_fit_start()
+        try:
+            return self._fit(train_data, valid_data, verbose, saved)
+        finally:
+            self.callbacks.on_fit_end()
+
+    def _fit(self, train_data, valid_data=None, verbose=True, saved=True):
         # generator pretraining
         if self.checkp is not None:
             checkpoint = torch.load(self.checkp)
@@ -1201,6 +1836,10 @@ class LeakGANTrainer(GANTrainer):
     r"""Specified for leakgan trainer
     """
 
+    # the epochs of LeakGAN run their own loops without the epoch progress of GANTrainer, so they cannot be
+    # continued in the middle
+    support_preemption = False
+
     def __init__(self, config, model):
         super(LeakGANTrainer, self).__init__(config, model)
         self.interleaved_pretrain_epoch = config['interleaved_pretrain_epoch']
@@ -1342,7 +1981,7 @@ class LeakGANTrainer(GANTrainer):
 
     def _g_train_epoch(self, train_data, epoch_idx):
         total_loss = None
-        real_data = self._get_real_data(train_data)
+        real_data = self._get_cached_real_data(train_data)
         real_dataloader = DataLoader(real_data, batch_size=self.model.batch_size, shuffle=True, drop_last=True)
         for batch_idx, data in enumerate(real_dataloader):
             # interaction = interaction.to(self.device)
@@ -1356,11 +1995,11 @@ class LeakGANTrainer(GANTrainer):
     def _d_train_epoch(self, train_data, epoch_idx):
         total_loss = None
         total_acc = 0
-        real_data = self._get_real_data(train_data)
+        real_data = self._get_cached_real_data(train_data)
         real_dataloader = DataLoader(real_data, batch_size=self.model.batch_size, shuffle=True, drop_last=True)
         # not need sample self.d_sample_num numbers becauese only train discriminator 5 batch
         d_sample_num = (self.d_sample_training_epochs + 1) * self.model.batch_size
-        fake_data = self.model.sample(d_sample_num)
+        fake_data = self._get_fake_data(d_sample_num)
 
         fake_dataloader = DataLoader(fake_data, batch_size=self.model.batch_size, shuffle=True, drop_last=True)
 
@@ -1380,6 +2019,13 @@ class LeakGANTrainer(GANTrainer):
         return {"total_loss": total_loss, "train_acc": total_acc}
 
     def fit(self, train_data, valid_data=None, verbose=True, saved=True):
+        self.callbacks.on_fit_start()
+        try:
+            return self._fit(train_data, valid_data, verbose, saved)
+        finally:
+            self.callbacks.on_fit_end()
+
+    def _fit(self, train_data, valid_data=None, verbose=True, saved=True):
         # pretraining
         if verbose:
             self.logger.info(">> Start pretraining")
@@ -1,10 +1,14 @@
 from textbox.utils.logger import init_logger
 from textbox.utils.utils import get_local_time, ensure_dir, get_model, get_trainer, \
-    early_stopping, init_seed
+    early_stopping, init_seed, get_rng_state, set_rng_state, compile_model, quantize_model
+from textbox.utils.distributed import init_distributed, get_world_size, get_rank, is_main_process, barrier, \
+    reduce_mean, cleanup_distributed
 from textbox.utils.enum_type import *
 from textbox.utils.argument_list import *
 
 __all__ = [
     'init_logger', 'get_local_time', 'ensure_dir', 'get_model', 'get_trainer', 'early_stopping', 'Enum', 'ModelType',
-    'init_seed', 'general_arguments', 'training_arguments', 'evaluation_arguments', 'dataset_arguments'
+    'init_seed', 'get_rng_state', 'set_rng_state', 'compile_model', 'quantize_model', 'init_distributed',
+    'get_world_size', 'get_rank', 'is_main_process', 'barrier', 'reduce_mean', 'cleanup_distributed',
+    'general_arguments', 'training_arguments', 'evaluation_arguments', 'dataset_arguments'
 ]
@@ -3,16 +3,23 @@
 # @Email  : lijunyi@ruc.edu.cn
 
 general_arguments = [
-    'gpu_id', 'use_gpu', 'seed', 'reproducibility', 'state', 'data_path', 'checkpoint_dir', 'generated_text_dir'
+    'gpu_id', 'use_gpu', 'seed', 'reproducibility', 'state', 'data_path', 'checkpoint_dir', 'generated_text_dir',
+    'distributed_backend', 'distributed_timeout'
 ]
 
 training_arguments = [
     'epochs', 'train_batch_size', 'learner', 'learning_rate', 'eval_step', 'stopping_step', 'grad_clip',
     'g_pretraining_epochs', 'd_pretraining_epochs', 'd_sample_num', 'd_sample_training_epochs',
-    'adversarail_training_epochs', 'adversarail_g_epochs', 'adversarail_d_epochs'
+    'adversarail_training_epochs', 'adversarail_g_epochs', 'adversarail_d_epochs', 'compile_model', 'loss_chunk_size',
+    'output_layer', 'adaptive_cutoffs', 'adaptive_div_value', 'vocab_rank', 'sampled_softmax_num', 'sparse_embeddings',
+    'telemetry', 'telemetry_interval', 'profiler', 'profiler_wait', 'profiler_warmup', 'profiler_active',
+    'profiler_repeat', 'profiler_row_limit', 'distillation', 'distill_temperature', 'distill_alpha', 'preemptible',
+    'd_replay_refresh_ratio', 'd_replay_max_age'
 ]
 
-evaluation_arguments = ['beam_size', 'decoding_strategy', 'metrics', 'n_grams', 'eval_batch_size', 'eval_generate_num']
+evaluation_arguments = [
+    'beam_size', 'decoding_strategy', 'metrics', 'n_grams', 'eval_batch_size', 'eval_generate_num', 'quantize'
+]
 
 dataset_arguments = [
     'max_vocab_size', 'source_max_vocab_size', 'target_max_vocab_size', 'source_max_seq_length',
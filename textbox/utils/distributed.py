@@ -0,0 +1,104 @@
+"""
+textbox.utils.distributed
+################################
+"""
+
+import os
+import torch
+from datetime import timedelta
+import torch.distributed as dist
+
+
+def init_distributed(config):
+    r"""Init the default process group if the process is launched by ``torchrun`` (or any launcher which sets
+    ``WORLD_SIZE``, ``RANK``, ``LOCAL_RANK``, ``MASTER_ADDR`` and ``MASTER_PORT``), and record the ``world_size``,
+    ``rank`` and ``local_rank`` of current process in config. Collective operations time out after
+    ``distributed_timeout`` seconds.
+
+    Args:
+        config (Config): An instance object of Config, used to record parameter information.
+    """
+    world_size = int(os.environ.get('WORLD_SIZE', 1))
+    rank = int(os.environ.get('RANK', 0))
+    local_rank = int(os.environ.get('LOCAL_RANK', 0))
+    config['world_size'] = world_size
+    config['rank'] = rank
+    config['local_rank'] = local_rank
+    if world_size <= 1:
+        return
+
+    if not dist.is_initialized():
+        backend = config['distributed_backend'] or 'gloo'
+        # the other ranks wait in barriers while rank 0 works alone, e.g., processes the dataset
+        timeout = timedelta(seconds=config['distributed_timeout'] or 1800)
+        dist.init_process_group(
+            backend=backend, init_method='env://', world_size=world_size, rank=rank, timeout=timeout
+        )
+
+    # all the processes share the experiment name of rank 0, so that they read and write the same files
+    filename = [config['filename']]
+    dist.broadcast_object_list(filename, src=0)
+    config['filename'] = filename[0]
+
+
+def get_world_size():
+    r"""Get the number of processes in the default process group
+
+    Returns:
+        int: world size, ``1`` if distributed training is not initialized
+    """
+    if dist.is_available() and dist.is_initialized():
+        return dist.get_world_size()
+    return 1
+
+
+def get_rank():
+    r"""Get the rank of current process in the default process group
+
+    Returns:
+        int: rank, ``0`` if distributed training is not initialized
+    """
+    if dist.is_available() and dist.is_initialized():
+        return dist.get_rank()
+    return 0
+
+
+def is_main_process():
+    r"""Whether current process is the main process (rank 0), which is the only one that writes files.
+
+    Returns:
+        bool: whether current process is rank 0
+    """
+    return get_rank() == 0
+
+
+def barrier():
+    r"""Synchronize all the processes, it does nothing if distributed training is not initialized.
+    """
+    if get_world_size() > 1:
+        dist.barrier()
+
+
+def reduce_mean(value):
+    r"""Average a float (or a tuple of floats) across all the processes.
+
+    Args:
+        value (float or tuple): the local value of current process
+
+    Returns:
+        float or tuple: the value averaged over all processes
+    """
+    world_size = get_world_size()
+    if world_size <= 1:
+        return value
+    tensor = torch.tensor(value, dtype=torch.float64)
+    dist.all_reduce(tensor, op=dist.ReduceOp.SUM)
+    tensor /= world_size
+    return tuple(tensor.tolist()) if isinstance(value, tuple) else tensor.item()
+
+
+def cleanup_distributed():
+    r"""Destroy the default process group if it is initialized.
+    """
+    if dist.is_available() and dist.is_initialized():
+        dist.destroy_process_group()
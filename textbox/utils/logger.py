@@ -53,12 +53,18 @@ def init_logger(config):
         level = logging.CRITICAL
     else:
         level = logging.INFO
-    fh = logging.FileHandler(logfilepath)
-    fh.setLevel(level)
-    fh.setFormatter(fileformatter)
-
     sh = logging.StreamHandler()
     sh.setLevel(level)
     sh.setFormatter(sformatter)
 
+    # in distributed training only rank 0 writes the log file, the other ranks just report warnings
+    if config['rank']:
+        sh.setLevel(logging.WARNING)
+        logging.basicConfig(level=level, handlers=[sh])
+        return
+
+    fh = logging.FileHandler(logfilepath)
+    fh.setLevel(level)
+    fh.setFormatter(fileformatter)
+
     logging.basicConfig(level=level, handlers=[fh, sh])
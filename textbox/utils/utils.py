@@ -19,6 +19,7 @@ import importlib
 import random
 import torch
 import numpy as np
+from logging import getLogger
 from textbox.utils.enum_type import ModelType
 
 
@@ -153,3 +154,135 @@ def init_seed(seed, reproducibility):
     else:
         torch.backends.cudnn.benchmark = True
         torch.backends.cudnn.deterministic = False
+
+
+def get_rng_state():
+    r"""Get the states of random number generators in python, numpy, torch and cuda, e.g., to be saved in checkpoints.
+
+    Returns:
+        dict: the states of random number generators
+    """
+    state = {'python': random.getstate(), 'numpy': np.random.get_state(), 'torch': torch.get_rng_state()}
+    if torch.cuda.is_available():
+        state['cuda'] = torch.cuda.get_rng_state_all()
+    return state
+
+
+def set_rng_state(state):
+    r"""Restore the states of random number generators returned by :func:`get_rng_state`.
+
+    Args:
+        state (dict): the states of random number generators
+    """
+    random.setstate(state['python'])
+    np.random.set_state(state['numpy'])
+    torch.set_rng_state(state['torch'])
+    if 'cuda' in state and torch.cuda.is_available():
+        torch.cuda.set_rng_state_all(state['cuda'])
+
+
+_compile_targets = ['TransformerLayer', 'MultiHeadAttention', 'BasicRNNDecoder', 'AttentionalRNNDecoder']
+
+
+def quantize_model(model):
+    r"""Apply dynamic int8 quantization to the ``nn.Linear``, ``nn.LSTM`` and ``nn.GRU`` modules of model in place,
+    e.g., ``vocab_linear``, attention projections and RNN decoders. Their weights are stored in int8 and activations
+    are quantized on the fly, which speeds up inference on CPU.
+
+    Args:
+        model (torch.nn.Module): the model to be quantized
+
+    Returns:
+        torch.nn.Module: the quantized model
+    """
+    quantization = torch.ao.quantization if hasattr(torch, 'ao') else torch.quantization
+    return quantization.quantize_dynamic(
+        model, {torch.nn.Linear, torch.nn.LSTM, torch.nn.GRU}, dtype=torch.qint8, inplace=True
+    )
+
+
+def compile_model(model, mode):
+    r"""Compile the layers which make up the training forward and the decoding steps of model in place, i.e.
+    :class:`~textbox.module.layers.TransformerLayer`, :class:`MultiHeadAttention` and the RNN decoders.
+    The layers which can not be compiled are kept in eager mode.
+
+    Args:
+        model (torch.nn.Module): the model to be compiled
+        mode (str or bool): ``True`` or ``'compile'`` to use ``torch.compile``, ``'torchscript'`` to use
+            ``torch.jit.script``, and ``False`` or ``None`` to keep eager mode
+
+    Returns:
+        torch.nn.Module: the compiled model
+    """
+    logger = getLogger()
+    if not mode:
+        return model
+    mode = 'compile' if mode is True else str(mode).lower()
+    if mode not in ['compile', 'torchscript']:
+        raise ValueError("compile_model [{}] should be one of 'compile' and 'torchscript'".format(mode))
+    if mode == 'compile' and not hasattr(torch, 'compile'):
+        logger.warning('torch.compile is not available in torch {}, keep eager mode'.format(torch.__version__))
+        return model
+
+    compiled_prefix = []
+    for name, module in list(model.named_modules()):
+        if module.__class__.__name__ not in _compile_targets:
+            continue
+        if any(name.startswith(prefix + '.') for prefix in compiled_prefix):
+            continue
+        if mode == 'compile':
+            _compile_forward(module, logger)
+        elif not _script_module(model, name, module, logger):
+            continue
+        compiled_prefix.append(name)
+    logger.info('Compiled {} layers of {} by [{}]'.format(len(compiled_prefix), model.__class__.__name__, mode))
+    return model
+
+
+def _compile_errors():
+    r"""The errors raised by ``torch.compile`` when a module can not be compiled, e.g. unsupported operations or
+    failures of the backend compiler.
+    """
+    try:
+        from torch._dynamo.exc import BackendCompilerFailed, Unsupported
+    except ImportError:
+        return ()
+    return BackendCompilerFailed, Unsupported
+
+
+def _compile_forward(module, logger):
+    r"""Replace the forward of module by its ``torch.compile`` version. Compilation happens lazily at the first call,
+    so the module falls back to eager mode for good if it can not be compiled. Other errors of the compiled forward,
+    e.g. out of memory, are raised as they are.
+    """
+    eager_forward = module.forward
+    compiled_forward = torch.compile(eager_forward, dynamic=True)
+    compile_errors = _compile_errors()
+
+    def forward(*args, **kwargs):
+        try:
+            return compiled_forward(*args, **kwargs)
+        except compile_errors as e:
+            logger.warning(
+                'Failed to compile [{}], fall back to eager mode: {}'.format(module.__class__.__name__, repr(e))
+            )
+            module.forward = eager_forward
+            return eager_forward(*args, **kwargs)
+
+    module.forward = forward
+
+
+def _script_module(model, name, module, logger):
+    r"""Replace the submodule of model by its TorchScript version, and keep it in eager mode if it can't be scripted.
+    """
+    try:
+        scripted_module = torch.jit.script(module)
+    except Exception as e:
+        logger.warning('Failed to script [{}], keep eager mode: {}'.format(module.__class__.__name__, repr(e)))
+        return False
+    parent = model
+    *parent_names, child_name = name.split('.')
+    for parent_name in parent_names:
+        parent = getattr(parent, parent_name)
+    setattr(parent, child_name, scripted_module)
+    return True